@@ -0,0 +1,147 @@
+"""系统日志接收路径基准测试：对比旧的逐块处理路径和实时接收路径（按行分帧+分帧为记录+过滤+短信回调提取）的吞吐量及内存分配
+
+旧路径每块解码、清理并查找短信回调标记；实时接收路径与接收线程/接收进程做同样的工作：
+分帧、解码、分帧为日志记录、判断短信回调并提取、按过滤条件筛选后放入显示队列。
+“仅解码”一行只作参考，不是等价的工作量。
+
+用法: python benchmark_receive.py [数据量MB]
+"""
+import datetime
+import re
+import sys
+import time
+import tracemalloc
+
+from combined_gui import ByteLineFramer, LuatLogFilter, LuatLogParser, SMS_CALLBACK_MARKER, parse_sms_callback
+
+
+class FakeSerial:
+    """模拟串口：按in_waiting逐次返回预先生成的数据"""
+
+    def __init__(self, data, chunk_size):
+        self.data = memoryview(data)
+        self.position = 0
+        self.chunk_size = chunk_size
+
+    @property
+    def in_waiting(self):
+        return min(self.chunk_size, len(self.data) - self.position)
+
+    def read(self, size):
+        chunk = self.data[self.position:self.position + size].tobytes()
+        self.position += len(chunk)
+        return chunk
+
+    def readinto(self, buffer):
+        count = min(len(buffer), len(self.data) - self.position)
+        buffer[:count] = self.data[self.position:self.position + count]
+        self.position += count
+        return count
+
+
+def make_capture(size):
+    """生成指定大小的模拟Luat日志（含中文和少量短信回调）"""
+    lines = [
+        "[2025-09-30 17:31:01.123] I/user.net 心跳正常 rssi=23 seq=%d\r\n",
+        "[2025-09-30 17:31:01.124] D/user.mqtt.pub topic=/dev/status payload={\"seq\":%d}\r\n",
+        "[2025-09-30 17:31:01.125] W/user.socket 重连中 attempt=%d\r\n",
+    ]
+    sms = ("[2025-09-30 17:31:01.126] I/user.handler_sms.smsCallback sender_number: 10690000 "
+           "datetime: 25/09/30,17:31:01+32 sms_content: 【测试】验证码%06d，5分钟内有效\r\n")
+    parts = []
+    total = 0
+    index = 0
+    while total < size:
+        line = (sms if index % 500 == 0 else lines[index % 3]) % index
+        encoded = line.encode('utf-8')
+        parts.append(encoded)
+        total += len(encoded)
+        index += 1
+    return b''.join(parts)
+
+
+def legacy_clean_log_text(text):
+    text = text.replace('\r\n', '\n')
+    text = re.sub(r'\n{2,}', '\n', text)
+    lines = [line.strip() for line in text.split('\n')]
+    lines = [line for line in lines if line]
+    return '\n'.join(lines)
+
+
+def run_legacy(data):
+    """旧路径：每次read(1024)生成新bytes，格式化时间戳和两条状态日志，逐块解码并清理"""
+    ser = FakeSerial(data, 1024)
+    callbacks = 0
+    while ser.in_waiting:
+        chunk = ser.read(1024)
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        status = f"接收到数据: {len(chunk)} 字节"
+        text = chunk.decode('utf-8', errors='replace')
+        status = f"使用UTF-8解码成功"
+        cleaned_text = legacy_clean_log_text(text)
+        if SMS_CALLBACK_MARKER in text:
+            callbacks += 1
+    return callbacks
+
+
+def run_framed(data, log_filter=None):
+    """新路径：读入预分配缓冲区，按行边界整批取出并解码；给出log_filter时按实时接收路径处理记录"""
+    ser = FakeSerial(data, 4096)
+    framer = ByteLineFramer()
+    parser = LuatLogParser()
+    callbacks = 0
+
+    def handle(records):
+        # 与handle_monitor_records相同：短信回调提取，其余按过滤条件筛选（显示队列的保留和丢弃不计入）
+        count = 0
+        for record in records:
+            if record.is_sms_callback():
+                parse_sms_callback(record.sms_callback_text(), record.device_time)
+                count += 1
+            log_filter.accept(record)
+        return count
+
+    while True:
+        received = framer.fill(ser)
+        block = framer.take_lines(flush=not received)
+        if block:
+            text = block.decode('utf-8', errors='replace')
+            if log_filter is not None:
+                callbacks += handle(parser.feed(text))
+        if not received:
+            break
+    if log_filter is not None:
+        callbacks += handle(parser.flush())
+    return callbacks
+
+
+def measure(name, function, data):
+    # 先运行一次，正则缓存、字符串驻留等一次性分配不计入峰值内存
+    function(data[:64 * 1024])
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(data)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # 不开启tracemalloc再测一次吞吐量，避免跟踪开销影响结果
+    started = time.perf_counter()
+    function(data)
+    untraced = time.perf_counter() - started
+    print(f"{name:<28} {len(data) / untraced / 1024 / 1024:8.1f} MB/s   "
+          f"峰值内存 {peak / 1024:8.1f} KB   短信回调 {result}")
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 20
+    data = make_capture(int(size_mb * 1024 * 1024))
+    print(f"模拟日志 {len(data) / 1024 / 1024:.1f} MB")
+    measure("旧路径（逐块解码+清理）", run_legacy, data)
+    measure("实时路径（无过滤条件）", lambda d: run_framed(d, LuatLogFilter()), data)
+    # 有过滤条件时每条记录都要解析字段
+    measure("实时路径（按级别过滤）", lambda d: run_framed(d, LuatLogFilter(levels='IWE')), data)
+    measure("参考：缓冲区分帧（仅解码）", run_framed, data)
+
+
+if __name__ == '__main__':
+    main()
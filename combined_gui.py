@@ -1,15 +1,3299 @@
+import time
+
+# 启动耗时统计的起点，在导入其他模块之前记录，模块导入耗时计入启动耗时
+STARTUP_BEGIN = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox, font
+from tkinter import ttk, scrolledtext, messagebox, font, simpledialog, filedialog
 import serial
 import serial.tools.list_ports
 import threading
-import time
 import re
 import datetime
+import queue
+import collections
+import os
+import json
+import socket
+import urllib.parse
+import asyncio
+import concurrent.futures
+import heapq
+import math
+import sys
+import multiprocessing
+import struct
+import bisect
+import array
+import itertools
+import io
+import functools
+import signal
+
+# ========== 本地配置 ==========
+# 配置及持久化数据目录
+APP_DATA_DIR = os.path.join(os.path.expanduser('~'), '.air724ug_tool')
+SETTINGS_FILE = os.path.join(APP_DATA_DIR, 'settings.json')
+
+
+def load_settings():
+    """读取本地配置，文件不存在或损坏时返回空配置"""
+    try:
+        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_settings(settings):
+    """保存本地配置（先写临时文件再替换，避免写入中断损坏配置）"""
+    os.makedirs(APP_DATA_DIR, exist_ok=True)
+    temp_path = SETTINGS_FILE + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, SETTINGS_FILE)
+
+
+# ========== 启动耗时统计 ==========
+STARTUP_PROFILE_FILE = os.path.join(APP_DATA_DIR, 'startup_profile.json')
+
+
+class StartupProfiler:
+    """记录启动各阶段相对起点的耗时（毫秒），用于衡量并控制窗口显示及就绪时间"""
+
+    def __init__(self, begin=None):
+        self.begin = STARTUP_BEGIN if begin is None else begin
+        self.marks = []
+        self._lock = threading.Lock()
+
+    def mark(self, stage):
+        """记录阶段完成时间，可在任意线程调用"""
+        elapsed = round((time.perf_counter() - self.begin) * 1000, 1)
+        with self._lock:
+            self.marks.append((stage, elapsed))
+        return elapsed
+
+    def elapsed(self, stage):
+        """返回指定阶段的耗时，未记录时返回None"""
+        with self._lock:
+            for name, elapsed in self.marks:
+                if name == stage:
+                    return elapsed
+        return None
+
+    def report(self):
+        """按时间顺序返回各阶段耗时"""
+        with self._lock:
+            marks = sorted(self.marks, key=lambda item: item[1])
+        return {'stages': [{'stage': name, 'ms': elapsed} for name, elapsed in marks],
+                'recorded_at': time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    def save(self, path=STARTUP_PROFILE_FILE):
+        """保存最近一次启动的耗时报告"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+# ========== 性能分析 ==========
+PROFILE_DIR = os.path.join(APP_DATA_DIR, 'profiles')
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_TOP = 20
+# Python 3.12起cProfile基于sys.monitoring，启用期间记录所有线程且同一时刻只允许一个分析器，
+# 无法按调用分析单个方法，此时热点方法只统计调用次数及耗时，函数级耗时以线程采样为准
+CPROFILE_PER_CALL = sys.version_info < (3, 12)
+
+
+def describe_code(code):
+    """函数的简短描述：文件名:行号(函数名)"""
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+class SamplingProfiler:
+    """采样分析：后台线程定时读取所有线程的调用栈，按线程入口函数统计各函数的自身及累计采样数
+
+    不需要在被分析的线程中安装钩子，因此可以随时开始和停止，覆盖已经在运行的接收、解析及AT线程。
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = collections.Counter()
+        self.total_counts = collections.Counter()
+        self.thread_counts = collections.Counter()
+        self._stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(THREAD_STOP_TIMEOUT)
+
+    def _worker(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                # 线程入口：最外层不属于threading模块的函数
+                entry = next((code for code in reversed(stack) if not code.co_filename.endswith('threading.py')),
+                             stack[-1]).co_name
+                self.thread_counts[entry] += 1
+                self.self_counts[(entry, describe_code(stack[0]))] += 1
+                for name in {describe_code(code) for code in stack}:
+                    self.total_counts[(entry, name)] += 1
+            self.samples += 1
+
+    def report_lines(self, top=PROFILE_TOP):
+        lines = [f"采样间隔 {self.interval * 1000:.0f} ms，共采样 {self.samples} 次"]
+        for entry, count in self.thread_counts.most_common():
+            lines.append("")
+            lines.append(f"[线程 {entry}] {count} 个样本")
+            lines.append("  自身耗时最多的函数:")
+            own = sorted(((n, name) for (e, name), n in self.self_counts.items() if e == entry), reverse=True)
+            lines.extend(f"    {n * 100 / count:5.1f}%  {name}" for n, name in own[:top])
+            lines.append("  累计耗时最多的函数:")
+            total = sorted(((n, name) for (e, name), n in self.total_counts.items() if e == entry), reverse=True)
+            lines.extend(f"    {n * 100 / count:5.1f}%  {name}" for n, name in total[:top])
+        return lines
+
+
+class ProfilingSession:
+    """一次性能分析：采样所有线程，对标记的热点方法（只应标记不阻塞等待的短小方法）逐次调用cProfile，
+    并用tracemalloc统计期间的内存分配"""
+
+    def __init__(self, trace_frames=10):
+        self.trace_frames = trace_frames
+        self.sampler = SamplingProfiler()
+        self.profiles = []
+        self.call_counts = collections.Counter()
+        self.call_times = collections.Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._own_tracemalloc = False
+        self.baseline = None
+        self.started = None
+
+    def start(self):
+        # 分析相关模块只在开始性能分析时导入，不计入启动耗时
+        import tracemalloc
+        self.started = time.time()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self._own_tracemalloc = True
+        self.baseline = tracemalloc.take_snapshot()
+        self.sampler.start()
+
+    def run(self, name, func, *args, **kwargs):
+        """用cProfile执行一次调用并累计到name下（每个线程每个名称复用一个分析器）；同一线程中嵌套的调用并入外层
+
+        Python 3.12起只统计调用次数及耗时，不启用cProfile。
+        """
+        if getattr(self._local, 'active', False):
+            return func(*args, **kwargs)
+        profile = None
+        if CPROFILE_PER_CALL:
+            profiles = getattr(self._local, 'profiles', None)
+            if profiles is None:
+                profiles = self._local.profiles = {}
+            profile = profiles.get(name)
+            if profile is None:
+                import cProfile
+                profile = profiles[name] = cProfile.Profile()
+                with self._lock:
+                    self.profiles.append((name, profile))
+            profile.enable()
+        self._local.active = True
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+            self._local.active = False
+            with self._lock:
+                self.call_counts[name] += 1
+                self.call_times[name] += elapsed
+
+    def stop(self, directory=PROFILE_DIR):
+        """停止分析并写入报告，返回报告路径"""
+        import pstats
+        import tracemalloc
+        self.sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+        lines = [f"性能分析报告 {time.strftime('%Y-%m-%d %H:%M:%S')}",
+                 f"分析时长 {time.time() - self.started:.1f} 秒", "", "===== 线程采样 ====="]
+        lines.extend(self.sampler.report_lines())
+        lines.extend(["", "===== 热点方法（cProfile，按累计时间） ====="])
+        if not CPROFILE_PER_CALL:
+            lines.append(f"Python {sys.version_info[0]}.{sys.version_info[1]} 的cProfile基于sys.monitoring，"
+                         "会同时记录所有线程，无法单独分析热点方法；以下只列出调用次数及耗时，函数级耗时请参考线程采样")
+        merged = {}
+        with self._lock:
+            for name, profile in self.profiles:
+                # 启用后没有完成任何调用的分析器没有统计数据
+                if not profile.getstats():
+                    continue
+                if name in merged:
+                    merged[name].add(profile)
+                else:
+                    merged[name] = pstats.Stats(profile)
+            calls = dict(self.call_counts)
+            times = dict(self.call_times)
+        for name in sorted(calls):
+            lines.append("")
+            lines.append(f"[{name}] 调用 {calls[name]} 次，共 {times[name] * 1000:.1f} ms，"
+                         f"平均 {times[name] * 1000 / calls[name]:.3f} ms")
+            stats = merged.get(name)
+            if stats:
+                output = io.StringIO()
+                stats.stream = output
+                stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+                lines.append(output.getvalue().strip())
+        lines.extend(["", "===== 内存分配（tracemalloc，相对开始时的增量） =====",
+                      f"当前 {current / 1024:.1f} KB，峰值 {peak / 1024:.1f} KB"])
+        lines.extend(str(stat) for stat in snapshot.compare_to(self.baseline, 'lineno')[:PROFILE_TOP])
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile_{time.strftime('%Y%m%d_%H%M%S')}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+
+def profiled(name):
+    """方法装饰器：性能分析开启时用cProfile记录该方法的调用，未开启时直接调用"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            session = self.profiling
+            if session is None:
+                return method(self, *args, **kwargs)
+            return session.run(name, method, self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ========== 短信编码（GSM 03.38 / UCS2） ==========
+# GSM 7-bit 默认字母表，下标即septet值（0x1B为扩展表转义符）
+GSM7_BASIC_ALPHABET = (
+    "@£$¥èéùìòÇ\nØø\rÅå"
+    "Δ_ΦΓΛΩΠΨΣΘΞ\x1bÆæßÉ"
+    " !\"#¤%&'()*+,-./"
+    "0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNO"
+    "PQRSTUVWXYZÄÖÑÜ§"
+    "¿abcdefghijklmno"
+    "pqrstuvwxyzäöñüà"
+)
+GSM7_ESCAPE = 0x1B
+# GSM 7-bit 扩展表，每个字符占用两个septet（转义符 + 字符）
+GSM7_EXTENSION_ALPHABET = {
+    '\f': 0x0A, '^': 0x14, '{': 0x28, '}': 0x29, '\\': 0x2F,
+    '[': 0x3C, '~': 0x3D, ']': 0x3E, '|': 0x40, '€': 0x65
+}
+GSM7_BASIC_MAP = {ch: i for i, ch in enumerate(GSM7_BASIC_ALPHABET) if i != GSM7_ESCAPE}
+
+# 单条/长短信分段容量（GSM为septet数，UCS2为UTF-16码元数）
+SMS_SEGMENT_LIMITS = {
+    'GSM7': (160, 153),
+    'UCS2': (70, 67)
+}
+
+
+def gsm7_encode(text):
+    """将文本编码为GSM 7-bit septet列表，无法编码时返回None"""
+    septets = []
+    for ch in text:
+        value = GSM7_BASIC_MAP.get(ch)
+        if value is not None:
+            septets.append(value)
+            continue
+        value = GSM7_EXTENSION_ALPHABET.get(ch)
+        if value is None:
+            return None
+        septets.append(GSM7_ESCAPE)
+        septets.append(value)
+    return septets
+
+
+def split_sms_units(units, encoding):
+    """按编码的分段容量切分编码单元，避免拆开转义序列或代理对"""
+    single_limit, multi_limit = SMS_SEGMENT_LIMITS[encoding]
+    if len(units) <= single_limit:
+        return [units]
+
+    segments = []
+    start = 0
+    while start < len(units):
+        end = min(start + multi_limit, len(units))
+        if end < len(units):
+            if encoding == 'GSM7' and units[end - 1] == GSM7_ESCAPE:
+                # 转义符不能位于分段末尾
+                end -= 1
+            elif encoding == 'UCS2' and 0xD800 <= units[end - 1] <= 0xDBFF:
+                # 高位代理不能与低位代理分开
+                end -= 1
+        segments.append(units[start:end])
+        start = end
+    return segments
+
+
+def choose_sms_encoding(text):
+    """自动选择短信编码，返回(编码, 编码单元列表, 分段列表)"""
+    septets = gsm7_encode(text)
+    if septets is not None:
+        return 'GSM7', septets, split_sms_units(septets, 'GSM7')
+
+    utf16_bytes = text.encode('utf-16be')
+    code_units = [int.from_bytes(utf16_bytes[i:i + 2], 'big') for i in range(0, len(utf16_bytes), 2)]
+    return 'UCS2', code_units, split_sms_units(code_units, 'UCS2')
+
+
+def estimate_sms_segments(text):
+    """预估短信编码、分段数和已用容量，用于发送前提示"""
+    encoding, units, segments = choose_sms_encoding(text)
+    single_limit, multi_limit = SMS_SEGMENT_LIMITS[encoding]
+    capacity = single_limit if len(segments) <= 1 else multi_limit * len(segments)
+    return encoding, len(segments), len(units), capacity
+
+
+def pack_gsm7_septets(septets, fill_bits=0):
+    """将septet列表按GSM 03.38规则打包为字节（fill_bits用于UDH后的对齐填充）"""
+    packed = bytearray()
+    accumulator = 0
+    bit_count = fill_bits
+    for septet in septets:
+        accumulator |= (septet & 0x7F) << bit_count
+        bit_count += 7
+        while bit_count >= 8:
+            packed.append(accumulator & 0xFF)
+            accumulator >>= 8
+            bit_count -= 8
+    if bit_count > 0:
+        packed.append(accumulator & 0xFF)
+    return bytes(packed)
+
+
+def encode_pdu_address(phone_number):
+    """将目标号码编码为TP-DA字段（长度 + 号码类型 + 半字节反序号码）"""
+    type_of_address = 0x81
+    if phone_number.startswith('+'):
+        type_of_address = 0x91
+        phone_number = phone_number[1:]
+    digits = re.sub(r'\D', '', phone_number)
+    padded = digits + 'F' if len(digits) % 2 else digits
+    swapped = ''.join(padded[i + 1] + padded[i] for i in range(0, len(padded), 2))
+    return f"{len(digits):02X}{type_of_address:02X}{swapped}"
+
+
+def encode_sca_field(sms_center):
+    """将短信中心号码编码为PDU的SCA字段（长度为号码类型及号码的字节数），为空时返回00表示使用模块中已设置的短信中心"""
+    digits = re.sub(r'\D', '', sms_center or '')
+    if not digits:
+        return "00"
+    type_of_address = 0x91 if sms_center.strip().startswith('+') or len(digits) > 11 else 0x81
+    padded = digits + 'F' if len(digits) % 2 else digits
+    swapped = ''.join(padded[i + 1] + padded[i] for i in range(0, len(padded), 2))
+    return f"{1 + len(swapped) // 2:02X}{type_of_address:02X}{swapped}"
+
+
+def build_sms_submit_pdus(phone_number, text, reference=0, status_report=False, sms_center=None):
+    """构造SMS-SUBMIT PDU列表，返回[(PDU十六进制字符串, TPDU长度)]和所用编码
+
+    sms_center为空时使用SIM卡/模块中已设置的短信中心，否则写入PDU的SCA字段，不修改SIM卡设置。
+    """
+    encoding, _, segments = choose_sms_encoding(text)
+    sca = encode_sca_field(sms_center)
+    total = len(segments)
+    pdus = []
+
+    for index, segment in enumerate(segments, start=1):
+        # TP-MTI=SUBMIT，TP-VPF=相对有效期，多段时设置TP-UDHI，需要状态报告时设置TP-SRR
+        first_octet = 0x11
+        if total > 1:
+            first_octet |= 0x40
+        if status_report:
+            first_octet |= 0x20
+
+        # 长短信拼接UDH：IEI=00（8位参考号），长度3
+        udh = bytes([0x05, 0x00, 0x03, reference & 0xFF, total, index]) if total > 1 else b''
+
+        if encoding == 'GSM7':
+            data_coding = 0x00
+            fill_bits = (7 - (len(udh) * 8) % 7) % 7
+            user_data = udh + pack_gsm7_septets(segment, fill_bits)
+            # GSM编码时UDL为septet数（含UDH及填充位）
+            user_data_length = (len(udh) * 8 + fill_bits) // 7 + len(segment)
+        else:
+            data_coding = 0x08
+            user_data = udh + b''.join(unit.to_bytes(2, 'big') for unit in segment)
+            user_data_length = len(user_data)
+
+        tpdu = (
+            f"{first_octet:02X}"
+            "00"                                   # TP-MR，由模块分配
+            f"{encode_pdu_address(phone_number)}"
+            "00"                                   # TP-PID
+            f"{data_coding:02X}"
+            "A7"                                   # TP-VP，24小时
+            f"{user_data_length:02X}"
+            f"{user_data.hex().upper()}"
+        )
+        # TPDU长度不含SCA字段
+        pdus.append((sca + tpdu, len(tpdu) // 2))
+
+    return pdus, encoding
+
+
+# ========== 短信PDU解析 ==========
+GSM7_EXTENSION_REVERSE = {value: ch for ch, value in GSM7_EXTENSION_ALPHABET.items()}
+
+
+def unpack_gsm7_septets(data, count):
+    """将打包的GSM 7-bit字节解包为septet列表"""
+    septets = []
+    accumulator = 0
+    bit_count = 0
+    for byte in data:
+        accumulator |= byte << bit_count
+        bit_count += 8
+        while bit_count >= 7 and len(septets) < count:
+            septets.append(accumulator & 0x7F)
+            accumulator >>= 7
+            bit_count -= 7
+    return septets
+
+
+def gsm7_decode(septets):
+    """将septet列表解码为文本"""
+    chars = []
+    escaped = False
+    for septet in septets:
+        if escaped:
+            chars.append(GSM7_EXTENSION_REVERSE.get(septet, ' '))
+            escaped = False
+        elif septet == GSM7_ESCAPE:
+            escaped = True
+        else:
+            chars.append(GSM7_BASIC_ALPHABET[septet])
+    return ''.join(chars)
+
+
+def decode_semi_octets(data):
+    """解析半字节反序编码的号码/时间字段"""
+    digits = ''.join(f"{byte & 0x0F:X}{byte >> 4:X}" for byte in data)
+    return digits.rstrip('F')
+
+
+def decode_pdu_address(data, pos):
+    """解析PDU中的地址字段，返回(号码, 下一字段位置)"""
+    digit_count = data[pos]
+    type_of_address = data[pos + 1]
+    octet_count = (digit_count + 1) // 2
+    raw = data[pos + 2:pos + 2 + octet_count]
+    if (type_of_address & 0x70) == 0x50:
+        # 字母数字型地址（如品牌名称发件人）
+        address = gsm7_decode(unpack_gsm7_septets(raw, digit_count * 4 // 7))
+    else:
+        address = decode_semi_octets(raw)[:digit_count]
+    return address, pos + 2 + octet_count
+
+
+def decode_pdu_timestamp(data):
+    """将7字节的服务中心时间戳解析为模块格式（如 25/09/30,17:31:01+32）"""
+    fields = [decode_semi_octets(bytes([byte])).zfill(2) for byte in data[:6]]
+    zone_byte = data[6]
+    quarters = (zone_byte & 0x07) * 10 + (zone_byte >> 4)
+    sign = '-' if zone_byte & 0x08 else '+'
+    return f"{fields[0]}/{fields[1]}/{fields[2]},{fields[3]}:{fields[4]}:{fields[5]}{sign}{quarters:02d}"
+
+
+def decode_sms_deliver_pdu(pdu_hex):
+    """解析SMS-DELIVER PDU，返回发件人、时间、内容及长短信拼接信息"""
+    data = bytes.fromhex(pdu_hex.strip())
+    pos = 1 + data[0]  # 跳过短信中心地址
+    first_octet = data[pos]
+    pos += 1
+
+    phone_number, pos = decode_pdu_address(data, pos)
+    data_coding = data[pos + 1]
+    pos += 2
+    send_time = decode_pdu_timestamp(data[pos:pos + 7])
+    pos += 7
+    user_data_length = data[pos]
+    user_data = data[pos + 1:]
+
+    # 解析用户数据头（长短信拼接信息）
+    header_length = 0
+    concat = None
+    if first_octet & 0x40:
+        header_length = user_data[0] + 1
+        header = user_data[1:header_length]
+        index = 0
+        while index + 1 < len(header):
+            element_id = header[index]
+            element_length = header[index + 1]
+            element = header[index + 2:index + 2 + element_length]
+            if element_id == 0x00 and element_length == 3:
+                concat = (element[0], element[1], element[2])
+            elif element_id == 0x08 and element_length == 4:
+                concat = ((element[0] << 8) | element[1], element[2], element[3])
+            index += 2 + element_length
+
+    alphabet = data_coding & 0x0C
+    if alphabet == 0x08:
+        content = user_data[header_length:user_data_length].decode('utf-16-be', errors='replace')
+    elif alphabet == 0x04:
+        content = user_data[header_length:user_data_length].decode('latin-1')
+    else:
+        header_bits = header_length * 8
+        skip = (header_bits + (7 - header_bits % 7) % 7) // 7
+        content = gsm7_decode(unpack_gsm7_septets(user_data, user_data_length)[skip:])
+
+    return {
+        'phone_number': phone_number,
+        'send_time': send_time,
+        'content': content,
+        'concat': concat
+    }
+
+
+def decode_sms_status_report_pdu(pdu_hex):
+    """解析SMS-STATUS-REPORT PDU，返回消息参考号、接收号码、时间及状态"""
+    data = bytes.fromhex(pdu_hex.strip())
+    pos = 1 + data[0]  # 跳过短信中心地址
+    pos += 1           # 首字节
+    reference = data[pos]
+    recipient, pos = decode_pdu_address(data, pos + 1)
+    return {
+        'reference': reference,
+        'recipient': recipient,
+        'sc_time': decode_pdu_timestamp(data[pos:pos + 7]),
+        'discharge_time': decode_pdu_timestamp(data[pos + 7:pos + 14]),
+        'status': data[pos + 14]
+    }
+
+
+# ========== 短信送达报告跟踪 ==========
+def percentile(sorted_values, fraction):
+    """最近秩法计算百分位数（输入需已排序）"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class DeliveryReportTracker:
+    """短信送达报告跟踪：按(消息参考号, 接收号码)索引已提交的短信段，收到状态报告后计算送达时延
+
+    有短信段未返回消息参考号时无法关联送达报告，记录标记为untracked，不计入时延统计。
+    """
+
+    def __init__(self, max_records=5000):
+        self._lock = threading.Lock()
+        self._records = collections.OrderedDict()
+        self._by_reference = {}
+        self._next_id = 0
+        self.max_records = max_records
+
+    def track(self, phone_number, sim=None):
+        """登记一条待提交的短信，返回记录ID"""
+        with self._lock:
+            self._next_id += 1
+            record_id = self._next_id
+            self._records[record_id] = {
+                'id': record_id,
+                'phone_number': phone_number,
+                'sim': sim,
+                'references': [],
+                'pending': set(),
+                'sealed': False,
+                'untracked': False,
+                'status': 'submitting',
+                'submitted_at': time.time(),
+                'delivered_at': None,
+                'latency': None
+            }
+            while len(self._records) > self.max_records:
+                _, evicted = self._records.popitem(last=False)
+                self._drop_references(evicted)
+            return record_id
+
+    def add_reference(self, record_id, reference):
+        """记录短信段提交成功后返回的消息参考号(+CMGS)"""
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is None:
+                return
+            record['references'].append(reference)
+            record['pending'].add(reference)
+            self._by_reference[(reference, normalize_sender(record['phone_number']))] = record_id
+
+    def mark_untracked(self, record_id):
+        """短信段已提交但未返回消息参考号"""
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is not None:
+                record['untracked'] = True
+
+    def seal(self, record_id):
+        """所有短信段已提交，开始等待送达；无法关联送达报告时标记为untracked"""
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is None:
+                return
+            record['sealed'] = True
+            if record['status'] != 'submitting':
+                return
+            if record['untracked'] or not record['references']:
+                record['status'] = 'untracked'
+                record['pending'].clear()
+                self._drop_references(record)
+                return
+            record['status'] = 'pending'
+            self._complete_if_delivered(record)
+
+    def discard(self, record_id):
+        """提交失败时移除记录"""
+        with self._lock:
+            record = self._records.pop(record_id, None)
+            if record:
+                self._drop_references(record)
+
+    def on_status_report(self, report):
+        """处理状态报告，短信完成（送达或失败）时返回对应记录副本"""
+        key = (report['reference'], normalize_sender(report['recipient']))
+        status = report['status']
+        with self._lock:
+            record = self._records.get(self._by_reference.get(key))
+            if record is None:
+                return None
+            # 0x20-0x3F：短信中心仍在重试，等待最终报告
+            if 0x20 <= status < 0x40:
+                return None
+            del self._by_reference[key]
+            record['pending'].discard(report['reference'])
+            if status >= 0x40:
+                record['status'] = 'failed'
+                record['failure_status'] = status
+                return dict(record)
+            if self._complete_if_delivered(record):
+                return dict(record)
+        return None
+
+    def _complete_if_delivered(self, record):
+        if record['sealed'] and not record['pending'] and record['status'] == 'pending':
+            record['status'] = 'delivered'
+            record['delivered_at'] = time.time()
+            record['latency'] = record['delivered_at'] - record['submitted_at']
+            return True
+        return False
+
+    def _drop_references(self, record):
+        for reference in record['references']:
+            self._by_reference.pop((reference, normalize_sender(record['phone_number'])), None)
+
+    def recent(self, limit=100):
+        """最近的送达记录"""
+        with self._lock:
+            records = list(self._records.values())[-limit:]
+            return [dict(record, pending=sorted(record['pending'])) for record in records]
+
+    def stats(self):
+        """送达统计：总体及按SIM卡分组的数量和时延百分位数"""
+        with self._lock:
+            records = list(self._records.values())
+        groups = {None: records}
+        for record in records:
+            groups.setdefault(record['sim'] or '未知SIM卡', []).append(record)
+
+        result = {}
+        for sim, group in groups.items():
+            latencies = sorted(record['latency'] for record in group if record['latency'] is not None)
+            result['all' if sim is None else sim] = {
+                'delivered': len(latencies),
+                'failed': sum(1 for record in group if record['status'] == 'failed'),
+                'pending': sum(1 for record in group if record['status'] == 'pending'),
+                'untracked': sum(1 for record in group if record['status'] == 'untracked'),
+                'p50': percentile(latencies, 0.5),
+                'p90': percentile(latencies, 0.9),
+                'p99': percentile(latencies, 0.99)
+            }
+        return result
+
+
+# ========== 手机号段数据库 ==========
+# 在3位号段基础上补充的号段（新号段及虚拟运营商号段），号段越长优先级越高
+DEFAULT_SEGMENT_OVERRIDES = {
+    '195': '中国移动', '197': '中国移动',
+    '196': '中国联通',
+    '190': '中国电信', '191': '中国电信', '193': '中国电信',
+    '192': '中国广电',
+    '165': '中国移动(虚拟运营商)', '1703': '中国移动(虚拟运营商)', '1705': '中国移动(虚拟运营商)', '1706': '中国移动(虚拟运营商)',
+    '167': '中国联通(虚拟运营商)', '171': '中国联通(虚拟运营商)', '1704': '中国联通(虚拟运营商)', '1707': '中国联通(虚拟运营商)',
+    '1708': '中国联通(虚拟运营商)', '1709': '中国联通(虚拟运营商)',
+    '162': '中国电信(虚拟运营商)', '1700': '中国电信(虚拟运营商)', '1701': '中国电信(虚拟运营商)', '1702': '中国电信(虚拟运营商)'
+}
+MOBILE_NUMBER_PATTERN = re.compile(r'^1\d{10}$')
+DIALABLE_NUMBER_PATTERN = re.compile(r'^\+?\d{3,20}$')
+
+
+def normalize_mobile_number(number):
+    """去掉号码中的空格、连字符和+86/86前缀"""
+    return normalize_sender(re.sub(r'[\s\-]', '', str(number)))
+
+
+class NumberSegmentDatabase:
+    """手机号段数据库：以7位号段（号码前7位）为下标的紧凑字节数组，O(1)查询运营商
+
+    每个号段占1字节，存放运营商编号，覆盖1000000-1999999共100万个号段（约1MB）。
+    可由3-7位号段前缀批量生成，也可从“号段,运营商”格式的CSV导入精确的7位号段数据。
+    """
+
+    SEGMENT_BASE = 1000000
+    SEGMENT_COUNT = 1000000
+    UNKNOWN = '未知运营商'
+    MAGIC = b'NSDB1\n'
+
+    def __init__(self):
+        self.carriers = [self.UNKNOWN]
+        self._carrier_codes = {self.UNKNOWN: 0}
+        self.table = bytearray(self.SEGMENT_COUNT)
+
+    @classmethod
+    def from_prefixes(cls, carrier_prefixes, overrides=None):
+        """由运营商号段前缀表生成数据库，前缀按长度从短到长依次填充"""
+        database = cls()
+        assignments = [(prefix, carrier) for carrier, prefixes in carrier_prefixes.items() for prefix in prefixes]
+        assignments += list((overrides or {}).items())
+        for prefix, carrier in sorted(assignments, key=lambda item: len(item[0])):
+            database.assign(prefix, carrier)
+        return database
+
+    def carrier_code(self, carrier):
+        """运营商名称对应的编号，新名称自动分配"""
+        code = self._carrier_codes.get(carrier)
+        if code is None:
+            if len(self.carriers) >= 256:
+                raise ValueError("运营商种类超过255个")
+            code = len(self.carriers)
+            self.carriers.append(carrier)
+            self._carrier_codes[carrier] = code
+        return code
+
+    @staticmethod
+    def check_prefix(prefix):
+        """号段前缀必须是以1开头的3-7位数字，过短的前缀会覆盖大量号段"""
+        if not prefix.isdigit() or not 3 <= len(prefix) <= 7 or not prefix.startswith('1'):
+            raise ValueError(f"无效的号段: {prefix}")
+
+    def assign(self, prefix, carrier):
+        """将3-7位号段前缀覆盖的所有7位号段设为指定运营商"""
+        self.check_prefix(prefix)
+        span = 10 ** (7 - len(prefix))
+        start = int(prefix) * span - self.SEGMENT_BASE
+        self.table[start:start + span] = bytes([self.carrier_code(carrier)]) * span
+
+    def lookup(self, phone_number):
+        """查询单个号码的运营商，号码无效时返回None"""
+        number = normalize_mobile_number(phone_number)
+        if not MOBILE_NUMBER_PATTERN.match(number):
+            return None
+        return self.carriers[self.table[int(number[:7]) - self.SEGMENT_BASE]]
+
+    def classify(self, numbers):
+        """批量校验并归类号码，返回每个号码的结果及按运营商统计的数量"""
+        table = self.table
+        carriers = self.carriers
+        base = self.SEGMENT_BASE
+        match = MOBILE_NUMBER_PATTERN.match
+        results = []
+        counts = {}
+        invalid = 0
+        for raw in numbers:
+            number = normalize_mobile_number(raw)
+            if match(number):
+                carrier = carriers[table[int(number[:7]) - base]]
+                counts[carrier] = counts.get(carrier, 0) + 1
+                results.append({'number': number, 'carrier': carrier, 'valid': True})
+            else:
+                invalid += 1
+                results.append({'number': number, 'carrier': None, 'valid': False})
+        return {'results': results, 'counts': counts, 'invalid': invalid}
+
+    def load_csv(self, path):
+        """从CSV导入号段数据（每行“号段,运营商”，号段3-7位），返回导入条数
+
+        先校验所有行（首行可以是表头），有无效行时抛出ValueError，不修改现有数据。
+        """
+        rows = []
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for line_number, line in enumerate(f, start=1):
+                fields = [field.strip() for field in line.split(',')]
+                if not any(fields) or (line_number == 1 and not fields[0].isdigit()):
+                    continue
+                if len(fields) < 2 or not fields[1]:
+                    raise ValueError(f"第 {line_number} 行格式无效: {line.strip()}")
+                try:
+                    self.check_prefix(fields[0])
+                except ValueError as e:
+                    raise ValueError(f"第 {line_number} 行: {str(e)}")
+                rows.append((fields[0], fields[1]))
+        new_carriers = {carrier for _, carrier in rows} - set(self._carrier_codes)
+        if len(self.carriers) + len(new_carriers) > 256:
+            raise ValueError("运营商种类超过255个")
+        for prefix, carrier in sorted(rows, key=lambda item: len(item[0])):
+            self.assign(prefix, carrier)
+        return len(rows)
+
+    def save(self, path):
+        """保存为二进制文件（文件头 + 运营商名称JSON + 号段表）"""
+        names = json.dumps(self.carriers, ensure_ascii=False).encode('utf-8')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(len(names).to_bytes(4, 'big'))
+            f.write(names)
+            f.write(self.table)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """从二进制文件加载，文件无效时抛出ValueError"""
+        with open(path, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError("号段数据文件格式无效")
+            names_length = int.from_bytes(f.read(4), 'big')
+            carriers = json.loads(f.read(names_length).decode('utf-8'))
+            table = bytearray(f.read())
+        if len(table) != cls.SEGMENT_COUNT:
+            raise ValueError("号段数据文件长度不正确")
+        database = cls()
+        database.carriers = carriers
+        database._carrier_codes = {carrier: code for code, carrier in enumerate(carriers)}
+        database.table = table
+        return database
+
+
+# ========== 新短信推送 ==========
+PUSH_SEND_TIMEOUT = 5                        # 单次投递的网络超时（秒）
+PUSH_STOP_TIMEOUT = PUSH_SEND_TIMEOUT + 1    # 停止时等待投递线程退出的时限，长于单次投递超时
+PUSH_BACKLOG_MAX_BYTES = 64 * 1024 * 1024    # 积压队列文件上限，超过后丢弃新事件
+
+
+class SmsPushDelivery:
+    """新短信推送：批量投递到本地HTTP Webhook、Unix Socket或TCP，失败时写入持久化积压队列
+
+    支持的目标格式：
+        http://127.0.0.1:8080/sms   以JSON POST {"events": [...]}
+        tcp://127.0.0.1:9000        每个事件一行JSON
+        unix:///tmp/sms.sock        每个事件一行JSON
+    """
+
+    def __init__(self, target, backlog_path, batch_size=50, batch_interval=0.2, log_callback=None):
+        self.target = target
+        self.backlog_path = backlog_path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.log_callback = log_callback
+        self.events = queue.Queue()
+        self.running = False
+        self.thread = None
+        # 投递失败后的重试退避（秒）
+        self.retry_delay = 1.0
+        self.max_retry_delay = 60.0
+        self.next_retry_time = 0.0
+        self.delivered_count = 0
+
+    def start(self):
+        """启动投递线程"""
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止投递线程，未投递的事件由投递线程在退出前写入积压队列
+
+        积压队列只由投递线程读写；等待时限长于单次投递超时，正在进行的投递结束后线程即可退出。
+        """
+        self.running = False
+        # 唤醒等待事件的投递线程
+        self.events.put(None)
+        if self.thread is None:
+            self._save_pending()
+            return
+        self.thread.join(timeout=PUSH_STOP_TIMEOUT)
+        if self.thread.is_alive():
+            self._log("短信推送线程未能及时退出，未投递的事件将在其退出时写入积压队列")
+
+    def submit(self, event):
+        """提交事件（不阻塞调用方）"""
+        self.events.put_nowait(event)
+
+    def _log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def _collect_batch(self):
+        """收集一批事件：等待首个事件后，在批量间隔内继续合并"""
+        try:
+            event = self.events.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        if event is None:
+            return []
+        batch = [event]
+        deadline = time.time() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                event = self.events.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if event is None:
+                break
+            batch.append(event)
+        return batch
+
+    def _worker(self):
+        while self.running:
+            batch = self._collect_batch()
+            has_backlog = os.path.exists(self.backlog_path)
+
+            if has_backlog and time.time() >= self.next_retry_time:
+                has_backlog = not self._drain_backlog()
+
+            if not batch:
+                continue
+            if has_backlog or not self.running:
+                # 积压未清空时保持顺序，新事件追加到积压队列；停止时不再发起新的投递
+                self._append_backlog(batch)
+            elif not self._deliver_with_backoff(batch):
+                self._append_backlog(batch)
+        self._save_pending()
+
+    def _save_pending(self):
+        """把队列中剩余的事件写入积压队列"""
+        remaining = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event is not None:
+                remaining.append(event)
+        if remaining:
+            self._append_backlog(remaining)
+
+    def _deliver_with_backoff(self, batch):
+        try:
+            self._deliver(batch)
+        except Exception as e:
+            self._log(f"短信推送失败，{self.retry_delay:.0f}秒后重试: {str(e)}")
+            self.next_retry_time = time.time() + self.retry_delay
+            self.retry_delay = min(self.retry_delay * 2, self.max_retry_delay)
+            return False
+        self.retry_delay = 1.0
+        self.delivered_count += len(batch)
+        return True
+
+    def _drain_backlog(self):
+        """按批次流式读取并投递积压事件（不整体读入内存），返回积压是否已清空
+
+        投递失败或正在停止时，把未投递的部分写回积压队列。
+        """
+        temp_path = self.backlog_path + '.tmp'
+        drained = True
+        try:
+            with open(self.backlog_path, 'r', encoding='utf-8') as f:
+                while drained:
+                    lines = list(itertools.islice(f, self.batch_size))
+                    if not lines:
+                        break
+                    chunk = []
+                    for line in lines:
+                        if not line.strip():
+                            continue
+                        try:
+                            chunk.append(json.loads(line))
+                        except ValueError:
+                            self._log("推送积压队列中有损坏的记录，已跳过")
+                    if chunk and (not self.running or not self._deliver_with_backoff(chunk)):
+                        drained = False
+                        with open(temp_path, 'w', encoding='utf-8') as temp:
+                            temp.writelines(lines)
+                            temp.writelines(f)
+            if not drained:
+                # 读取的文件关闭后再替换（Windows下不能替换已打开的文件）
+                os.replace(temp_path, self.backlog_path)
+                return False
+        except OSError as e:
+            self._log(f"读取推送积压队列失败: {str(e)}")
+            return False
+
+        os.remove(self.backlog_path)
+        self._log("推送积压队列已全部投递")
+        return True
+
+    def _append_backlog(self, events):
+        """追加事件到积压队列，文件超过PUSH_BACKLOG_MAX_BYTES时丢弃新事件"""
+        try:
+            size = os.path.getsize(self.backlog_path)
+        except OSError:
+            size = 0
+        if size >= PUSH_BACKLOG_MAX_BYTES:
+            self._log(f"推送积压队列已达上限，丢弃 {len(events)} 条事件")
+            return
+        with open(self.backlog_path, 'a', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def _deliver(self, batch):
+        if self.target.startswith(('http://', 'https://')):
+            import urllib.request
+            body = json.dumps({'events': batch}, ensure_ascii=False).encode('utf-8')
+            request = urllib.request.Request(self.target, data=body, headers={'Content-Type': 'application/json; charset=utf-8'})
+            with urllib.request.urlopen(request, timeout=PUSH_SEND_TIMEOUT) as response:
+                if not 200 <= response.status < 300:
+                    raise OSError(f"HTTP {response.status}")
+            return
+
+        lines = b''.join(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n' for event in batch)
+        if self.target.startswith('tcp://'):
+            host, _, port = self.target[len('tcp://'):].rpartition(':')
+            with socket.create_connection((host, int(port)), timeout=PUSH_SEND_TIMEOUT) as sock:
+                sock.sendall(lines)
+        elif self.target.startswith('unix://'):
+            if not hasattr(socket, 'AF_UNIX'):
+                raise OSError("当前系统不支持Unix Socket")
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(PUSH_SEND_TIMEOUT)
+                sock.connect(self.target[len('unix://'):])
+                sock.sendall(lines)
+        else:
+            raise ValueError(f"不支持的推送目标: {self.target}")
+
+
+# ========== 验证码提取及等待 ==========
+def extract_verification_code(text):
+    """从短信内容中提取验证码，未找到时返回None"""
+    # 优先查找常见的验证码格式：
+    # 1. 连续的4-8位数字（最常见的验证码格式）
+    code_match = re.search(r'([0-9]{4,8})', text)
+
+    # 2. 如果没有找到纯数字验证码，查找包含字母和数字的验证码
+    if not code_match:
+        code_match = re.search(r'([A-Za-z0-9]{4,8})', text)
+
+    # 3. 特定格式的验证码（例如：XX-XX-XX）
+    if not code_match:
+        code_match = re.search(r'([A-Za-z0-9]{2}-[A-Za-z0-9]{2}-[A-Za-z0-9]{2})', text)
+
+    return code_match.group(1) if code_match else None
+
+
+def normalize_sender(phone_number):
+    """统一发件号码格式（去掉+号和86国家码），用于索引匹配"""
+    number = (phone_number or '').strip().lstrip('+')
+    if number.startswith('86') and len(number) == 13:
+        number = number[2:]
+    return number
+
+
+class SmsWaiterRegistry:
+    """验证码等待登记表：按发件号码索引等待者，新短信到达时直接分发给匹配的等待者
+
+    register() 返回 concurrent.futures.Future，结果为 {'code': 验证码, 'sms': 短信信息}，
+    超时后以 TimeoutError 结束。可在线程中直接等待，也可用 asyncio.wrap_future 在事件循环中等待。
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._waiters = {}
+        # 发件号码 -> {等待者ID: 等待者}，未指定号码的等待者单独存放
+        self._by_sender = {}
+        self._any_sender = {}
+        self._deadlines = []
+        self._next_id = 0
+        self._sweeper = None
+
+    def register(self, sender=None, keyword=None, pattern=None, timeout=60.0):
+        """登记等待条件（发件号码、关键字、正则可任意组合），返回Future"""
+        regex = re.compile(pattern) if pattern else None
+        future = concurrent.futures.Future()
+        with self._condition:
+            self._next_id += 1
+            waiter_id = self._next_id
+            sender = normalize_sender(sender) if sender else None
+            waiter = {'id': waiter_id, 'sender': sender, 'keyword': keyword, 'regex': regex, 'future': future}
+            self._waiters[waiter_id] = waiter
+            if sender:
+                self._by_sender.setdefault(sender, {})[waiter_id] = waiter
+            else:
+                self._any_sender[waiter_id] = waiter
+            if timeout:
+                heapq.heappush(self._deadlines, (time.time() + timeout, waiter_id))
+                self._condition.notify()
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_expired, daemon=True)
+                self._sweeper.start()
+        future.add_done_callback(lambda f: self._remove(waiter_id))
+        return future
+
+    def pending_count(self):
+        """当前等待中的数量"""
+        with self._condition:
+            return len(self._waiters)
+
+    def dispatch(self, sms_info):
+        """新短信分发：按发件号码取出候选等待者并逐一匹配"""
+        sender = normalize_sender(sms_info.get('phone_number'))
+        with self._condition:
+            candidates = list(self._by_sender.get(sender, {}).values()) + list(self._any_sender.values())
+        if not candidates:
+            return
+
+        content = sms_info.get('content', '')
+        for waiter in candidates:
+            if waiter['keyword'] and waiter['keyword'] not in content:
+                continue
+            if waiter['regex']:
+                match = waiter['regex'].search(content)
+                if not match:
+                    continue
+                code = match.group(1) if match.groups() else match.group(0)
+            else:
+                code = extract_verification_code(content)
+            try:
+                waiter['future'].set_result({'code': code, 'sms': dict(sms_info)})
+            except concurrent.futures.InvalidStateError:
+                pass
+
+    def _remove(self, waiter_id):
+        with self._condition:
+            waiter = self._waiters.pop(waiter_id, None)
+            if waiter is None:
+                return
+            if waiter['sender']:
+                bucket = self._by_sender.get(waiter['sender'], {})
+                bucket.pop(waiter_id, None)
+                if not bucket:
+                    self._by_sender.pop(waiter['sender'], None)
+            else:
+                self._any_sender.pop(waiter_id, None)
+
+    def _sweep_expired(self):
+        """超时清理线程：按最近截止时间休眠，到期后结束对应等待者"""
+        while True:
+            expired = []
+            with self._condition:
+                while not expired:
+                    now = time.time()
+                    while self._deadlines and self._deadlines[0][0] <= now:
+                        _, waiter_id = heapq.heappop(self._deadlines)
+                        if waiter_id in self._waiters:
+                            expired.append(self._waiters[waiter_id])
+                    if expired:
+                        break
+                    timeout = self._deadlines[0][0] - now if self._deadlines else None
+                    self._condition.wait(timeout)
+            for waiter in expired:
+                try:
+                    waiter['future'].set_exception(TimeoutError("等待验证码超时"))
+                except concurrent.futures.InvalidStateError:
+                    pass
+
+
+# ========== 收件箱消息存储 ==========
+INBOX_STORE_LIMIT = 10000
+
+
+class InboxStore:
+    """收件箱消息存储：在内存中按到达顺序保存最近limit条短信（超出上限时丢弃最早的，
+    完整记录保存在设备收件箱分片中），按号码、时间和内容去重
+
+    入库时提取一次验证码保存在code字段，复制验证码和分页显示都无需重新解析短信内容；
+    发送时间解析为Unix时间戳保存在epoch字段（无法解析时使用入库时间），用于多设备合并排序。
+    分页以本页最新一条的id为锚点，新短信到达时已翻到的页不会移动。
+    """
+
+    def __init__(self, limit=INBOX_STORE_LIMIT):
+        self.limit = limit
+        self.messages = []
+        self.keys = set()
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def message_key(sms_info):
+        return (sms_info.get('phone_number'), sms_info.get('send_time'), sms_info.get('content'))
+
+    def add_many(self, sms_list, source=None):
+        """批量入库，返回新增的消息（重复的短信被忽略）"""
+        added = []
+        with self.lock:
+            for sms_info in sms_list:
+                key = self.message_key(sms_info)
+                if key in self.keys:
+                    continue
+                self.keys.add(key)
+                self.last_id += 1
+                now = datetime.datetime.now()
+                message = dict(sms_info, id=self.last_id,
+                               received_at=now.isoformat(timespec='milliseconds'),
+                               epoch=sms_epoch(sms_info, now.timestamp()),
+                               code=extract_verification_code(sms_info.get('content') or '') or '')
+                if source:
+                    message['source'] = source
+                added.append(message)
+            self.messages.extend(added)
+            overflow = len(self.messages) - self.limit
+            if overflow > 0:
+                for message in self.messages[:overflow]:
+                    self.keys.discard(self.message_key(message))
+                del self.messages[:overflow]
+        return added
+
+    def add(self, sms_info, source=None):
+        """单条入库，重复时返回None"""
+        added = self.add_many([sms_info], source)
+        return added[0] if added else None
+
+    def __len__(self):
+        return len(self.messages)
+
+    def clear(self):
+        with self.lock:
+            self.messages = []
+            self.keys.clear()
+
+    def _end_index(self, anchor_id):
+        # 消息按id递增排列，返回id不大于anchor_id的消息数
+        low, high = 0, len(self.messages)
+        while low < high:
+            middle = (low + high) // 2
+            if self.messages[middle]['id'] <= anchor_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def page(self, anchor_id, page_size):
+        """以anchor_id为本页最新一条按最新在前分页（None表示最新一页），返回(本页消息, 页码, 总页数)"""
+        with self.lock:
+            total = len(self.messages)
+            end = total if anchor_id is None else self._end_index(anchor_id)
+            # 锚点所在的消息已被丢弃时显示最早的一页
+            end = max(end, min(page_size, total))
+            rows = self.messages[max(0, end - page_size):end]
+        rows.reverse()
+        page = (total - end + page_size - 1) // page_size
+        page_count = max(1, page + (end + page_size - 1) // page_size)
+        return rows, page, page_count
+
+    def shift_anchor(self, anchor_id, pages, page_size):
+        """把分页锚点向更早(pages>0)或更新(pages<0)移动若干页，回到最新一页时返回None"""
+        with self.lock:
+            total = len(self.messages)
+            end = total if anchor_id is None else self._end_index(anchor_id)
+            end = min(max(end - pages * page_size, min(page_size, total)), total)
+            if end >= total:
+                return None
+            return self.messages[end - 1]['id']
+
+    def since(self, since_id, limit, sender=None):
+        """返回id大于since_id的消息（按到达顺序），可按发件号码过滤"""
+        with self.lock:
+            messages = list(self.messages)
+        return [message for message in messages
+                if message['id'] > since_id and (not sender or message.get('phone_number') == sender)][:limit]
+
+    def get(self, message_id):
+        with self.lock:
+            for message in reversed(self.messages):
+                if message['id'] == message_id:
+                    return message
+        return None
+
+    def latest_with_code(self):
+        """最新一条含验证码的消息"""
+        with self.lock:
+            for message in reversed(self.messages):
+                if message['code']:
+                    return message
+        return None
+
+
+# ========== 短信时间解析及多设备合并收件箱 ==========
+INBOX_SHARD_DIR = os.path.join(APP_DATA_DIR, 'inbox_shards')
+INBOX_SHARD_LIMIT = 20000
+INBOX_SHARD_MAX_BYTES = 16 * 1024 * 1024  # 分片文件超过该大小时压缩为最新的INBOX_SHARD_LIMIT条
+# 模块时间格式：yy/MM/dd,hh:mm:ss±zz，时区以15分钟为单位
+MODEM_DATETIME_PATTERN = re.compile(r'(\d{2})/(\d{1,2})/(\d{1,2}),(\d{1,2}):(\d{2}):(\d{2})\s*([+-])\s*(\d{1,2})')
+LOCAL_DATETIME_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?')
+
+
+def parse_modem_datetime(text):
+    """把短信时间解析为带时区的datetime，无法解析时返回None
+
+    支持模块时间（如 25/09/30,17:31:01+32，即东八区）和日志接收时间（本地时间 2025-09-30 17:31:01.123）。
+    """
+    text = (text or '').strip()
+    match = MODEM_DATETIME_PATTERN.match(text)
+    try:
+        if match:
+            year, month, day, hour, minute, second = (int(value) for value in match.groups()[:6])
+            offset = int(match.group(8)) * 15
+            zone = datetime.timezone(datetime.timedelta(minutes=-offset if match.group(7) == '-' else offset))
+            return datetime.datetime(2000 + year, month, day, hour, minute, second, tzinfo=zone)
+        match = LOCAL_DATETIME_PATTERN.match(text)
+        if match:
+            fields = [int(value) for value in match.groups()[:6]]
+            microsecond = int((match.group(7) or '0').ljust(6, '0'))
+            return datetime.datetime(*fields, microsecond).astimezone()
+    except ValueError:
+        return None
+    return None
+
+
+def sms_epoch(sms_info, default=None):
+    """短信发送时间的Unix时间戳，发送时间无法解析时返回default"""
+    parsed = parse_modem_datetime(sms_info.get('send_time'))
+    return parsed.timestamp() if parsed else default
+
+
+def shard_file_name(device):
+    return re.sub(r'[^0-9A-Za-z_.-]', '_', device) + '.jsonl'
+
+
+MERGED_INBOX_VIEW_LIMIT = 1000
+MERGED_INBOX_REFRESH_INTERVAL = 10000
+
+
+def append_inbox_shard(device, messages, directory=INBOX_SHARD_DIR):
+    """把本设备收到的短信追加到设备分片文件（每行一条JSON），供多设备合并查看"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, shard_file_name(device))
+    with open(path, 'a', encoding='utf-8') as f:
+        for message in messages:
+            f.write(json.dumps({
+                'device': device,
+                'device_name': message.get('device_name', ''),
+                'phone_number': message.get('phone_number'),
+                'send_time': message.get('send_time'),
+                'epoch': message.get('epoch'),
+                'content': message.get('content'),
+                'code': message.get('code', ''),
+                'source': message.get('source', '')
+            }, ensure_ascii=False) + '\n')
+    if os.path.getsize(path) > INBOX_SHARD_MAX_BYTES:
+        compact_inbox_shard(path)
+
+
+def compact_inbox_shard(path, keep=INBOX_SHARD_LIMIT):
+    """只保留分片文件中最新的keep条（写入临时文件后替换，读取方按文件标识变化重新读取）"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        lines = collections.deque(f, maxlen=keep)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(temp_path, path)
+
+
+def merged_sort_key(message):
+    return message.get('epoch') or 0.0
+
+
+class InboxShardReader:
+    """增量读取各设备收件箱分片：记录每个分片文件已读取的位置，刷新时只解析新追加的完整行
+
+    分片文件被压缩替换（文件标识变化）或变短时重新完整读取，每个设备只保留最新的limit条。
+    """
+
+    def __init__(self, directory=INBOX_SHARD_DIR, limit=INBOX_SHARD_LIMIT):
+        self.directory = directory
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._files = {}
+
+    def refresh(self):
+        """读取新追加的消息，返回 {设备: 按时间从新到旧排序的消息列表}（列表只替换不修改，可跨线程使用）"""
+        with self._lock:
+            names = set()
+            if os.path.isdir(self.directory):
+                names = {name for name in os.listdir(self.directory) if name.endswith('.jsonl')}
+            for name in list(self._files):
+                if name not in names:
+                    del self._files[name]
+            for name in sorted(names):
+                self._refresh_file(name)
+            return {state['device']: state['messages'] for state in self._files.values() if state['messages']}
+
+    def _refresh_file(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._files.pop(name, None)
+            return
+        identity = (stat.st_dev, stat.st_ino)
+        state = self._files.get(name)
+        if state is None or state['identity'] != identity or stat.st_size < state['offset']:
+            state = {'identity': identity, 'offset': 0, 'device': name[:-len('.jsonl')], 'messages': []}
+            self._files[name] = state
+        if stat.st_size == state['offset']:
+            return
+        with open(path, 'rb') as f:
+            f.seek(state['offset'])
+            data = f.read(stat.st_size - state['offset'])
+        # 最后一行可能正在写入，留到下次刷新
+        end = data.rfind(b'\n') + 1
+        state['offset'] += end
+        messages = []
+        for line in data[:end].splitlines():
+            try:
+                messages.append(json.loads(line.decode('utf-8', errors='replace')))
+            except ValueError:
+                continue
+        if not messages:
+            return
+        state['device'] = messages[-1].get('device') or state['device']
+        # 追加顺序是到达顺序，按发送时间排序后与已读取的消息归并（与合并使用同一排序键）
+        messages.sort(key=merged_sort_key, reverse=True)
+        state['messages'] = list(itertools.islice(
+            heapq.merge(messages, state['messages'], key=merged_sort_key, reverse=True), self.limit))
+
+
+def merge_inbox_shards(shards, devices=None, sender=None):
+    """多路归并各设备分片（各分片已按时间从新到旧排序），按设备和发件号码过滤，惰性产出合并后的消息"""
+    streams = []
+    for device, messages in shards.items():
+        if devices and device not in devices:
+            continue
+        if sender:
+            messages = (message for message in messages if sender in (message.get('phone_number') or ''))
+        streams.append(messages)
+    return heapq.merge(*streams, key=merged_sort_key, reverse=True)
+
+
+# ========== 系统日志短信提取及离线回放 ==========
+SMS_CALLBACK_MARKER = 'handler_sms.smsCallback'
+SMS_CALLBACK_MARKER_BYTES = SMS_CALLBACK_MARKER.encode('ascii')
+SMS_SENDER_PATTERN = re.compile(r'sender_number:\s*(\d+)')
+SMS_DATETIME_PATTERN = re.compile(r'datetime:\s*([\d/,:+\s]+)')
+SMS_CONTENT_PATTERN = re.compile(r'sms_content:\s*(.+?)(?=\[|$)', re.DOTALL)
+REPLAY_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def parse_sms_callback(callback_content, default_time):
+    """从handler_sms.smsCallback开始的系统日志片段中提取发件号码、时间和内容"""
+    # 提取发件人号码（格式：sender_number: 106814308000003154）
+    phone_match = SMS_SENDER_PATTERN.search(callback_content)
+    phone_number = phone_match.group(1) if phone_match else "未知号码"
+
+    # 提取发件时间（格式：datetime: 25/09/30,17:31:01+32）
+    time_match = SMS_DATETIME_PATTERN.search(callback_content)
+    send_time = time_match.group(1).strip() if time_match else default_time
+
+    # 提取短信内容，优化提取逻辑以处理验证码被分割的情况
+    content_match = SMS_CONTENT_PATTERN.search(callback_content)
+    if content_match:
+        raw_sms_content = content_match.group(1).strip()
+
+        # 移除所有可能的换行符、制表符等空白字符，但保留空格
+        processed_content = re.sub(r'[\n\r\t]+', '', raw_sms_content)
+
+        # 处理哔哩哔哩验证码短信的特殊情况
+        if '哔哩哔哩' in processed_content and '短信登录验证码' in processed_content:
+            # 使用更精确的正则表达式提取6位数字验证码
+            # 优先查找短信中明显的6位数字序列
+            code_match = re.search(r'([0-9]{6})', processed_content)
+            if code_match:
+                verification_code = code_match.group(1)
+                sms_content = "【哔哩哔哩】" + verification_code + "短信登录验证码，5分钟内有效，请勿泄露。"
+            else:
+                # 如果没有找到明显的6位数字，回退到原始内容
+                sms_content = processed_content
+        else:
+            # 对于其他短信，直接使用处理后的内容
+            sms_content = processed_content
+
+        # 修复可能的乱码问题
+        # 方法1: 尝试替换常见的乱码组合
+        sms_content = sms_content.replace('�  ', '的')
+        # 方法2: 使用正则表达式替换单个乱码字符为空格
+        sms_content = re.sub(r'�+', ' ', sms_content)
+        # 方法3: 对内容进行进一步清理，保留中文和常用字符
+        sms_content = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9，。！？；：,.!?;:\-\s]', '', sms_content)
+    else:
+        sms_content = "无法提取内容"
+
+    return {'content': sms_content, 'phone_number': phone_number, 'send_time': send_time}
+
+
+def iter_capture_data(path, chunk_size=REPLAY_CHUNK_SIZE):
+    """逐块读取一个日志文件的原始数据流，产出(数据, 该文件已处理字节数)
+
+    带CAPTURE_MAGIC文件头的.cap抓取文件通过RawCaptureReader去掉记录头，只产出串口数据；
+    其他文件按纯文本日志原样读取。
+    """
+    with open(path, 'rb') as f:
+        is_capture = f.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC
+    if not is_capture:
+        with open(path, 'rb') as f:
+            position = 0
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    return
+                position += len(data)
+                yield data, position
+    reader = RawCaptureReader(path)
+    try:
+        reader.build_index()
+        offset = 0
+        while offset < reader.size:
+            data = reader.read(offset, chunk_size)
+            if not data:
+                break
+            offset += len(data)
+            # 进度按数据流位置折算为文件字节数，与纯文本文件统一以文件大小计算
+            yield data, reader.file_size * offset // reader.size
+    finally:
+        reader.close()
+
+
+def iter_capture_chunks(paths, chunk_size=REPLAY_CHUNK_SIZE):
+    """逐块读取抓取的系统日志文件（纯文本或.cap），在日志行边界处切分，产出(数据块, 已读取字节数)
+
+    只有包含短信回调标记的数据块才会产出，其余数据块只计入进度。
+    短信回调内容截止于下一个以'['开头的日志行，因此在换行后紧跟'['处切分不会截断短信记录。
+    """
+    bytes_read = 0
+    for path in paths:
+        remainder = b''
+        data_iter = iter_capture_data(path, chunk_size)
+        file_read = 0
+        while True:
+            data, file_position = next(data_iter, (b'', file_read))
+            bytes_read += file_position - file_read
+            file_read = file_position
+            if not data:
+                chunk, remainder = remainder, b''
+            else:
+                buffer = remainder + data
+                cut = buffer.rfind(b'\n[')
+                if cut <= 0:
+                    cut = buffer.rfind(b'\n')
+                if cut <= 0 and len(buffer) < chunk_size * 4:
+                    # 没有可切分的行边界，继续读取（单行过长时强制切分）
+                    remainder = buffer
+                    continue
+                cut = cut + 1 if cut > 0 else len(buffer)
+                chunk, remainder = buffer[:cut], buffer[cut:]
+            if chunk.find(SMS_CALLBACK_MARKER_BYTES) != -1:
+                yield chunk, bytes_read
+            if not data:
+                break
+
+
+def extract_sms_from_chunk(chunk):
+    """从一个数据块中提取所有短信（在进程池中执行，必须是模块级函数）"""
+    return extract_sms_from_text(chunk.decode('utf-8', errors='replace'))
+
+
+def extract_sms_from_text(text):
+    """从系统日志文本中提取所有短信回调，每段截止于下一个短信回调标记"""
+    messages = []
+    start = text.find(SMS_CALLBACK_MARKER)
+    while start != -1:
+        end = text.find(SMS_CALLBACK_MARKER, start + 1)
+        segment = text[start:end if end != -1 else len(text)]
+        messages.append(parse_sms_callback(segment, "未知时间"))
+        start = end
+    return messages
+
+
+def replay_capture_files(paths, workers=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """离线回放抓取的系统日志：数据块分发到进程池并行提取，按文件顺序产出(短信列表, 已读取字节数)
+
+    同时在途的数据块数量有上限，内存占用与文件大小无关。
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = collections.deque()
+        for chunk, bytes_read in iter_capture_chunks(paths, chunk_size):
+            in_flight.append((executor.submit(extract_sms_from_chunk, chunk), bytes_read))
+            if len(in_flight) >= max_in_flight:
+                future, progress = in_flight.popleft()
+                yield future.result(), progress
+        while in_flight:
+            future, progress = in_flight.popleft()
+            yield future.result(), progress
+
+
+# ========== 串口读写取消及线程停止 ==========
+THREAD_STOP_TIMEOUT = 0.5
+
+
+def cancel_serial_io(ser):
+    """取消串口上正在阻塞的读写，使读写线程立即返回（pyserial不支持时依赖读取超时）"""
+    if ser is None:
+        return
+    for name in ('cancel_read', 'cancel_write'):
+        method = getattr(ser, name, None)
+        if method is None:
+            continue
+        try:
+            method()
+        except Exception:
+            pass
+
+
+def join_threads(threads, timeout=THREAD_STOP_TIMEOUT):
+    """在总时限内依次等待线程结束（跳过当前线程），返回仍在运行的线程"""
+    deadline = time.monotonic() + timeout
+    alive = []
+    for thread in threads:
+        if thread is None or thread is threading.current_thread():
+            continue
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            alive.append(thread)
+    return alive
+
+
+# ========== 系统日志接收缓冲区 ==========
+class ByteLineFramer:
+    """系统日志接收缓冲区：串口数据读入预分配的bytearray，用rfind查找行边界
+
+    pyserial的readinto内部仍是read()后复制，并非零拷贝；缓冲区的作用是按行边界整批取出：
+    每批完整的行只生成一个bytes对象，未结束的行留在缓冲区中，因此跨读取边界的多字节UTF-8字符不会被截断。
+    """
+
+    def __init__(self, capacity=64 * 1024, read_size=4096):
+        self.capacity = capacity
+        self.read_size = read_size
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def fill(self, ser):
+        """从串口读取已到达的数据（无数据时最多等待一个读取超时），返回读取的字节数"""
+        if self.capacity - self.end < self.read_size:
+            self._compact()
+        size = min(max(ser.in_waiting, 1), self.capacity - self.end)
+        if size <= 0:
+            return 0
+        count = ser.readinto(self.view[self.end:self.end + size]) or 0
+        self.end += count
+        return count
+
+    def take_lines(self, flush=False):
+        """取出所有完整的行；flush为True或单行超过缓冲区容量时连同未结束的行一起取出"""
+        if self.end == self.start:
+            return None
+        if flush or (self.start == 0 and self.end == self.capacity):
+            cut = self.end
+        else:
+            cut = self.buffer.rfind(b'\n', self.start, self.end) + 1
+            if cut <= 0:
+                return None
+        block = self.view[self.start:cut].tobytes()
+        self.start = cut
+        if self.start == self.end:
+            self.start = self.end = 0
+        return block
+
+    def _compact(self):
+        """把未结束的行移到缓冲区开头"""
+        remaining = self.end - self.start
+        if self.start and remaining:
+            self.buffer[:remaining] = self.buffer[self.start:self.end]
+        self.start = 0
+        self.end = remaining
+
+
+# ========== 系统日志端口断线重连 ==========
+MONITOR_RECONNECT_MIN = 0.5
+MONITOR_RECONNECT_MAX = 30.0
+
+
+def serial_port_identity(port_info):
+    """端口所属设备的标识（USB VID/PID、序列号及去掉端口号的描述），用于重新枚举后查找同一设备"""
+    description = re.sub(r'\s*\((COM\d+|/dev/\S+)\)$', '', port_info.description or '')
+    return (port_info.vid, port_info.pid, port_info.serial_number, description)
+
+
+def find_serial_port(device, identity=None):
+    """原端口仍存在时返回原端口，否则返回同一设备重新枚举出的端口，找不到返回None"""
+    ports = list(serial.tools.list_ports.comports())
+    if any(port.device == device for port in ports):
+        return device
+    if identity and identity[0] is not None:
+        for port in ports:
+            if serial_port_identity(port) == identity:
+                return port.device
+    return None
+
+
+def format_duration(seconds):
+    """把秒数格式化为 时:分:秒"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def format_link_stats(stats, now=None):
+    """系统日志端口连接统计的简短描述"""
+    if not stats:
+        return ""
+    uptime = stats['uptime']
+    if stats['connected']:
+        uptime += (now or time.time()) - stats['updated']
+        state = f"在线 {format_duration(uptime)}"
+    else:
+        state = "重连中"
+    return f"{state} 重连: {stats['reconnects']}"
+
+
+class SupervisedSerialReader:
+    """受监督的系统日志端口读取：读取出错时关闭端口，按指数退避重新打开同一端口或同一设备重新枚举出的端口
+
+    分帧缓冲区跨重连保留，断线前未结束的行在重连后继续拼接。
+    event_callback(message) 在断线和重连成功时于读取线程中调用。
+    """
+
+    def __init__(self, port_settings, stop_event, event_callback=None, framer=None):
+        self.port_settings = dict(port_settings)
+        self.stop_event = stop_event
+        self.event_callback = event_callback
+        self.framer = framer or ByteLineFramer()
+        self.ser = None
+        self.identity = None
+        self.started = time.time()
+        self.connected_since = None
+        self.uptime = 0.0
+        self.reconnects = 0
+        self.last_error = ''
+
+    def open(self):
+        """首次打开端口，失败时抛出异常"""
+        self.ser = serial.Serial(timeout=0.1, **self.port_settings)
+        self.connected_since = time.time()
+        return self.ser
+
+    def identify(self):
+        """记录端口所属设备的标识（枚举端口较慢，在读取线程中调用）"""
+        try:
+            for port in serial.tools.list_ports.comports():
+                if port.device == self.port_settings['port']:
+                    self.identity = serial_port_identity(port)
+                    break
+        except Exception:
+            pass
+
+    def fill(self):
+        """读取一次数据，返回读取的字节数；断线时重连并返回None（未结束的行保留在缓冲区中）"""
+        try:
+            return self.framer.fill(self.ser)
+        except Exception as e:
+            if self.stop_event.is_set():
+                return None
+            self._reconnect(e)
+            return None
+
+    def _reconnect(self, error):
+        self.last_error = str(error)
+        self._close_port()
+        self._notify(f"系统日志端口 {self.port_settings['port']} 读取错误: {self.last_error}，正在重连...")
+        delay = MONITOR_RECONNECT_MIN
+        while not self.stop_event.wait(delay):
+            delay = min(delay * 2, MONITOR_RECONNECT_MAX)
+            try:
+                port = find_serial_port(self.port_settings['port'], self.identity)
+                if not port:
+                    continue
+                ser = serial.Serial(timeout=0.1, **dict(self.port_settings, port=port))
+            except Exception as e:
+                self.last_error = str(e)
+                continue
+            if self.stop_event.is_set():
+                ser.close()
+                return False
+            self.ser = ser
+            self.port_settings['port'] = port
+            self.connected_since = time.time()
+            self.reconnects += 1
+            self._notify(f"系统日志端口已重新连接到 {port}（第 {self.reconnects} 次重连）")
+            return True
+        return False
+
+    def _notify(self, message):
+        if self.event_callback:
+            try:
+                self.event_callback(message)
+            except Exception:
+                pass
+
+    def _close_port(self):
+        if self.connected_since is not None:
+            self.uptime += time.time() - self.connected_since
+            self.connected_since = None
+        ser, self.ser = self.ser, None
+        if ser is not None:
+            try:
+                ser.close()
+            except Exception:
+                pass
+
+    def cancel(self):
+        """取消正在阻塞的读取（可在其他线程中调用，需先设置stop_event）"""
+        cancel_serial_io(self.ser)
+
+    def close(self):
+        """关闭端口（可在其他线程中调用）"""
+        self._close_port()
+
+    def stats(self):
+        """连接统计：当前端口、是否在线、累计在线时长、重连次数及最近一次错误"""
+        now = time.time()
+        uptime = self.uptime
+        if self.connected_since is not None:
+            uptime += now - self.connected_since
+        return {
+            'port': self.port_settings['port'],
+            'connected': self.connected_since is not None,
+            'uptime': round(uptime, 3),
+            'running_time': round(now - self.started, 3),
+            'reconnects': self.reconnects,
+            'last_error': self.last_error,
+            'updated': now
+        }
+
+
+# ========== 原始数据抓取及十六进制查看 ==========
+CAPTURE_DIR = os.path.join(APP_DATA_DIR, 'captures')
+CAPTURE_MAGIC = b'AIRCAP1\n'
+CAPTURE_RECORD_HEADER = struct.Struct('<dI')  # 接收时间（Unix时间戳）+ 数据长度
+HEX_VIEW_WIDTH = 16
+CAPTURE_INDEX_STRIDE = 64 * 1024  # 抓取文件稀疏索引间隔（数据流字节）
+# 不可打印字符在ASCII列中显示为'.'
+HEX_VIEW_ASCII_TABLE = bytes(b if 0x20 <= b < 0x7f else 0x2e for b in range(256))
+
+
+class RawCaptureWriter:
+    """把串口原始数据连同接收时间追加写入二进制抓取文件"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(CAPTURE_MAGIC)
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def write(self, data, timestamp=None):
+        """写入一段数据（可以是memoryview，不复制），文件已关闭时忽略"""
+        with self._lock:
+            if self.file is None:
+                return
+            self.file.write(CAPTURE_RECORD_HEADER.pack(timestamp or time.time(), len(data)))
+            self.file.write(data)
+            self.bytes_written += len(data)
+
+    def close(self):
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class RawCaptureReader:
+    """按偏移随机读取抓取文件中的数据流
+
+    打开时只检查文件头，索引由build_index（可在后台线程中调用）顺序分块扫描记录头建立。
+    索引是稀疏的：数据流每CAPTURE_INDEX_STRIDE字节只记录一条记录的位置，
+    读取时从最近的索引点向后解析记录头，索引大小与记录数无关。
+    """
+
+    SCAN_CHUNK = 4 * 1024 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        if self.file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            self.file.close()
+            raise ValueError("不是有效的抓取文件")
+        # 索引点记录的起始数据流偏移和记录头在文件中的位置
+        self.stream_offsets = array.array('Q')
+        self.file_offsets = array.array('Q')
+        self.file_size = 0
+        self.size = 0
+        # 最近一次读取涉及的记录（数据流偏移、接收时间），用于查询每行的接收时间
+        self._read_offsets = []
+        self._read_timestamps = []
+
+    def build_index(self, progress=None, cancel_event=None):
+        """扫描记录头建立稀疏索引，progress(已扫描字节, 文件大小)，取消时返回False"""
+        header_size = CAPTURE_RECORD_HEADER.size
+        file_size = os.path.getsize(self.path)
+        stream_offsets = array.array('Q')
+        file_offsets = array.array('Q')
+        position = len(CAPTURE_MAGIC)
+        size = 0
+        next_index = 0
+        with open(self.path, 'rb') as f:
+            buffer = b''
+            buffer_start = position
+            while position + header_size <= file_size:
+                relative = position - buffer_start
+                if relative + header_size > len(buffer):
+                    if cancel_event is not None and cancel_event.is_set():
+                        return False
+                    if progress:
+                        progress(position, file_size)
+                    f.seek(position)
+                    buffer = f.read(self.SCAN_CHUNK)
+                    buffer_start = position
+                    relative = 0
+                    if len(buffer) < header_size:
+                        break
+                _, length = CAPTURE_RECORD_HEADER.unpack_from(buffer, relative)
+                # 最后一条记录可能因程序异常退出而不完整
+                length = min(length, file_size - position - header_size)
+                if size >= next_index:
+                    stream_offsets.append(size)
+                    file_offsets.append(position)
+                    next_index = size + CAPTURE_INDEX_STRIDE
+                size += length
+                position += header_size + length
+        self.stream_offsets = stream_offsets
+        self.file_offsets = file_offsets
+        self.file_size = file_size
+        self.size = size
+        if progress:
+            progress(file_size, file_size)
+        return True
+
+    def read(self, offset, length):
+        """读取数据流中[offset, offset+length)的数据"""
+        self._read_offsets = []
+        self._read_timestamps = []
+        end = min(offset + length, self.size)
+        index = bisect.bisect_right(self.stream_offsets, offset) - 1
+        if index < 0 or offset >= end:
+            return b''
+        header_size = CAPTURE_RECORD_HEADER.size
+        stream = self.stream_offsets[index]
+        position = self.file_offsets[index]
+        chunks = []
+        self.file.seek(position)
+        while stream < end and position + header_size <= self.file_size:
+            timestamp, record_length = CAPTURE_RECORD_HEADER.unpack(self.file.read(header_size))
+            record_length = min(record_length, self.file_size - position - header_size)
+            record_end = stream + record_length
+            if record_end > offset:
+                skip = max(offset - stream, 0)
+                take = min(record_end, end) - stream - skip
+                if skip:
+                    self.file.seek(skip, io.SEEK_CUR)
+                chunks.append(self.file.read(take))
+                self._read_offsets.append(stream + skip)
+                self._read_timestamps.append(timestamp)
+                if record_end > end:
+                    break
+            else:
+                self.file.seek(record_length, io.SEEK_CUR)
+            stream = record_end
+            position += header_size + record_length
+        return b''.join(chunks)
+
+    def timestamp_at(self, offset):
+        """最近一次读取范围内数据流偏移处字节的接收时间"""
+        index = bisect.bisect_right(self._read_offsets, offset) - 1
+        return self._read_timestamps[index] if index >= 0 else None
+
+    def close(self):
+        self.file.close()
+
+
+def format_hex_lines(data, base_offset, timestamp_at=None):
+    """按需把一页数据格式化为“时间 偏移 十六进制 ASCII”行"""
+    lines = []
+    for start in range(0, len(data), HEX_VIEW_WIDTH):
+        chunk = data[start:start + HEX_VIEW_WIDTH]
+        digits = chunk.hex().upper()
+        hex_text = ' '.join(digits[i:i + 2] for i in range(0, len(digits), 2))
+        ascii_text = chunk.translate(HEX_VIEW_ASCII_TABLE).decode('ascii')
+        prefix = ''
+        if timestamp_at is not None:
+            timestamp = timestamp_at(base_offset + start)
+            prefix = (datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S.%f")[:-3] if timestamp else ' ' * 12) + '  '
+        lines.append(f"{prefix}{base_offset + start:010X}  {hex_text:<{HEX_VIEW_WIDTH * 3 - 1}}  {ascii_text}")
+    return lines
+
+
+# ========== 系统日志结构化解析及过滤 ==========
+# Luat日志行：可选的时间戳，LuatOS格式“I/user.tag 内容”或LuaTask格式“[I]-[tag] 内容”
+LUAT_LOG_PATTERN = re.compile(
+    r'^(?:\[(?P<time>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?)\]\s*)?'
+    r'(?:(?P<level>[VDIWEF])/(?:user\.)?(?P<tag>[\w.]+)|\[(?P<level2>[VDIWEF])\]-\[(?P<tag2>[^\]]+)\])?'
+    r'[\s:]*(?P<message>.*)$'
+)
+# 日志头（与LUAT_LOG_PATTERN中时间戳或级别/标签匹配的条件相同）或没有日志头的短信回调开始一条新记录；
+# 按“换行+空白+记录开头”整批切分文本，不必逐行匹配
+LUAT_RECORD_START = (r'\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?\]|[VDIWEF]/(?:user\.)?[\w.]'
+                     r'|\[[VDIWEF]\]-\[[^\]]+\]|handler_sms\.smsCallback')
+LUAT_RECORD_SPLIT_PATTERN = re.compile(r'\n\s*(?=' + LUAT_RECORD_START + ')')
+LUAT_LOG_LEVELS = 'VDIWEF'
+# 标签 -> (驻留的标签, 驻留的模块名)
+LUAT_TAG_CACHE = {}
+
+
+class LuatLogRecord:
+    """一条Luat日志记录：保存原始文本（日志头行及续行），时间、级别、模块、标签和内容在首次访问时才解析
+
+    接收时大多数记录只需判断是否为短信回调，随后被过滤或在显示队列积压时丢弃，不必逐条解析字段。
+    级别、模块和标签解析后驻留，重复出现时共享同一字符串对象。
+    """
+
+    __slots__ = ('received', 'text', '_fields')
+
+    def __init__(self, received, text):
+        self.received = received
+        self.text = text
+        self._fields = None
+
+    def _parse(self):
+        header, _, rest = self.text.partition('\n')
+        device_time, level, tag, level2, tag2, message = LUAT_LOG_PATTERN.match(header).groups()
+        level = level or level2 or ''
+        if not device_time and not level:
+            # 没有日志头的行（如单独的短信回调行）整行作为内容
+            message = header
+        if rest:
+            message = message + '\n' + rest
+        tag = tag or tag2 or ''
+        names = LUAT_TAG_CACHE.get(tag)
+        if names is None:
+            # 模块名为标签的第一段，如handler_sms.smsCallback的模块为handler_sms
+            names = LUAT_TAG_CACHE[tag] = (sys.intern(tag), sys.intern(tag.split('.', 1)[0]))
+        # 级别为单个字符，本身已是共享对象
+        self._fields = (device_time or '', level, names[0], names[1], message)
+        return self._fields
+
+    def fields(self):
+        """(设备时间, 级别, 标签, 模块, 内容)"""
+        return self._fields or self._parse()
+
+    @property
+    def device_time(self):
+        return (self._fields or self._parse())[0]
+
+    @property
+    def level(self):
+        return (self._fields or self._parse())[1]
+
+    @property
+    def tag(self):
+        return (self._fields or self._parse())[2]
+
+    @property
+    def module(self):
+        return (self._fields or self._parse())[3]
+
+    @property
+    def message(self):
+        return (self._fields or self._parse())[4]
+
+    def is_sms_callback(self):
+        # 文本中没有回调标记时无需解析
+        if SMS_CALLBACK_MARKER not in self.text:
+            return False
+        return self.tag == SMS_CALLBACK_MARKER or (not self.tag and self.message.startswith(SMS_CALLBACK_MARKER))
+
+    def sms_callback_text(self):
+        """供parse_sms_callback使用的短信回调文本"""
+        return f"{self.tag} {self.message}" if self.tag else self.message
+
+    def line(self):
+        """还原为单行日志文本"""
+        parts = []
+        if self.device_time:
+            parts.append(f"[{self.device_time}]")
+        if self.tag:
+            parts.append(f"{self.level}/{self.tag}" if self.level else self.tag)
+        parts.append(self.message)
+        return ' '.join(parts)
+
+    def display(self):
+        """日志文本框中的显示格式"""
+        return f"[{time.strftime('%H:%M:%S', time.localtime(self.received))}] [系统端口] {self.line()}\n"
+
+
+class LuatLogParser:
+    """把系统日志文本流按行分帧为记录，字段由LuatLogRecord按需解析
+
+    没有日志头的行（如多行短信内容）并入上一条记录，因此一条记录在下一条日志头到来、
+    输入空闲（flush）或超过hold_timeout后才算结束。
+    """
+
+    def __init__(self, hold_timeout=0.5):
+        self.hold_timeout = hold_timeout
+        self.partial = ''
+        self.current = None
+        self.current_since = 0.0
+
+    def feed(self, text, received=None):
+        """输入一段文本，返回已结束的记录"""
+        received = received or time.time()
+        now = time.monotonic()
+        text = self.partial + text
+        cut = text.rfind('\n') + 1
+        self.partial = text[cut:]
+        completed = []
+        if not cut:
+            return completed
+        # 第一段是上一条记录的续行（或没有所属记录的行），其余每段是一条新记录
+        chunks = LUAT_RECORD_SPLIT_PATTERN.split('\n' + text[:cut])
+        current = self.current
+        for line in chunks[0].split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            if current is not None:
+                current.text += '\n' + line
+            else:
+                completed.append(LuatLogRecord(received, line))
+        append = completed.append
+        for chunk in chunks[1:]:
+            if current is not None:
+                append(current)
+            chunk = chunk.strip()
+            if '\n' in chunk:
+                # 续行逐行去掉首尾空白并跳过空行
+                chunk = '\n'.join(line for line in (line.strip() for line in chunk.split('\n')) if line)
+            current = LuatLogRecord(received, chunk)
+        if len(chunks) > 1:
+            self.current_since = now
+        if current is not None and now - self.current_since > self.hold_timeout:
+            append(current)
+            current = None
+        self.current = current
+        return completed
+
+    def flush(self, received=None):
+        """输入空闲时结束所有未完成的行和记录"""
+        completed = self.feed('\n', received) if self.partial.strip() else []
+        if self.current is not None:
+            completed.append(self.current)
+            self.current = None
+        return completed
+
+
+class LuatLogFilter:
+    """在接收时执行的系统日志过滤条件（级别、包含/排除模块、包含/排除正则），构造时预编译"""
+
+    def __init__(self, levels='', include_modules='', exclude_modules='', include_pattern='', exclude_pattern=''):
+        self.levels = frozenset(levels.upper()) & frozenset(LUAT_LOG_LEVELS)
+        self.include_modules = frozenset(sys.intern(m.strip()) for m in include_modules.split(',') if m.strip())
+        self.exclude_modules = frozenset(sys.intern(m.strip()) for m in exclude_modules.split(',') if m.strip())
+        # 正则无效时抛出re.error
+        self.include_pattern = re.compile(include_pattern) if include_pattern else None
+        self.exclude_pattern = re.compile(exclude_pattern) if exclude_pattern else None
+        self.active = bool(self.levels or self.include_modules or self.exclude_modules
+                           or self.include_pattern or self.exclude_pattern)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(**{key: settings.get(key, '') for key in
+                      ('levels', 'include_modules', 'exclude_modules', 'include_pattern', 'exclude_pattern')})
+
+    def accept(self, record):
+        """判断记录是否保留（无级别的记录不按级别过滤）"""
+        if not self.active:
+            return True
+        _, level, _, module, message = record.fields()
+        if self.levels and level and level not in self.levels:
+            return False
+        if self.include_modules and module not in self.include_modules:
+            return False
+        if module in self.exclude_modules:
+            return False
+        if self.include_pattern and not self.include_pattern.search(message):
+            return False
+        if self.exclude_pattern and self.exclude_pattern.search(message):
+            return False
+        return True
+
+
+def format_log_entry(entry):
+    """日志缓存项的显示文本（普通日志为已格式化的字符串，系统日志为结构化记录）"""
+    return entry if isinstance(entry, str) else entry.display()
+
+
+# ========== 系统日志背压控制 ==========
+MONITOR_RAW_QUEUE_SIZE = 64         # 读取→解析：原始数据块队列上限，满时暂停读取
+MONITOR_DISPLAY_QUEUE_SIZE = 2000   # 解析→显示：日志记录队列上限
+MONITOR_DISPLAY_BATCH = 200         # 每帧最多显示的日志条数
+MONITOR_DISPLAY_INTERVAL = 50       # 显示刷新间隔（毫秒）
+LOG_HISTORY_LIMIT = 20000           # 每类日志缓存的最大条数
+LOG_TEXT_MAX_LINES = 5000           # 日志文本框保留的最大行数
+
+
+class MonitorDisplayQueue:
+    """解析→显示之间的有界日志队列
+
+    队列超过高水位后只按比例采样保留日志，队满时丢弃，丢弃条数计入统计并在显示时汇总为一行。
+    只用于可丢弃的普通日志，短信回调不经过此队列。
+    """
+
+    def __init__(self, maxsize=MONITOR_DISPLAY_QUEUE_SIZE, high_water=0.75, sample_every=10):
+        self.maxsize = maxsize
+        self.high_water = int(maxsize * high_water)
+        self.sample_every = sample_every
+        self.records = collections.deque()
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.shed = 0
+        self.pending_shed = 0
+        self._sample_counter = 0
+
+    def put(self, record):
+        """放入一条日志，被采样丢弃或队满时返回False"""
+        with self.lock:
+            depth = len(self.records)
+            if depth >= self.high_water:
+                self._sample_counter += 1
+                if depth >= self.maxsize or self._sample_counter % self.sample_every:
+                    self.shed += 1
+                    self.pending_shed += 1
+                    return False
+            self.records.append(record)
+            self.accepted += 1
+            return True
+
+    def drain(self, limit=MONITOR_DISPLAY_BATCH):
+        """取出最多limit条日志，同时返回自上次取出以来丢弃的条数"""
+        with self.lock:
+            count = min(limit, len(self.records))
+            records = [self.records.popleft() for _ in range(count)]
+            skipped, self.pending_shed = self.pending_shed, 0
+        return records, skipped
+
+    def stats(self):
+        with self.lock:
+            return {'depth': len(self.records), 'accepted': self.accepted, 'shed': self.shed}
+
+
+# ========== 系统日志独立接收进程 ==========
+class SharedRingBuffer:
+    """单生产者单消费者的共享内存环形缓冲区，可在进程间传递记录
+
+    每条记录为 4字节长度 + 1字节类型 + 数据。head/tail为累计写入/读取的字节数，
+    生产者只修改head、消费者只修改tail，数据写完后才推进head，因此读写双方无需加锁。
+    """
+
+    HEADER = struct.Struct('<IB')
+
+    def __init__(self, capacity=4 * 1024 * 1024):
+        self.capacity = capacity
+        self.buffer = multiprocessing.RawArray('B', capacity)
+        self.head = multiprocessing.RawValue('Q', 0)
+        self.tail = multiprocessing.RawValue('Q', 0)
+        self.readable = multiprocessing.Event()
+        self._view = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_view'] = None
+        return state
+
+    @property
+    def view(self):
+        if self._view is None:
+            self._view = memoryview(self.buffer).cast('B')
+        return self._view
+
+    def _copy_in(self, position, data):
+        offset = position % self.capacity
+        first = min(len(data), self.capacity - offset)
+        self.view[offset:offset + first] = data[:first]
+        if first < len(data):
+            self.view[:len(data) - first] = data[first:]
+
+    def _copy_out(self, position, length):
+        offset = position % self.capacity
+        first = min(length, self.capacity - offset)
+        data = self.view[offset:offset + first].tobytes()
+        if first < length:
+            data += self.view[:length - first].tobytes()
+        return data
+
+    def free_space(self):
+        return self.capacity - (self.head.value - self.tail.value)
+
+    def write(self, kind, payload):
+        """写入一条记录（生产者调用），空间不足时返回False"""
+        limit = self.capacity // 4 - self.HEADER.size
+        if len(payload) > limit:
+            payload = payload[:limit]
+        total = self.HEADER.size + len(payload)
+        if total > self.free_space():
+            return False
+        head = self.head.value
+        self._copy_in(head, self.HEADER.pack(len(payload), kind))
+        self._copy_in(head + self.HEADER.size, payload)
+        self.head.value = head + total
+        self.readable.set()
+        return True
+
+    def read_all(self):
+        """读出当前所有记录（消费者调用），返回[(类型, 数据)]"""
+        records = []
+        tail = self.tail.value
+        head = self.head.value
+        while tail < head:
+            length, kind = self.HEADER.unpack(self._copy_out(tail, self.HEADER.size))
+            records.append((kind, self._copy_out(tail + self.HEADER.size, length)))
+            tail += self.HEADER.size + length
+        self.tail.value = tail
+        return records
+
+
+INGEST_RECORD_LOG = 0
+INGEST_RECORD_SMS = 1
+INGEST_RECORD_ERROR = 2
+INGEST_RECORD_STATUS = 3
+INGEST_RECORD_CAPTURE = 4
+INGEST_HOLD_TIMEOUT = 0.5
+
+
+def monitor_ingest_main(port_settings, ring, stop_event, filter_settings=None, byte_counter=None, capture_path=None,
+                        capture_control=None, capture_bytes=None):
+    """系统日志接收进程：独占监控串口，完成解码、分帧解析、过滤和短信回调提取，记录写入共享环形缓冲区
+
+    原始数据抓取由GUI进程通过capture_control队列发送('start', 路径)/('stop', None)控制，
+    抓取字节数累加到capture_bytes，停止后回送INGEST_RECORD_CAPTURE记录。
+    """
+    def put(kind, payload):
+        # 缓冲区满时等待GUI进程读取，串口数据暂存在驱动缓冲区中
+        while not ring.write(kind, payload):
+            if stop_event.wait(0.01):
+                return
+
+    def put_status(message=''):
+        # 断线、重连时把连接统计发给GUI进程
+        status = {'message': message, 'stats': reader.stats()}
+        put(INGEST_RECORD_STATUS, json.dumps(status, ensure_ascii=False).encode('utf-8'))
+
+    def put_capture(path, error=None):
+        result = {'path': path, 'bytes': capture_bytes.value if capture_bytes is not None else 0, 'error': error}
+        put(INGEST_RECORD_CAPTURE, json.dumps(result, ensure_ascii=False).encode('utf-8'))
+
+    def apply_capture_control(capture):
+        # 处理GUI进程发来的抓取开始/停止请求，返回当前的抓取文件
+        while True:
+            try:
+                action, path = capture_control.get_nowait()
+            except queue.Empty:
+                return capture
+            if capture:
+                capture.close()
+                if action == 'stop':
+                    put_capture(capture.path)
+                capture = None
+            if action == 'start':
+                try:
+                    capture = RawCaptureWriter(path)
+                except OSError as e:
+                    put_capture(path, str(e))
+
+    reader = SupervisedSerialReader(port_settings, stop_event, put_status)
+    try:
+        log_filter = LuatLogFilter.from_settings(filter_settings or {})
+        capture = RawCaptureWriter(capture_path) if capture_path else None
+        reader.open()
+    except Exception as e:
+        put(INGEST_RECORD_ERROR, f"打开系统日志端口失败: {str(e)}".encode('utf-8'))
+        return
+
+    reader.identify()
+    put_status()
+    # 收到停止通知后立即取消阻塞的读取，不必等待读取超时
+    def cancel_on_stop():
+        stop_event.wait()
+        reader.cancel()
+
+    threading.Thread(target=cancel_on_stop, daemon=True).start()
+    framer = reader.framer
+    parser = LuatLogParser(hold_timeout=INGEST_HOLD_TIMEOUT)
+    try:
+        while not stop_event.is_set():
+            received = reader.fill()
+            if received is None:
+                # 断线重连期间保留未结束的行和记录，重连后继续拼接
+                continue
+            if byte_counter is not None:
+                byte_counter.value += received
+            if capture_control is not None:
+                capture = apply_capture_control(capture)
+            if capture and received:
+                capture.write(framer.view[framer.end - received:framer.end])
+                if capture_bytes is not None:
+                    capture_bytes.value += received
+            # 读取超时说明输入空闲，取出未结束的行并结束所有未完成的记录
+            block = framer.take_lines(flush=not received)
+            records = parser.feed(block.decode('utf-8', errors='replace')) if block else []
+            if not received:
+                records += parser.flush()
+            for record in records:
+                # 短信回调不受过滤条件影响
+                if record.is_sms_callback():
+                    timestamp = record.device_time or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+                    sms_info = parse_sms_callback(record.sms_callback_text(), timestamp)
+                    put(INGEST_RECORD_SMS, json.dumps(sms_info, ensure_ascii=False).encode('utf-8'))
+                if log_filter.accept(record):
+                    put(INGEST_RECORD_LOG, record.text.encode('utf-8'))
+    except Exception as e:
+        put(INGEST_RECORD_ERROR, f"接收数据错误: {str(e)}".encode('utf-8'))
+    finally:
+        reader.close()
+        if capture:
+            capture.close()
+
+
+# ========== 本地HTTP/JSON API ==========
+HTTP_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error',
+                503: 'Service Unavailable', 504: 'Gateway Timeout'}
+API_MAX_BODY = 4 * 1024 * 1024
+BULK_JOB_TTL = 3600       # 已完成的批量发送任务保留时长（秒）
+BULK_JOB_MAX = 100        # 最多保留的批量发送任务数，超过时先淘汰最早完成的任务
+
+
+class LocalApiServer:
+    """本地HTTP/JSON API：在独立线程的asyncio事件循环中处理所有客户端连接
+
+    路由处理函数为协程 handler(query, body)，返回(状态码, JSON对象)。
+    除普通路由外，POST /rpc 按JSON-RPC 2.0调用注册了rpc_name的路由。
+    """
+
+    def __init__(self, host, port, log_callback=None):
+        self.host = host
+        self.port = port
+        self.log_callback = log_callback
+        self.routes = {}
+        self.rpc_methods = {}
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+        self.start_error = None
+
+    def add_route(self, method, path, handler, rpc_name=None):
+        """注册路由，可同时注册为JSON-RPC方法"""
+        self.routes[(method, path)] = handler
+        if rpc_name:
+            self.rpc_methods[rpc_name] = handler
+
+    def start(self):
+        """在后台线程中启动事件循环，监听失败时抛出异常"""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.started.wait(5)
+        if self.start_error:
+            raise self.start_error
+
+    def stop(self):
+        """停止事件循环"""
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=1)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port)
+            )
+        except OSError as e:
+            self.start_error = e
+            self.started.set()
+            return
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            # 取消仍在处理的连接，并等待其完成清理
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    async def _handle_client(self, reader, writer):
+        """处理单个连接，支持HTTP/1.1长连接"""
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), timeout=60)
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > API_MAX_BODY:
+                    status, payload = 413, {'error': '请求体过大'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self._dispatch(method, target, body)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'OK')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # 停止服务时取消的连接直接关闭
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        try:
+            payload = json.loads(body.decode('utf-8')) if body else {}
+        except ValueError:
+            return 400, {'error': '请求体不是有效的JSON'}
+
+        if method == 'POST' and url.path == '/rpc':
+            return await self._dispatch_rpc(payload)
+
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return 405, {'error': '不支持的请求方法'}
+            return 404, {'error': '接口不存在'}
+        return await self._call(handler, query, payload)
+
+    async def _dispatch_rpc(self, request):
+        request_id = request.get('id') if isinstance(request, dict) else None
+        handler = self.rpc_methods.get(request.get('method')) if isinstance(request, dict) else None
+        if handler is None:
+            return 200, {'jsonrpc': '2.0', 'error': {'code': -32601, 'message': '方法不存在'}, 'id': request_id}
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            return 200, {'jsonrpc': '2.0', 'error': {'code': -32602, 'message': 'params必须是对象'}, 'id': request_id}
+        status, result = await self._call(handler, params, params)
+        if status >= 400:
+            return 200, {'jsonrpc': '2.0', 'error': {'code': -32000 - status, 'message': result.get('error')}, 'id': request_id}
+        return 200, {'jsonrpc': '2.0', 'result': result, 'id': request_id}
+
+    async def _call(self, handler, query, payload):
+        try:
+            return await handler(query, payload)
+        except Exception as e:
+            if self.log_callback:
+                self.log_callback(f"本地API处理请求时发生错误: {str(e)}")
+            return 500, {'error': str(e)}
+
+
+# ========== SIM卡档案缓存 ==========
+# 读取手机号码的AT指令（ICCID由get_sim_iccid单独读取，SIM卡状态和信号由其他流程查询）
+SIM_NUMBER_COMMANDS = ('AT+CNUM', 'AT^HFSN')
+# 指令支持情况超过该时间（秒）后重新探测
+SIM_CAPABILITY_REPROBE_AGE = 7 * 24 * 3600
+AT_ERROR_PATTERN = re.compile(r'(^|\s)(\+CM[ES] )?ERROR\b')
+
+
+class SimProfileCache:
+    """以ICCID为键的SIM卡档案缓存（号码、运营商、短信中心、指令支持情况），持久化到JSON文件"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._profiles = json.load(f)
+        except (OSError, ValueError):
+            self._profiles = {}
+
+    def get(self, iccid):
+        """按ICCID读取档案副本，不存在时返回None"""
+        with self._lock:
+            profile = self._profiles.get(iccid)
+            return json.loads(json.dumps(profile)) if profile else None
+
+    def put(self, iccid, profile):
+        """保存档案并写入文件"""
+        with self._lock:
+            self._profiles[iccid] = dict(profile, updated_at=time.time())
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._profiles, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+
+
+# ========== 网络状态后台监测 ==========
+REGISTRATION_STATES = {0: '未注册', 1: '已注册', 2: '搜索中', 3: '注册被拒绝', 4: '未知', 5: '已注册(漫游)'}
+
+
+def parse_network_status(responses):
+    """解析AT+CSQ/AT+CREG?/AT+COPS?响应，返回网络状态字典"""
+    status = {'rssi': None, 'signal_dbm': None, 'ber': None, 'registration': None, 'operator': None}
+
+    match = re.search(r'\+CSQ:\s*(\d+),\s*(\d+)', responses.get('AT+CSQ') or '')
+    if match:
+        rssi = int(match.group(1))
+        status['ber'] = int(match.group(2))
+        if rssi != 99:
+            status['rssi'] = rssi
+            status['signal_dbm'] = -113 + 2 * rssi
+
+    match = re.search(r'\+CREG:\s*\d+,\s*(\d)', responses.get('AT+CREG?') or '')
+    if match:
+        status['registration'] = int(match.group(1))
+
+    match = re.search(r'\+COPS:\s*\d+,\d+,"(.*?)"', responses.get('AT+COPS?') or '')
+    if match:
+        status['operator'] = match.group(1)
+    return status
+
+
+class NetworkStatusMonitor:
+    """网络状态后台监测：自适应间隔轮询信号、注册状态和运营商，结果写入缓存
+
+    状态不稳定（未注册、注册状态变化、信号波动较大）时按最短间隔轮询，
+    稳定后间隔逐步翻倍至最长间隔。query(commands, deadline) 负责以后台事务执行指令。
+    """
+
+    COMMANDS = ('AT+CSQ', 'AT+CREG?', 'AT+COPS?')
+    MIN_INTERVAL = 2.0
+    MAX_INTERVAL = 30.0
+    # 轮询的过期时限固定且大于AtPortScheduler.BACKGROUND_MAX_WAIT（30秒），
+    # 批量发送期间后台事务等待老化提升后仍能执行，不会因轮询间隔较短而过期
+    POLL_DEADLINE = 45.0
+    SIGNAL_JITTER = 3
+
+    def __init__(self, query, listener=None):
+        self.query = query
+        self.listener = listener
+        self.interval = self.MIN_INTERVAL
+        self._status = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """启动监测线程"""
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止监测线程"""
+        self._stop_event.set()
+
+    def snapshot(self, max_age=None):
+        """返回缓存的网络状态副本，超过max_age秒未更新时返回None"""
+        with self._lock:
+            status = self._status
+        if status is None or (max_age is not None and time.time() - status['updated_at'] > max_age):
+            return None
+        return dict(status)
+
+    def _is_stable(self, previous, current):
+        if current['registration'] not in (1, 5) or current['rssi'] is None:
+            return False
+        if previous is None or previous['registration'] != current['registration']:
+            return False
+        if previous['rssi'] is None or abs(previous['rssi'] - current['rssi']) >= self.SIGNAL_JITTER:
+            return False
+        return True
+
+    def _worker(self):
+        while not self._stop_event.is_set():
+            try:
+                # 过期未执行的轮询直接丢弃，不占用AT端口
+                responses = self.query(self.COMMANDS, time.time() + self.POLL_DEADLINE)
+            except Exception:
+                responses = None
+
+            if responses:
+                current = parse_network_status(responses)
+                current['updated_at'] = time.time()
+                with self._lock:
+                    previous = self._status
+                    self._status = current
+                if self._is_stable(previous, current):
+                    self.interval = min(self.interval * 2, self.MAX_INTERVAL)
+                else:
+                    self.interval = self.MIN_INTERVAL
+                current['interval'] = self.interval
+                if self.listener:
+                    try:
+                        self.listener(dict(current))
+                    except Exception:
+                        pass
+
+            self._stop_event.wait(self.interval)
+
+
+# ========== 运行指标时间序列 ==========
+METRICS_FILE = os.path.join(APP_DATA_DIR, 'metrics.bin')
+# 各级桶：(桶宽秒数, 桶数量)，分别覆盖1小时、24小时和7天
+METRICS_TIERS = ((10, 360), (60, 1440), (600, 1008))
+METRICS_SERIES = {
+    'signal_dbm': 'gauge',
+    'registered': 'gauge',
+    'sms_in': 'counter',
+    'sms_out': 'counter',
+    'monitor_bytes': 'counter'
+}
+# 状态图表：(指标, 标题, 单位, 显示换算系数)
+METRICS_CHARTS = (
+    ('signal_dbm', "信号强度", "dBm", 1),
+    ('registered', "网络已注册", "%", 100),
+    ('sms_in', "接收短信", "条/分", 60),
+    ('sms_out', "发送短信", "条/分", 60),
+    ('monitor_bytes', "系统日志接收", "KB/s", 1 / 1024)
+)
+METRICS_RANGES = (("最近1小时", 3600), ("最近24小时", 86400), ("最近7天", 7 * 86400))
+METRICS_TICK_INTERVAL = 10000
+# gauge指标只在网络状态轮询时记录（稳定后每30秒一次），查询时用最近的值填充其后该时长内的空桶
+METRICS_GAUGE_FILL = 2 * NetworkStatusMonitor.MAX_INTERVAL
+METRICS_SAVE_TICKS = 30
+
+
+class TimeSeriesStore:
+    """运行指标时间序列：每个指标按多级固定数量的桶降采样，占用内存固定
+
+    gauge类指标（信号、注册状态）记录每个桶内样本的总和、个数、最小及最大值；
+    counter类指标（短信条数、字节数）累加每个桶内的增量，查询时换算为每秒速率。
+    桶按 时间戳 // 桶宽 循环使用，写入时发现桶编号不同即视为过期并清空，无需后台清理。
+    """
+
+    MAGIC = b'AIRTS1\n'
+    FIELDS = ('ids', 'sum', 'count', 'min', 'max')
+
+    def __init__(self, series=None, tiers=METRICS_TIERS):
+        self.series = dict(series or METRICS_SERIES)
+        self.tiers = tuple(tuple(tier) for tier in tiers)
+        self._lock = threading.Lock()
+        self._buckets = {(name, step): self._empty(size) for name in self.series for step, size in self.tiers}
+
+    @staticmethod
+    def _empty(size):
+        buckets = {'ids': array.array('q', [-1]) * size}
+        for field in ('sum', 'count', 'min', 'max'):
+            buckets[field] = array.array('d', [0.0]) * size
+        return buckets
+
+    def _update(self, name, value, timestamp):
+        for step, size in self.tiers:
+            buckets = self._buckets[(name, step)]
+            bucket_id = int(timestamp // step)
+            index = bucket_id % size
+            if buckets['ids'][index] != bucket_id:
+                buckets['ids'][index] = bucket_id
+                buckets['sum'][index] = 0.0
+                buckets['count'][index] = 0.0
+                buckets['min'][index] = value
+                buckets['max'][index] = value
+            buckets['sum'][index] += value
+            buckets['count'][index] += 1
+            if value < buckets['min'][index]:
+                buckets['min'][index] = value
+            if value > buckets['max'][index]:
+                buckets['max'][index] = value
+
+    def record(self, name, value, timestamp=None):
+        """记录gauge指标的一个样本"""
+        with self._lock:
+            self._update(name, float(value), time.time() if timestamp is None else timestamp)
+
+    def add(self, name, amount=1, timestamp=None):
+        """累加counter指标"""
+        with self._lock:
+            self._update(name, float(amount), time.time() if timestamp is None else timestamp)
+
+    def touch(self, timestamp=None):
+        """标记当前时间程序在运行：counter指标累加0，使没有事件的时段显示为0而不是无数据"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            for name, kind in self.series.items():
+                if kind == 'counter':
+                    self._update(name, 0.0, timestamp)
+
+    def query(self, name, span, now=None, gauge_fill=METRICS_GAUGE_FILL):
+        """返回最近span秒的数据点 (桶起始时间, 值, 最小值, 最大值)
+
+        使用能覆盖span的最细一级桶；gauge的值为桶内平均值，counter为每秒速率；没有数据的桶值为None。
+        gauge指标的空桶用gauge_fill秒内最近一个有数据的桶的平均值填充（轮询间隔可能大于桶宽）。
+        """
+        step, size = next((tier for tier in self.tiers if tier[0] * tier[1] >= span), self.tiers[-1])
+        now = time.time() if now is None else now
+        last_id = int(now // step)
+        count = min(size, max(1, int(math.ceil(span / step))))
+        gauge = self.series[name] == 'gauge'
+        # gauge从查询范围之前的几个桶开始扫描，范围开头的空桶也能填充
+        lookback = min(size - count, int(gauge_fill // step)) if gauge else 0
+        first_id = last_id - count + 1
+        points = []
+        last_value = None
+        last_value_id = None
+        with self._lock:
+            buckets = self._buckets[(name, step)]
+            for bucket_id in range(first_id - lookback, last_id + 1):
+                index = bucket_id % size
+                if buckets['ids'][index] != bucket_id or not buckets['count'][index]:
+                    point = (bucket_id * step, None, None, None)
+                    if last_value_id is not None and (bucket_id - last_value_id) * step <= gauge_fill:
+                        point = (bucket_id * step, last_value, last_value, last_value)
+                elif gauge:
+                    last_value = buckets['sum'][index] / buckets['count'][index]
+                    last_value_id = bucket_id
+                    point = (bucket_id * step, last_value, buckets['min'][index], buckets['max'][index])
+                else:
+                    rate = buckets['sum'][index] / step
+                    point = (bucket_id * step, rate, rate, rate)
+                if bucket_id >= first_id:
+                    points.append(point)
+        return points
+
+    def save(self, path=METRICS_FILE):
+        """保存为二进制文件（文件头 + 指标及分级定义JSON + 各桶数组）"""
+        meta = json.dumps({'series': self.series, 'tiers': self.tiers}).encode('utf-8')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with self._lock:
+            with open(temp_path, 'wb') as f:
+                f.write(self.MAGIC)
+                f.write(len(meta).to_bytes(4, 'big'))
+                f.write(meta)
+                for key in sorted(self._buckets):
+                    for field in self.FIELDS:
+                        self._buckets[key][field].tofile(f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=METRICS_FILE):
+        """从二进制文件加载，文件无效或指标定义已变化时抛出ValueError"""
+        with open(path, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError("运行指标文件格式无效")
+            meta = json.loads(f.read(int.from_bytes(f.read(4), 'big')).decode('utf-8'))
+            store = cls(meta['series'], meta['tiers'])
+            if store.series != METRICS_SERIES or store.tiers != METRICS_TIERS:
+                raise ValueError("运行指标定义已变化")
+            try:
+                for key in sorted(store._buckets):
+                    for field in cls.FIELDS:
+                        values = store._buckets[key][field]
+                        size = len(values)
+                        del values[:]
+                        values.fromfile(f, size)
+            except EOFError:
+                raise ValueError("运行指标文件长度不正确")
+        return store
+
+
+# ========== AT端口调度器 ==========
+class AtPortScheduler:
+    """AT端口调度器：唯一的工作线程独占AT通道，按优先级通道依次执行事务
+
+    事务是一个无参可调用对象，在工作线程中执行，期间可连续发送多条AT指令而不会被其他事务打断。
+    紧急通道（交互/验证码发送、新短信读取）始终优先；批量通道其次；后台通道（状态查询）最后，
+    但后台事务等待超过 BACKGROUND_MAX_WAIT 秒后优先于批量事务执行，避免被批量发送饿死。
+    """
+
+    URGENT = 0
+    BULK = 1
+    BACKGROUND = 2
+    BACKGROUND_MAX_WAIT = 30.0
+
+    def __init__(self, log_callback=None):
+        self.log_callback = log_callback
+        self._condition = threading.Condition()
+        self._lanes = {priority: collections.deque() for priority in (self.URGENT, self.BULK, self.BACKGROUND)}
+        self.running = False
+        self.thread = None
+        self.executed_count = {priority: 0 for priority in self._lanes}
+        self.expired_count = 0
+
+    def start(self):
+        """启动调度线程"""
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止调度线程，未执行的事务以ConnectionError结束"""
+        with self._condition:
+            self.running = False
+            pending = [item for lane in self._lanes.values() for item in lane]
+            for lane in self._lanes.values():
+                lane.clear()
+            self._condition.notify_all()
+        for item in pending:
+            if not item['future'].done():
+                item['future'].set_exception(ConnectionError("AT端口已断开"))
+
+    def in_worker_thread(self):
+        """当前是否在调度线程中（事务内部直接执行AT指令）"""
+        return threading.current_thread() is self.thread
+
+    def submit(self, transaction, priority=BACKGROUND, deadline=None, name=None):
+        """提交事务，返回Future；deadline为绝对时间，到期仍未开始的事务以TimeoutError结束"""
+        future = concurrent.futures.Future()
+        with self._condition:
+            if not self.running:
+                future.set_exception(ConnectionError("AT端口未连接"))
+                return future
+            self._lanes[priority].append({
+                'transaction': transaction,
+                'future': future,
+                'deadline': deadline,
+                'enqueued_at': time.time(),
+                'name': name
+            })
+            self._condition.notify()
+        return future
+
+    def run(self, transaction, priority=BACKGROUND, deadline=None, name=None):
+        """提交事务并等待结果；在调度线程内调用时直接执行"""
+        if self.in_worker_thread():
+            return transaction()
+        return self.submit(transaction, priority, deadline, name).result()
+
+    def queue_sizes(self):
+        """各通道排队数量"""
+        with self._condition:
+            return {'urgent': len(self._lanes[self.URGENT]),
+                    'bulk': len(self._lanes[self.BULK]),
+                    'background': len(self._lanes[self.BACKGROUND])}
+
+    def _next_item(self):
+        """按优先级选取下一个事务（需持有锁）"""
+        if self._lanes[self.URGENT]:
+            return self._lanes[self.URGENT].popleft()
+        bulk = self._lanes[self.BULK]
+        background = self._lanes[self.BACKGROUND]
+        if background and bulk and time.time() - background[0]['enqueued_at'] > self.BACKGROUND_MAX_WAIT:
+            return background.popleft()
+        if bulk:
+            return bulk.popleft()
+        if background:
+            return background.popleft()
+        return None
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                item = None
+                while self.running:
+                    item = self._next_item()
+                    if item is not None:
+                        break
+                    self._condition.wait()
+                if not self.running:
+                    return
+
+            if item['deadline'] is not None and time.time() > item['deadline']:
+                self.expired_count += 1
+                if not item['future'].done():
+                    item['future'].set_exception(TimeoutError(f"AT事务已过期: {item['name'] or ''}"))
+                continue
+            if not item['future'].set_running_or_notify_cancel():
+                continue
+            try:
+                result = item['transaction']()
+            except Exception as e:
+                item['future'].set_exception(e)
+            else:
+                item['future'].set_result(result)
+
+
+# ========== AT端口读写通道 ==========
+# 命令最终结果码
+AT_FINAL_RESULTS = (b'OK', b'ERROR', b'+CME ERROR', b'+CMS ERROR', b'NO CARRIER')
+# 主动上报(URC)前缀，其中+CMT/+CDS的下一行为PDU数据
+AT_URC_PREFIXES = (b'+CMTI:', b'+CMT:', b'+CDS:', b'+CDSI:')
+AT_URC_WITH_PAYLOAD = (b'+CMT:', b'+CDS:')
+
+
+class AtCommandChannel:
+    """AT端口读写通道：后台线程独占读取串口，将命令响应与主动上报(URC)分流"""
+
+    def __init__(self, ser, urc_callback, error_callback=None):
+        self.ser = ser
+        self.urc_callback = urc_callback
+        self.error_callback = error_callback
+        self.running = False
+        self.thread = None
+        self._buffer = bytearray()
+        # 同一时刻只允许一条命令在途
+        self._transaction_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._response_lines = None
+        self._response_done = threading.Event()
+        self._urc_header = None
+
+    def start(self):
+        """启动后台读取线程"""
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止后台读取线程并取消正在阻塞的读写，在途命令立即返回（串口由调用方关闭）"""
+        with self._state_lock:
+            self.running = False
+            self._response_done.set()
+        cancel_serial_io(self.ser)
+
+    def transact(self, command, timeout):
+        """发送一条命令并等待最终结果码或'>'提示符，超时返回已收到的部分响应"""
+        with self._transaction_lock:
+            with self._state_lock:
+                if not self.running:
+                    raise ConnectionError("AT端口已断开")
+                self._response_lines = []
+                self._response_done.clear()
+            self.ser.write(command.encode('utf-8'))
+            self._response_done.wait(timeout)
+            with self._state_lock:
+                lines = self._response_lines
+                self._response_lines = None
+        return b'\r\n'.join(lines).decode('utf-8', errors='ignore').strip()
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                if self.running and self.error_callback:
+                    self.error_callback(e)
+                break
+            if data:
+                self._feed(data)
+
+    def _feed(self, data):
+        self._buffer += data
+        while True:
+            pos = self._buffer.find(b'\n')
+            if pos == -1:
+                break
+            line = bytes(self._buffer[:pos]).strip()
+            del self._buffer[:pos + 1]
+            if line:
+                self._handle_line(line)
+
+        # '>'提示符后没有换行，单独识别
+        if self._buffer.strip() == b'>':
+            with self._state_lock:
+                if self._response_lines is not None:
+                    self._response_lines.append(b'>')
+                    self._buffer.clear()
+                    self._response_done.set()
+
+    def _handle_line(self, line):
+        if self._urc_header is not None:
+            header = self._urc_header
+            self._urc_header = None
+            self._dispatch_urc(header, line)
+            return
+
+        if line.startswith(AT_URC_PREFIXES):
+            if line.startswith(AT_URC_WITH_PAYLOAD):
+                self._urc_header = line
+            else:
+                self._dispatch_urc(line, None)
+            return
+
+        with self._state_lock:
+            if self._response_lines is not None:
+                self._response_lines.append(line)
+                if line.startswith(AT_FINAL_RESULTS):
+                    self._response_done.set()
+
+    def _dispatch_urc(self, header, payload):
+        try:
+            self.urc_callback(
+                header.decode('utf-8', errors='ignore'),
+                payload.decode('utf-8', errors='ignore') if payload is not None else None
+            )
+        except Exception:
+            pass
+
+
+# ========== AT指令脚本 ==========
+AT_SCRIPT_DIR = os.path.join(APP_DATA_DIR, 'at_scripts')
+AT_SCRIPT_TIMEOUT = 5.0
+# 合并为一行发送的查询指令数量及命令行长度上限
+AT_PIPELINE_MAX_COMMANDS = 6
+AT_PIPELINE_MAX_LENGTH = 200
+# 响应带有指令前缀的执行类查询（查询类 AT+XXX? / AT+XXX=? 均可合并）
+AT_PIPELINE_EXECUTE = ('+CSQ', '+CPAS', '+CNUM', '+CCLK')
+AT_EXTENDED_PATTERN = re.compile(r'^AT([+^][A-Z0-9]+)(\?|=\?)?$', re.IGNORECASE)
+AT_FINAL_RESULT_TEXTS = tuple(result.decode('ascii') for result in AT_FINAL_RESULTS)
+
+
+def parse_at_script(text):
+    """解析AT脚本：每行一条指令，忽略空行和#注释，缺少AT前缀时自动补上"""
+    commands = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if not line.upper().startswith('AT'):
+            line = 'AT' + line
+        commands.append(line)
+    return commands
+
+
+def at_pipeline_prefix(command):
+    """可与其他查询合并发送的指令返回其响应前缀（如'+CREG'），否则返回None"""
+    match = AT_EXTENDED_PATTERN.match(command)
+    if not match:
+        return None
+    prefix = match.group(1).upper()
+    if match.group(2) or prefix in AT_PIPELINE_EXECUTE:
+        return prefix
+    return None
+
+
+def plan_at_script(commands, pipeline=False):
+    """把脚本指令分组：开启合并时，相邻的独立查询合并为一组，其余指令单独成组"""
+    groups = []
+    for command in commands:
+        if pipeline and at_pipeline_prefix(command) and groups:
+            group = groups[-1]
+            prefixes = [at_pipeline_prefix(item) for item in group]
+            length = len(join_at_commands(group + [command]))
+            if (all(prefixes) and at_pipeline_prefix(command) not in prefixes
+                    and len(group) < AT_PIPELINE_MAX_COMMANDS and length <= AT_PIPELINE_MAX_LENGTH):
+                group.append(command)
+                continue
+        groups.append([command])
+    return groups
+
+
+def join_at_commands(group):
+    """按V.25ter语法把多条扩展指令合并为一行，如 AT+CSQ;+CREG?"""
+    return group[0] + ''.join(';' + command[2:] for command in group[1:])
+
+
+def split_at_response(group, response):
+    """按指令前缀把合并发送的响应拆分到各条指令，最终结果不是OK时返回None"""
+    lines = [line.strip() for line in response.splitlines() if line.strip()]
+    if not lines or lines[-1] != 'OK':
+        return None
+    results = []
+    for command in group:
+        prefix = at_pipeline_prefix(command) + ':'
+        results.append('\r\n'.join([line for line in lines if line.upper().startswith(prefix)] + ['OK']))
+    return results
+
+
+def execute_at_group(transact, group, timeout=AT_SCRIPT_TIMEOUT):
+    """执行一组指令（在AT事务中调用），返回每条指令的响应及往返耗时
+
+    合并发送失败时逐条重发，以便定位出错的指令。
+    """
+    if len(group) > 1:
+        started = time.perf_counter()
+        response = transact(join_at_commands(group) + '\r\n', timeout)
+        rtt = (time.perf_counter() - started) * 1000
+        responses = split_at_response(group, response)
+        if responses is not None:
+            return [{'command': command, 'response': text, 'rtt_ms': round(rtt, 1), 'batch': len(group)}
+                    for command, text in zip(group, responses)]
+    results = []
+    for command in group:
+        started = time.perf_counter()
+        response = transact(command + '\r\n', timeout)
+        rtt = (time.perf_counter() - started) * 1000
+        lines = response.splitlines()
+        if not lines or not lines[-1].strip().startswith(AT_FINAL_RESULT_TEXTS):
+            response += "\r\n（等待响应超时）"
+        results.append({'command': command, 'response': response, 'rtt_ms': round(rtt, 1), 'batch': 1})
+    return results
+
+
+def list_at_scripts():
+    """已保存的AT脚本名称"""
+    if not os.path.isdir(AT_SCRIPT_DIR):
+        return []
+    return sorted(name[:-3] for name in os.listdir(AT_SCRIPT_DIR) if name.endswith('.at'))
+
+
+def load_at_script(name):
+    with open(os.path.join(AT_SCRIPT_DIR, name + '.at'), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def save_at_script(name, text):
+    """保存AT脚本，名称中的路径分隔符替换为下划线"""
+    name = re.sub(r'[\\/:*?"<>|]', '_', name.strip())
+    os.makedirs(AT_SCRIPT_DIR, exist_ok=True)
+    with open(os.path.join(AT_SCRIPT_DIR, name + '.at'), 'w', encoding='utf-8') as f:
+        f.write(text)
+    return name
+
 
 class CombinedAir724UGTool:
-    def __init__(self, root):
+    def __init__(self, root, startup_profiler=None):
         self.root = root
+        # 启动耗时统计，串口枚举放到后台线程，与界面构建并行
+        self.startup = startup_profiler or StartupProfiler()
+        # 性能分析（未开启时为None，热点方法直接调用）
+        self.profiling = None
+        self.port_discovery = concurrent.futures.Future()
+        threading.Thread(target=self._discover_ports, daemon=True).start()
         self.root.title("Air724UG&780 综合工具")
         self.root.geometry("1100x800")  # 增大窗口宽度以优化界面
         self.root.resizable(True, True)
@@ -76,6 +3360,11 @@ class CombinedAir724UGTool:
         self.monitor_connected = False
         self.monitor_running = False
         self.monitor_thread = None
+        self.monitor_parse_thread = None
+        # 独立接收进程模式：由子进程独占系统日志端口，记录经共享环形缓冲区传回
+        self.monitor_ingest = None
+        self.monitor_ingest_stop = None
+        self.monitor_ring = None
 
         # 设备信息变量
         self.phone_number_var = tk.StringVar(value="未连接")
@@ -86,9 +3375,79 @@ class CombinedAir724UGTool:
         self.sms_count_var = tk.StringVar(value="发送统计: 共发送 0 条，成功 0 条")
         self.sms_sent_count = 0
         self.sms_success_count = 0
+        # 短信编码及分段预估提示
+        self.sms_encoding_var = tk.StringVar(value="编码: GSM 7-bit，共 0 段 (0/160)")
+        # 长短信拼接参考号
+        self.sms_concat_reference = 0
         
         # 最新短信信息，用于存储最近收到的短信的完整信息
         self.latest_sms_info = {}
+
+        # AT端口读写通道、事务调度器及主动上报(URC)处理
+        self.at_channel = None
+        self.at_scheduler = None
+        # 网络状态后台监测（信号、注册状态、运营商缓存）
+        self.network_monitor = None
+        self.network_status_var = tk.StringVar(value="未知")
+        self.urc_queue = queue.Queue()
+        # AT指令控制台及运行状态图表窗口
+        self.at_console = None
+        self.metrics_window = None
+        self.merged_inbox_window = None
+        self.at_console_thread = None
+        self.urc_running = False
+        self.urc_thread = None
+        # URC订阅者（前缀 -> 回调列表）和新短信订阅者
+        self.urc_subscribers = {}
+        self.sms_subscribers = []
+        self.sms_publish_lock = threading.Lock()
+        # 最近发布的短信标识，用于多来源去重
+        self.recent_sms_keys = collections.deque(maxlen=256)
+        # 长短信分段缓存（发件人, 参考号, 总段数）-> {'parts': {序号: 内容}, 'time': 时间}
+        self.sms_concat_parts = {}
+
+        # 短信送达报告跟踪
+        self.delivery_tracker = DeliveryReportTracker()
+        self.delivery_stats_var = tk.StringVar(value="送达统计: 暂无送达报告")
+
+        # 验证码等待登记表，随新短信分发
+        self.sms_waiters = SmsWaiterRegistry()
+        self.subscribe_sms(self.sms_waiters.dispatch)
+
+        # 本地配置及新短信推送
+        self.settings = load_settings()
+        self.push_delivery = None
+
+        # 本地API：已接收短信列表及批量发送任务
+        self.api_server = None
+        self.inbox_store = InboxStore()
+        # 收件箱当前页最新一条短信的id，None表示显示最新一页（随新短信更新）
+        self.inbox_anchor = None
+        self.inbox_page_size = 50
+        self.replay_thread = None
+        # 收件箱待显示内容，按帧合并为一次渲染
+        self.inbox_pending = []
+        self.inbox_pending_lock = threading.Lock()
+        self.inbox_render_scheduled = False
+        self.inbox_render_interval = 16  # 毫秒，约一帧
+        self.bulk_jobs = {}
+        self.bulk_job_id = 0
+        # 批量发送中各条短信的任务句柄，事件循环只保留弱引用，完成前须由这里持有
+        self.bulk_tasks = set()
+        self.pending_send_count = 0
+        # SIM卡信息（供后台线程读取，避免跨线程访问Tk变量）
+        self.sim_phone_number = None
+        self.sim_carrier = None
+        self.sim_iccid = None
+        self.sms_device_port = None
+        # 多设备合并收件箱：短信端口连接后、ICCID读取完成前收到的短信暂不写入分片，确定设备标识后再写入
+        self.sim_identity_pending = False
+        self.pending_shard_messages = []
+        self.inbox_shard_lock = threading.Lock()
+        self.inbox_shard_reader = InboxShardReader()
+        self.sim_sms_center = None
+        # 以ICCID为键的SIM卡档案缓存，重连时快速恢复
+        self.sim_profiles = SimProfileCache(os.path.join(APP_DATA_DIR, 'sim_profiles.json'))
         
         # 自动复制验证码复选框变量
         self.auto_copy_verification_var = tk.BooleanVar(value=False)
@@ -98,10 +3457,32 @@ class CombinedAir724UGTool:
 
         # 日志类型选择变量
         self.log_type = tk.StringVar(value="all")
-        # 日志缓存，按类型分类
-        self.all_logs = []
-        self.sms_logs = []
-        self.monitor_logs = []
+        # 日志缓存，按类型分类（有上限，超出后丢弃最早的日志）
+        self.all_logs = collections.deque(maxlen=LOG_HISTORY_LIMIT)
+        self.sms_logs = collections.deque(maxlen=LOG_HISTORY_LIMIT)
+        self.monitor_logs = collections.deque(maxlen=LOG_HISTORY_LIMIT)
+        # 系统日志显示队列及积压统计
+        self.monitor_display = MonitorDisplayQueue()
+        # 系统日志接收时过滤条件
+        try:
+            self.monitor_filter = LuatLogFilter.from_settings(self.settings.get('monitor_filter', {}))
+        except re.error:
+            self.monitor_filter = LuatLogFilter()
+        self.monitor_backlog_var = tk.StringVar(value="接收: 0.0 KB/s 日志积压: 0 丢弃: 0")
+        # 系统日志端口累计接收字节数（独立接收进程模式下由子进程更新）及速率统计
+        self.monitor_byte_counter = multiprocessing.RawValue('Q', 0)
+        self.monitor_rate_sample = (time.monotonic(), 0)
+        self.monitor_byte_rate = 0.0
+        # 系统日志端口原始数据抓取：本进程接收时由monitor_capture写入，独立接收进程模式下由子进程写入，
+        # 子进程写入的字节数累加到monitor_capture_bytes
+        self.monitor_capture = None
+        self.monitor_capture_path = None
+        self.monitor_capture_bytes = multiprocessing.RawValue('Q', 0)
+        self.monitor_capture_control = None
+        # 系统日志端口断线重连（独立接收进程模式下连接统计由子进程发送）
+        self.monitor_reader = None
+        self.monitor_stop_event = threading.Event()
+        self.monitor_link_stats = None
 
         # ========== UI位置配置 ==========
         # 统一管理所有UI元素的位置参数，便于集中修改
@@ -309,8 +3690,11 @@ class CombinedAir724UGTool:
         self.status_bar = ttk.Label(root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
-        # 初始化界面组件
+        # 初始化菜单栏和界面组件（日志面板在窗口显示后再构建）
+        self.log_text = None
+        self.init_menu()
         self.init_ui_components()
+        self.startup.mark('left_panel')
 
         # 运营商识别前缀
         self.carrier_prefixes = {
@@ -319,14 +3703,61 @@ class CombinedAir724UGTool:
             '中国电信': ['133', '149', '153', '173', '177', '180', '181', '189', '199']
         }
 
-        # 初始刷新端口并检查是否有可用端口
-        if self.refresh_ports():
-            # 有可用端口时，设置自动连接
-            self.root.after(1000, self.auto_connect_all_ports)
+        # 7位号段数据库：优先加载已导入的号段数据，否则由号段前缀生成
+        self.number_segments_path = os.path.join(APP_DATA_DIR, 'number_segments.bin')
+        try:
+            self.number_segments = NumberSegmentDatabase.load(self.number_segments_path)
+        except (OSError, ValueError):
+            self.number_segments = NumberSegmentDatabase.from_prefixes(self.carrier_prefixes, DEFAULT_SEGMENT_OVERRIDES)
+        # 运行指标时间序列（信号、注册状态、收发短信及系统日志速率），跨重启保留
+        try:
+            self.metrics = TimeSeriesStore.load()
+        except (OSError, ValueError):
+            self.metrics = TimeSeriesStore()
+        self.metrics_ticks = 0
+        self.root.after(METRICS_TICK_INTERVAL, self.metrics_tick)
+
+        # 窗口显示后依次构建日志面板、等待后台串口枚举结果并立即自动连接
+        self.root.bind('<Map>', self._on_root_map, add='+')
+        self.root.after_idle(self.init_log_panel)
+        self.root.after_idle(self._poll_port_discovery)
         
         # 启动定期检查端口存在性的定时器
         self.start_port_monitoring()
 
+        # 按配置启动新短信推送和本地API
+        self.configure_push_delivery(self.settings.get('push_target', ''))
+        self.configure_api_server(self.settings.get('api_port', 0))
+
+    def init_menu(self):
+        """创建菜单栏"""
+        self.menu_bar = tk.Menu(self.root)
+        self.settings_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.settings_menu.add_command(label="短信推送...", command=self.edit_push_target)
+        self.settings_menu.add_command(label="本地API...", command=self.edit_api_port)
+        self.settings_menu.add_command(label="导入号段数据...", command=self.import_number_segments)
+        self.settings_menu.add_command(label="短信中心号码...", command=self.edit_sms_center)
+        self.monitor_ingest_var = tk.BooleanVar(value=bool(self.settings.get('monitor_ingest_process')))
+        self.settings_menu.add_checkbutton(label="独立进程接收系统日志", variable=self.monitor_ingest_var,
+                                           command=self.toggle_monitor_ingest_process)
+        self.settings_menu.add_command(label="系统日志过滤...", command=self.edit_monitor_filter)
+        self.menu_bar.add_cascade(label="设置", menu=self.settings_menu)
+        self.tools_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.tools_menu.add_command(label="导入离线日志...", command=self.import_capture_files)
+        self.monitor_capture_var = tk.BooleanVar(value=False)
+        self.tools_menu.add_checkbutton(label="抓取系统日志原始数据", variable=self.monitor_capture_var,
+                                        command=self.toggle_raw_capture)
+        self.tools_menu.add_command(label="查看抓取文件...", command=self.open_capture_viewer)
+        self.tools_menu.add_separator()
+        self.tools_menu.add_command(label="AT指令控制台...", command=self.open_at_console)
+        self.tools_menu.add_command(label="运行状态图表...", command=self.open_metrics_window)
+        self.tools_menu.add_command(label="多设备合并收件箱...", command=self.open_merged_inbox)
+        self.profiling_var = tk.BooleanVar(value=False)
+        self.tools_menu.add_checkbutton(label="性能分析", variable=self.profiling_var,
+                                        command=lambda: self.toggle_profiling(self.profiling_var.get()))
+        self.menu_bar.add_cascade(label="工具", menu=self.tools_menu)
+        self.root.config(menu=self.menu_bar)
+
     def init_ui_components(self):
         # 设备连接控制
         connect_frame = ttk.LabelFrame(self.left_frame, text="设备连接控制")
@@ -481,6 +3912,11 @@ class CombinedAir724UGTool:
         phone_number_display = ttk.Label(info_grid_frame, textvariable=self.phone_number_var, font=self.bold_font, foreground=self.error_color)
         phone_number_display.grid(row=1, column=1, padx=(0, 2), pady=(0, 0), sticky="w")
         
+        # 网络状态显示 - 由后台监测定期更新
+        ttk.Label(info_grid_frame, text="网络状态:", font=self.font, anchor="w").grid(row=2, column=0, padx=(0, 2), pady=(0, 0), sticky="w")
+        network_status_display = ttk.Label(info_grid_frame, textvariable=self.network_status_var, style="Secondary.TLabel")
+        network_status_display.grid(row=2, column=1, columnspan=2, padx=(0, 2), pady=(0, 0), sticky="w")
+        
         # 竖排复制手机号按钮，上下居中显示
         vertical_text = "复\n制\n号\n码"
         self.copy_phone_btn = ttk.Button(info_grid_frame, text=vertical_text, command=self.copy_phone_number, style="Accent.TButton", width=2)
@@ -512,6 +3948,15 @@ class CombinedAir724UGTool:
         self.count_label = ttk.Label(sms_frame, textvariable=self.sms_count_var, font=self.font, foreground=self.success_color)
         self.count_label.grid(row=2, column=0, columnspan=2, padx=(8, 0), pady=(0, 5), sticky="w")
 
+        # 编码及分段预估标签 - 输入时实时更新
+        self.encoding_label = ttk.Label(sms_frame, textvariable=self.sms_encoding_var, style="Secondary.TLabel")
+        self.encoding_label.grid(row=3, column=0, columnspan=2, padx=(8, 0), pady=(0, 5), sticky="w")
+        self.sms_text.bind("<KeyRelease>", self.update_sms_encoding_hint)
+
+        # 送达报告统计标签
+        self.delivery_label = ttk.Label(sms_frame, textvariable=self.delivery_stats_var, style="Secondary.TLabel")
+        self.delivery_label.grid(row=4, column=0, columnspan=2, padx=(8, 0), pady=(0, 5), sticky="w")
+
         # 发送按钮（竖排显示）- 紧凑样式和位置
         vertical_text = "发\n送\n短\n信"
         send_btn = ttk.Button(sms_frame, text=vertical_text, command=self.send_sms, style="Accent.TButton", width=2)
@@ -540,13 +3985,30 @@ class CombinedAir724UGTool:
         copy_code_btn = ttk.Button(inbox_control_frame, text="复制验证码", command=self.copy_verification_code, style="Accent.TButton")
         copy_code_btn.pack(side=tk.LEFT, padx=(0, 10))
         
-        # 收件箱消息文本框 - 缩小大小
-        self.inbox_text = scrolledtext.ScrolledText(inbox_frame, font=self.font, wrap=tk.WORD, 
-                                                    background=self.log_bg_color, foreground=self.text_color, 
-                                                    borderwidth=1, relief=tk.SUNKEN, height=8)
-        self.inbox_text.pack(fill=tk.X, padx=10, pady=(0, 5))
-        # 设置文本框为只读
-        self.inbox_text.config(state=tk.DISABLED)
+        # 收件箱消息列表 - 分页显示，最新的在最前，双击查看完整内容
+        inbox_list_frame = ttk.Frame(inbox_frame)
+        inbox_list_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+        self.inbox_tree = ttk.Treeview(inbox_list_frame, columns=('sender', 'time', 'preview'),
+                                       show='headings', height=8, selectmode='browse')
+        self.inbox_tree.heading('sender', text="发件号码")
+        self.inbox_tree.heading('time', text="发件时间")
+        self.inbox_tree.heading('preview', text="内容")
+        self.inbox_tree.column('sender', width=100, stretch=False)
+        self.inbox_tree.column('time', width=120, stretch=False)
+        self.inbox_tree.column('preview', width=200, stretch=True)
+        inbox_scrollbar = ttk.Scrollbar(inbox_list_frame, orient=tk.VERTICAL, command=self.inbox_tree.yview)
+        self.inbox_tree.configure(yscrollcommand=inbox_scrollbar.set)
+        self.inbox_tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        inbox_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.inbox_tree.bind('<Double-1>', self.show_inbox_message)
+
+        # 收件箱分页控制
+        inbox_pager_frame = ttk.Frame(inbox_frame)
+        inbox_pager_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+        ttk.Button(inbox_pager_frame, text="上一页", command=lambda: self.shift_inbox_page(-1)).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(inbox_pager_frame, text="下一页", command=lambda: self.shift_inbox_page(1)).pack(side=tk.LEFT, padx=(0, 10))
+        self.inbox_page_var = tk.StringVar(value="第 1/1 页，共 0 条")
+        ttk.Label(inbox_pager_frame, textvariable=self.inbox_page_var).pack(side=tk.LEFT)
         
         # 自动复制验证码复选框 - 放到文本框下方
         self.auto_copy_checkbox = ttk.Checkbutton(
@@ -558,6 +4020,14 @@ class CombinedAir724UGTool:
         )
         self.auto_copy_checkbox.pack(anchor=tk.W, padx=15, pady=(0, 10))
 
+    def _on_root_map(self, event):
+        """主窗口第一次映射到屏幕时记录窗口显示时间（子控件的映射事件也会传到这里）"""
+        if event.widget is not self.root or self.startup.elapsed('window_shown') is not None:
+            return
+        self.startup.mark('window_shown')
+
+    def init_log_panel(self):
+        """构建右侧日志面板，并显示构建前已记录的日志"""
         # 创建右侧面板(只包含日志)
         self.right_frame = ttk.Frame(self.main_frame, style="Right.TFrame")
         self.right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=self.ui_layout['right_padx'], pady=self.ui_layout['right_pady'])
@@ -605,11 +4075,52 @@ class CombinedAir724UGTool:
         clear_btn = ttk.Button(filter_container, text="清除日志", command=self.clear_logs, style="Accent.TButton")
         clear_btn.pack(side=tk.RIGHT, padx=5, pady=2)
 
+        # 系统日志积压及丢弃统计
+        ttk.Label(filter_container, textvariable=self.monitor_backlog_var).pack(side=tk.RIGHT, padx=(0, 10))
+
         # 统一日志显示区域 - 优化样式
         self.log_text = scrolledtext.ScrolledText(log_frame, font=self.font, wrap=tk.WORD, background=self.log_bg_color, foreground="#000000")
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         # 添加更好的边框和视觉效果
         self.log_text.configure(borderwidth=1, relief=tk.SUNKEN)
+        self.filter_logs()
+        self.startup.mark('log_panel')
+        self.root.after(MONITOR_DISPLAY_INTERVAL, self.drain_monitor_display)
+
+    def _discover_ports(self):
+        """后台枚举串口（Windows下枚举较慢），结果交给主线程处理"""
+        try:
+            ports = list(serial.tools.list_ports.comports())
+        except Exception as e:
+            self.port_discovery.set_exception(e)
+            return
+        self.startup.mark('ports_discovered')
+        self.port_discovery.set_result(ports)
+
+    def _poll_port_discovery(self):
+        """串口枚举完成后刷新端口列表，有可用端口时立即自动连接"""
+        if not self.port_discovery.done():
+            self.root.after(10, self._poll_port_discovery)
+            return
+        try:
+            ports = self.port_discovery.result()
+        except Exception as e:
+            self.log(f"枚举串口时发生错误: {str(e)}")
+            ports = []
+        if self.refresh_ports(ports):
+            self.auto_connect_all_ports()
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """记录启动就绪时间并输出启动耗时报告"""
+        self.startup.mark('ready')
+        report = self.startup.report()
+        summary = ', '.join(f"{stage['stage']} {stage['ms']:.0f}ms" for stage in report['stages'])
+        self.log(f"启动耗时: {summary}")
+        try:
+            self.startup.save()
+        except OSError as e:
+            self.log(f"保存启动耗时报告失败: {str(e)}")
 
     def copy_phone_number(self):
         """复制当前手机号到剪贴板（只复制纯数字部分）"""
@@ -625,156 +4136,70 @@ class CombinedAir724UGTool:
                 self.sms_log(f"手机号码 {pure_number} 已复制到剪贴板")
     
     def copy_verification_code(self):
-        """从短信内容中提取完整的连续数字或字母验证码并复制到剪贴板"""
+        """复制选中短信的验证码，未选中时复制最新一条含验证码短信的验证码"""
         try:
-            # 获取收件箱中的所有内容
-            self.inbox_text.config(state=tk.NORMAL)
-            inbox_content = self.inbox_text.get(1.0, tk.END)
-            self.inbox_text.config(state=tk.DISABLED)
-            
-            if not inbox_content.strip():
-                self.sms_log("收件箱为空，无法提取验证码")
-                return
-            
-            # 分析短信内容，查找完整的连续数字或字母验证码
-            
-            # 优先查找常见的验证码格式：
-            # 1. 连续的4-8位数字（最常见的验证码格式）
-            code_match = re.search(r'([0-9]{4,8})', inbox_content)
-            
-            # 2. 如果没有找到纯数字验证码，查找包含字母和数字的验证码
-            if not code_match:
-                code_match = re.search(r'([A-Za-z0-9]{4,8})', inbox_content)
-            
-            # 3. 特定格式的验证码（例如：XX-XX-XX）
-            if not code_match:
-                code_match = re.search(r'([A-Za-z0-9]{2}-[A-Za-z0-9]{2}-[A-Za-z0-9]{2})', inbox_content)
-            
-            if code_match:
-                verification_code = code_match.group(1)
-                # 复制到剪贴板
-                self.root.clipboard_clear()
-                self.root.clipboard_append(verification_code)
-                self.sms_log(f"验证码 {verification_code} 已复制到剪贴板")
+            selection = self.inbox_tree.selection()
+            if selection:
+                message = self.inbox_store.get(int(selection[0]))
+                if not message or not message['code']:
+                    self.sms_log("选中的短信中未找到验证码")
+                    return
             else:
-                self.sms_log("未在短信内容中找到验证码")
+                if not len(self.inbox_store):
+                    self.sms_log("收件箱为空，无法提取验证码")
+                    return
+                message = self.inbox_store.latest_with_code()
+                if not message:
+                    self.sms_log("未在短信内容中找到验证码")
+                    return
+
+            # 复制到剪贴板（验证码在短信入库时已提取）
+            self.root.clipboard_clear()
+            self.root.clipboard_append(message['code'])
+            self.sms_log(f"验证码 {message['code']} 已复制到剪贴板")
         except Exception as e:
             self.sms_log(f"提取验证码时发生错误: {str(e)}")
     
     def refresh_inbox_placeholder(self):
-        """重新从系统日志中读取所有短信并更新收件箱"""
+        """重新从系统日志中提取所有短信并导入收件箱（与已有短信去重，不清空收件箱）"""
         try:
-            # 首先清空当前收件箱
-            self.clear_inbox_content()
-            
-            # 记录刷新操作
             self.sms_log("正在刷新收件箱...")
-            
+
             # 检查是否有历史日志
             if not self.monitor_logs:
                 self.sms_log("没有找到历史系统日志")
                 self.sms_log("日志中无短信可提取")
                 return
-            
-            # 遍历历史系统日志，提取所有短信信息
-            sms_count = 0
-            # 拼接所有系统日志
-            all_monitor_logs = "\n".join(self.monitor_logs)
-            
-            # 查找所有包含handler_sms.smsCallback的日志片段
-            callback_matches = re.finditer(r'handler_sms\.smsCallback[^\[]+', all_monitor_logs)
-            
-            # 处理每个匹配的短信回调
-            processed_sms = []  # 用于存储已处理的短信，避免重复
-            for match in callback_matches:
-                callback_content = match.group()
-                
-                # 提取发件人号码
-                phone_match = re.search(r'sender_number:\s*(\d+)', callback_content)
-                phone_number = phone_match.group(1) if phone_match else "未知号码"
-                
-                # 提取发件时间
-                time_match = re.search(r'datetime:\s*([\d/,:+\s]+)', callback_content)
-                send_time = time_match.group(1).strip() if time_match else "未知时间"
-                
-                # 提取短信内容
-                content_match = re.search(r'sms_content:\s*(.+?)(?=\[|$)', callback_content, re.DOTALL)
-                if content_match:
-                    raw_sms_content = content_match.group(1).strip()
-                    
-                    # 分割内容为行
-                    lines = raw_sms_content.split('\n')
-                    clean_lines = []
-                    
-                    # 逐行处理，移除系统日志行，但保留短信内容中的换行
-                    for line in lines:
-                        # 如果行以[开头且包含]，可能是系统日志行，跳过
-                        if line.startswith('[') and ']' in line and ('-' in line or ':' in line):
-                            continue
-                        # 否则保留该行，去除首尾空格
-                        clean_line = line.strip()
-                        if clean_line:
-                            clean_lines.append(clean_line)
-                    
-                    # 组合成多行文本，保留短信内容的合理换行
-                    sms_content = '\n'.join(clean_lines)
-                    
-                    # 特别处理常见的验证码短信格式
-                    if '哔哩哔哩' in sms_content and '短信登录验证码' in sms_content:
-                        # 提取所有数字，组合成完整的验证码
-                        numbers = ''.join(re.findall(r'\d+', sms_content))
-                        if numbers:
-                            # 重新格式化哔哩哔哩验证码短信
-                            sms_content = f"【哔哩哔哩】{numbers}短信登录验证码，5分钟内有效，请勿泄露。"
-                    
-                    # 修复可能的乱码问题
-                    # 方法1: 尝试替换常见的乱码组合
-                    sms_content = sms_content.replace('�  ', '的')
-                    # 方法2: 如果还有其他乱码，使用更智能的替换策略
-                    # 使用正则表达式替换单个乱码字符为空格
-                    sms_content = re.sub(r'�+', ' ', sms_content)
-                else:
-                    # 尝试从其他模式中提取短信内容
-                    alt_content_match = re.search(r'\[(.*?)\]', callback_content)
-                    if alt_content_match:
-                        sms_content = alt_content_match.group(1)
-                    else:
-                        sms_content = "无法提取内容"
-                
-                # 创建唯一标识符以避免重复
-                sms_identifier = f"{phone_number}_{send_time}_{sms_content[:20]}"
-                if sms_identifier not in processed_sms:
-                    processed_sms.append(sms_identifier)
-                    # 格式化短信信息
-                    formatted_sms = f"{sms_content}\n发件号码: {phone_number}\n发件时间: {send_time}\n\n"
-                    # 更新收件箱UI
-                    self.root.after(0, lambda sms=formatted_sms: self.update_inbox_text(sms))
-                    sms_count += 1
-            
+
+            all_monitor_logs = "\n".join(map(format_log_entry, self.monitor_logs))
+            messages = extract_sms_from_text(all_monitor_logs)
+            added = self.import_sms_batch(messages, 'monitor')
+
             # 记录刷新结果
-            if sms_count > 0:
-                self.sms_log(f"成功提取 {sms_count} 条短信")
+            if messages:
+                self.sms_log(f"成功提取 {len(messages)} 条短信，新增 {added} 条")
             else:
                 self.sms_log("日志中无短信可提取")
-                
+
         except Exception as e:
             self.sms_log(f"刷新收件箱时发生错误: {str(e)}")
-            
+
     def clear_inbox_content(self):
         """清空收件箱内容"""
         try:
-            self.inbox_text.config(state=tk.NORMAL)
-            self.inbox_text.delete(1.0, tk.END)
-            self.inbox_text.config(state=tk.DISABLED)
+            self.inbox_store.clear()
+            self.inbox_anchor = None
+            self.show_inbox_page()
             self.sms_log("收件箱已清空")
         except Exception as e:
             error_msg = f"清空收件箱时发生错误: {str(e)}"
             self.log(error_msg)
             self.sms_log(error_msg)
     
-    def refresh_ports(self):
-        """刷新可用串口列表"""
-        ports = list(serial.tools.list_ports.comports())
+    def refresh_ports(self, ports=None):
+        """刷新可用串口列表，ports为已枚举的串口时不再重复枚举"""
+        if ports is None:
+            ports = list(serial.tools.list_ports.comports())
         port_names = [port.device for port in ports]
         
         # 同时更新两个端口下拉列表
@@ -840,10 +4265,12 @@ class CombinedAir724UGTool:
                 self.sms_status_led.config(text="●", foreground=self.error_color)
                 return
 
+            # 读取超时只作为不支持cancel_read时的停止间隔，命令超时由AT通道控制
             self.sms_ser = serial.Serial(
                 port=port,
                 baudrate=baudrate,
-                timeout=2,
+                timeout=0.2,
+                write_timeout=2,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
                 bytesize=serial.EIGHTBITS
@@ -851,6 +4278,13 @@ class CombinedAir724UGTool:
 
             if self.sms_ser.is_open:
                 self.sms_connected = True
+                self.sms_device_port = port
+                # 启动AT端口读写通道，由后台线程统一读取响应和主动上报
+                self.at_channel = AtCommandChannel(self.sms_ser, self.on_at_urc, self.on_at_channel_error)
+                self.at_channel.start()
+                # 所有AT事务由调度器按优先级串行执行
+                self.at_scheduler = AtPortScheduler()
+                self.at_scheduler.start()
                 self.status_var.set(f"设备已连接成功 ({port})")
                 self.log(f"短信端口已连接到串口: {port}", log_type="sms")
                 # 更新状态指示灯为绿色
@@ -861,7 +4295,12 @@ class CombinedAir724UGTool:
                 response = self.sms_send_at_command('AT')
                 if response and 'OK' in response:
                     self.log("短信模块响应正常", log_type="sms")
-                    # 端口连接成功后自动获取手机号
+                    # 启动新短信主动上报处理和网络状态后台监测
+                    self.start_urc_worker()
+                    self.start_network_monitor()
+                    # 端口连接成功后自动获取手机号，读取到ICCID前收到的短信暂缓写入设备分片
+                    self.sim_iccid = None
+                    self.sim_identity_pending = True
                     self.log("开始自动获取SIM卡信息...", log_type="sms")
                     self.root.after(200, self.read_sim_info)  # 减少延迟，加速信息获取
                 else:
@@ -914,17 +4353,27 @@ class CombinedAir724UGTool:
             else:
                 parity = serial.PARITY_SPACE
             
-            # 打开串口
-            self.monitor_ser = serial.Serial(
-                port=port,
-                baudrate=baudrate,
-                bytesize=databits,
-                parity=parity,
-                stopbits=stopbits,
-                timeout=0.1
-            )
+            port_settings = {
+                'port': port,
+                'baudrate': baudrate,
+                'bytesize': databits,
+                'parity': parity,
+                'stopbits': stopbits
+            }
+            # 打开串口（独立接收进程模式下由子进程打开），读取出错时自动重连
+            self.monitor_link_stats = None
+            self.prepare_monitor_capture(bool(self.settings.get('monitor_ingest_process')))
+            if self.settings.get('monitor_ingest_process'):
+                self.start_monitor_ingest(port_settings)
+                opened = True
+            else:
+                self.monitor_stop_event = threading.Event()
+                self.monitor_reader = SupervisedSerialReader(port_settings, self.monitor_stop_event,
+                                                             self.on_monitor_link_event)
+                self.monitor_ser = self.monitor_reader.open()
+                opened = self.monitor_ser.is_open
             
-            if self.monitor_ser.is_open:
+            if opened:
                 self.status_var.set(f"系统日志端口已连接到 {port}")
                 self.log(f"系统日志端口已连接到 {port} ({baudrate},{databits},{parity_value},{stopbits_value})")
                 
@@ -943,7 +4392,8 @@ class CombinedAir724UGTool:
                 # 启动接收线程
                 self.monitor_running = True
                 self.monitor_connected = True  # 设置连接状态标志
-                self.monitor_thread = threading.Thread(target=self.monitor_receive_data)
+                receive = self.monitor_receive_records if self.monitor_ingest else self.monitor_receive_data
+                self.monitor_thread = threading.Thread(target=receive)
                 self.monitor_thread.daemon = True
                 self.monitor_thread.start()
         except Exception as e:
@@ -957,8 +4407,7 @@ class CombinedAir724UGTool:
     def monitor_close_serial(self):
         try:
             # 停止接收线程
-            self.monitor_running = False
-            time.sleep(0.2)  # 等待线程结束
+            self.stop_monitor_threads()
             
             if self.monitor_ser is not None and self.monitor_ser.is_open:
                 self.monitor_ser.close()
@@ -987,42 +4436,145 @@ class CombinedAir724UGTool:
             # 检查设备连接状态
             self.check_device_connection()
 
-    # 监控工具数据接收线程
+    def start_monitor_ingest(self, port_settings):
+        """启动系统日志接收子进程"""
+        self.monitor_ring = SharedRingBuffer()
+        self.monitor_ingest_stop = multiprocessing.Event()
+        self.monitor_capture_control = multiprocessing.Queue()
+        self.monitor_ingest = multiprocessing.Process(
+            target=monitor_ingest_main,
+            args=(port_settings, self.monitor_ring, self.monitor_ingest_stop, self.settings.get('monitor_filter'),
+                  self.monitor_byte_counter, self.monitor_capture_path, self.monitor_capture_control,
+                  self.monitor_capture_bytes),
+            daemon=True
+        )
+        self.monitor_ingest.start()
+
+    def stop_monitor_threads(self):
+        """停止系统日志接收：通知停止并取消阻塞的串口读取，在时限内等待接收线程及接收进程结束"""
+        self.monitor_running = False
+        self.monitor_stop_event.set()
+        if self.monitor_reader:
+            self.monitor_reader.cancel()
+        if self.monitor_ring:
+            self.monitor_ring.readable.set()
+        self.stop_monitor_ingest()
+        alive = join_threads([self.monitor_thread, self.monitor_parse_thread])
+        self.close_monitor_reader()
+        if alive:
+            self.log(f"系统日志接收线程未能及时结束: {', '.join(thread.name for thread in alive)}")
+
+    def close_monitor_reader(self):
+        """关闭受监督读取的端口（包括重连后新打开的端口）"""
+        reader, self.monitor_reader = self.monitor_reader, None
+        if reader:
+            reader.close()
+
+    def on_monitor_link_event(self, message):
+        """系统日志端口断线或重连成功（在读取线程中调用）"""
+        reader = self.monitor_reader
+        if reader is None or self.monitor_stop_event.is_set():
+            return
+        self.monitor_ser = reader.ser
+        self.update_monitor_link(message, reader.stats())
+
+    def update_monitor_link(self, message, stats):
+        """记录断线重连信息，端口重新枚举后更新端口选择"""
+        self.monitor_link_stats = stats
+        self.log(message, log_type="monitor")
+        self.root.after(0, lambda: self.status_var.set(message))
+        port = stats['port']
+        if stats['connected'] and port != self.monitor_port_var.get():
+            self.root.after(0, lambda: self.monitor_port_var.set(port))
+
+    def monitor_link_snapshot(self):
+        """系统日志端口连接统计，未连接时返回None"""
+        if not self.monitor_connected:
+            return None
+        reader = self.monitor_reader
+        return reader.stats() if reader else self.monitor_link_stats
+
+    def stop_monitor_ingest(self):
+        """停止系统日志接收子进程"""
+        if not self.monitor_ingest:
+            return
+        self.monitor_ingest_stop.set()
+        self.monitor_ingest.join(THREAD_STOP_TIMEOUT)
+        if self.monitor_ingest.is_alive():
+            self.monitor_ingest.terminate()
+        self.monitor_ingest = None
+
+    # 独立接收进程模式下的记录处理线程
+    def monitor_receive_records(self):
+        ring = self.monitor_ring
+        ingest = self.monitor_ingest
+        while self.monitor_running:
+            ring.readable.wait(0.1)
+            ring.readable.clear()
+            for kind, payload in ring.read_all():
+                if kind == INGEST_RECORD_LOG:
+                    self.monitor_display.put(LuatLogRecord(time.time(), payload.decode('utf-8')))
+                elif kind == INGEST_RECORD_SMS:
+                    sms_info = json.loads(payload.decode('utf-8'))
+                    sms_info['source'] = 'monitor'
+                    self.publish_incoming_sms(sms_info)
+                elif kind == INGEST_RECORD_STATUS:
+                    status = json.loads(payload.decode('utf-8'))
+                    if status['message']:
+                        self.update_monitor_link(status['message'], status['stats'])
+                    else:
+                        self.monitor_link_stats = status['stats']
+                elif kind == INGEST_RECORD_CAPTURE:
+                    self.on_ingest_capture_result(json.loads(payload.decode('utf-8')))
+                elif kind == INGEST_RECORD_ERROR:
+                    error_msg = payload.decode('utf-8')
+                    self.log(error_msg, log_type="monitor")
+                    self.status_var.set(error_msg)
+                    self.root.after(10, self.monitor_close_serial)
+                    return
+            if not ingest.is_alive() and ring.head.value == ring.tail.value and self.monitor_running:
+                self.log("系统日志接收进程意外退出", log_type="monitor")
+                self.root.after(10, self.monitor_close_serial)
+                return
+
+    # 监控工具数据接收线程（读取阶段）：原始数据放入有界队列，队列满时暂停读取，由串口驱动缓冲
+    # 读取出错时由SupervisedSerialReader按指数退避重连，未结束的行跨重连保留
     def monitor_receive_data(self):
+        reader = self.monitor_reader
+        raw_queue = queue.Queue(maxsize=MONITOR_RAW_QUEUE_SIZE)
+        self.monitor_parse_thread = threading.Thread(target=self.monitor_parse_data, args=(raw_queue, reader),
+                                                     daemon=True)
+        self.monitor_parse_thread.start()
+        try:
+            self._monitor_read_loop(reader, raw_queue)
+        finally:
+            # 通知解析线程结束，不必等待队列读取超时
+            try:
+                raw_queue.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def _monitor_read_loop(self, reader, raw_queue):
+        reader.identify()
+        framer = reader.framer
         while self.monitor_running:
             try:
-                if self.monitor_ser is not None and self.monitor_ser.is_open:
-                    # 读取串口数据
-                    data = self.monitor_ser.read(1024)
-                    if data:
-                        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                        # 只记录接收数据的字节数信息，不添加额外换行符
-                        self.log(f"接收到数据: {len(data)} 字节", log_type="monitor")
-
-                        # 尝试解码数据
-                        try:
-                            text = data.decode('utf-8', errors='replace')
-                            self.log(f"使用UTF-8解码成功", log_type="monitor")
-                        except:
-                            # 如果utf-8解码失败，尝试其他编码
+                # 读取串口数据到预分配缓冲区，按行边界整批取出，无数据时取出未结束的行
+                received = reader.fill()
+                if received is not None:
+                    self.monitor_byte_counter.value += received
+                    # 原始数据抓取：直接写入本次读取的缓冲区片段
+                    capture = self.monitor_capture
+                    if capture and received:
+                        capture.write(framer.view[framer.end - received:framer.end])
+                    block = framer.take_lines(flush=not received)
+                    if block:
+                        while self.monitor_running:
                             try:
-                                text = data.decode('gbk', errors='replace')
-                                self.log(f"使用GBK解码成功", log_type="monitor")
-                            except:
-                                # 如果都失败，显示十六进制
-                                text = ''.join([f"{b:02X} " for b in data])
-                                self.log(f"解码失败，显示十六进制", log_type="monitor")
-
-                        # 清理文本，去除多余空行和特殊字符
-                        cleaned_text = self._clean_log_text(text)
-                        
-                        # 在日志中显示清理后的数据，不添加额外换行符
-                        if cleaned_text:
-                            self.log(cleaned_text, log_type="monitor")
-                          
-                        # 检查是否包含handler_sms.smsCallback，并提取短信信息
-                        if 'handler_sms.smsCallback' in text:
-                            self.process_sms_callback(text, timestamp)
+                                raw_queue.put(block, timeout=0.1)
+                                break
+                            except queue.Full:
+                                continue
             except Exception as e:
                 if self.monitor_running:  # 只有在线程运行时才显示错误
                     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
@@ -1033,101 +4585,952 @@ class CombinedAir724UGTool:
                     self.root.after(10, self.monitor_close_serial)
                 break
 
-            time.sleep(0.01)  # 短暂休眠，降低CPU使用率
-            
-    def _clean_log_text(self, text):
-        """清理日志文本，去除多余空行和特殊字符"""
-        # 替换Windows换行符为Unix换行符
-        text = text.replace('\r\n', '\n')
-        # 去除连续的多个换行符
-        text = re.sub(r'\n{2,}', '\n', text)
-        # 去除行首行尾的空白字符
-        lines = [line.strip() for line in text.split('\n')]
-        # 移除空行
-        lines = [line for line in lines if line]
-        # 重新组合文本，每行前不加时间戳（由log方法统一处理）
-        return '\n'.join(lines)
-
+    # 监控工具数据解析线程（解析阶段）：解析为结构化记录，过滤后进入可丢弃的显示队列，短信回调直接处理，不会丢弃
+    def monitor_parse_data(self, raw_queue, reader=None):
+        parser = LuatLogParser(hold_timeout=INGEST_HOLD_TIMEOUT)
+        while self.monitor_running or not raw_queue.empty():
+            try:
+                block = raw_queue.get(timeout=0.1)
+            except queue.Empty:
+                # 输入空闲，结束所有未完成的记录（断线重连期间保留，重连后继续拼接）
+                if reader is None or reader.connected_since is not None:
+                    self.handle_monitor_records(parser.flush())
+                continue
+            if block is None:
+                break
+            try:
+                self._parse_monitor_block(parser, block)
+            except Exception as e:
+                self.log(f"解析系统日志时发生错误: {str(e)}", log_type="monitor")
+
+    @profiled('monitor_parse')
+    def _parse_monitor_block(self, parser, block):
+        # 整批完整的行只解码一次，再按行解析为结构化记录
+        self.handle_monitor_records(parser.feed(block.decode('utf-8', errors='replace')))
+
+    def handle_monitor_records(self, records):
+        """处理解析出的系统日志记录：短信回调提取短信，其余按接收时过滤条件进入显示队列"""
+        log_filter = self.monitor_filter
+        for record in records:
+            if record.is_sms_callback():
+                timestamp = record.device_time or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+                self.process_sms_callback(record.sms_callback_text(), timestamp)
+            if log_filter.accept(record):
+                self.monitor_display.put(record)
+
+    @profiled('process_sms_callback')
     def process_sms_callback(self, text, timestamp):
         """处理handler_sms.smsCallback消息，提取短信信息并添加到收件箱"""
         try:
-            
             # 从系统日志中提取短信信息
             # 寻找handler_sms.smsCallback后的发件人号码、时间和内容
-            callback_pos = text.find('handler_sms.smsCallback')
+            callback_pos = text.find(SMS_CALLBACK_MARKER)
             if callback_pos != -1:
                 # 截取callback后的内容进行分析
-                callback_content = text[callback_pos:]
-                
-                # 提取发件人号码（格式：sender_number: 106814308000003154）
-                phone_match = re.search(r'sender_number:\s*(\d+)', callback_content)
-                phone_number = phone_match.group(1) if phone_match else "未知号码"
-                
-                # 提取发件时间（格式：datetime: 25/09/30,17:31:01+32）
-                time_match = re.search(r'datetime:\s*([\d/,:+\s]+)', callback_content)
-                send_time = time_match.group(1).strip() if time_match else timestamp
-                
-                # 提取短信内容，优化提取逻辑以处理验证码被分割的情况
-                content_match = re.search(r'sms_content:\s*(.+?)(?=\[|$)', callback_content, re.DOTALL)
-                if content_match:
-                    raw_sms_content = content_match.group(1).strip()
-                    
-                    # 移除所有可能的换行符、制表符等空白字符，但保留空格
-                    processed_content = re.sub(r'[\n\r\t]+', '', raw_sms_content)
-                    
-                    # 处理哔哩哔哩验证码短信的特殊情况
-                    if '哔哩哔哩' in processed_content and '短信登录验证码' in processed_content:
-                        # 使用更精确的正则表达式提取6位数字验证码
-                        # 优先查找短信中明显的6位数字序列
-                        code_match = re.search(r'([0-9]{6})', processed_content)
-                        if code_match:
-                            verification_code = code_match.group(1)
-                            sms_content = "【哔哩哔哩】" + verification_code + "短信登录验证码，5分钟内有效，请勿泄露。"
-                        else:
-                            # 如果没有找到明显的6位数字，回退到原始内容
-                            sms_content = processed_content
-                    else:
-                        # 对于其他短信，直接使用处理后的内容
-                        sms_content = processed_content
-                    
-                    # 修复可能的乱码问题
-                    # 方法1: 尝试替换常见的乱码组合
-                    sms_content = sms_content.replace('�  ', '的')
-                    # 方法2: 使用正则表达式替换单个乱码字符为空格
-                    sms_content = re.sub(r'�+', ' ', sms_content)
-                    # 方法3: 对内容进行进一步清理，保留中文和常用字符
-                    sms_content = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9，。！？；：,.!?;:\-\s]', '', sms_content)
-                else:
-                    sms_content = "无法提取内容"
-                
+                sms_info = parse_sms_callback(text[callback_pos:], timestamp)
                 # 只显示短信内容，不显示发件人和发件时间
                 # 但保留这些信息在内部变量中以便其他功能使用
-                self.latest_sms_info = {
-                    'content': sms_content,
-                    'phone_number': phone_number,
-                    'send_time': send_time
-                }
-                
-                # 更新收件箱UI（在主线程中执行）
-                self.root.after(0, lambda: self.update_inbox_text(f"{sms_content}\n\n"))
+                sms_info['source'] = 'monitor'
+                self.publish_incoming_sms(sms_info)
         except Exception as e:
             self.log(f"处理短信回调时发生错误: {str(e)}", log_type="monitor")
             
-    def update_inbox_text(self, sms_content):
-        """更新收件箱文本框内容"""
+    def publish_incoming_sms(self, sms_info):
+        """发布新短信：去重后更新最新短信信息、通知订阅者并写入收件箱"""
+        # 与收件箱相同按号码、时间和内容去重，同一秒内同一号码发来的不同短信不会被丢弃
+        key = InboxStore.message_key(sms_info)
+        with self.sms_publish_lock:
+            if key in self.recent_sms_keys:
+                return False
+            self.recent_sms_keys.append(key)
+            self.latest_sms_info = sms_info
+            subscribers = list(self.sms_subscribers)
+        device, device_name = self.inbox_device()
+        message = self.inbox_store.add(dict(sms_info, device=device, device_name=device_name))
+
+        # 订阅者在I/O线程中回调，不应执行耗时操作
+        for callback in subscribers:
+            try:
+                callback(sms_info)
+            except Exception as e:
+                self.log(f"短信订阅者处理失败: {str(e)}")
+
+        # 更新收件箱UI（合并到下一帧在主线程中渲染）
+        if message:
+            self.metrics.add('sms_in')
+            self.write_inbox_shard(message)
+            self.update_inbox_view([message])
+        return True
+
+    def inbox_device(self):
+        """本设备在多设备合并收件箱中的标识（SIM卡ICCID，读取失败时使用短信端口）及显示名称，
+        正在读取ICCID时返回(None, None)"""
+        if self.sim_identity_pending:
+            return None, None
+        device = self.sim_iccid or self.sms_device_port or 'unknown'
+        return device, self.sim_phone_number or device
+
+    def write_inbox_shard(self, message):
+        """把新短信写入本设备分片，设备标识未确定时暂存"""
+        with self.inbox_shard_lock:
+            if message['device'] is None:
+                if self.sim_identity_pending:
+                    self.pending_shard_messages.append(message)
+                    return
+                message['device'], message['device_name'] = self.inbox_device()
+            try:
+                append_inbox_shard(message['device'], [message])
+            except OSError as e:
+                self.log(f"写入设备收件箱分片失败: {str(e)}")
+
+    def resolve_inbox_device(self):
+        """ICCID读取完成（或短信端口断开）后确定设备标识，写入暂存的短信"""
+        with self.inbox_shard_lock:
+            if not self.sim_identity_pending:
+                return
+            self.sim_identity_pending = False
+            messages, self.pending_shard_messages = self.pending_shard_messages, []
+            if not messages:
+                return
+            device, device_name = self.inbox_device()
+            for message in messages:
+                message['device'], message['device_name'] = device, device_name
+            try:
+                append_inbox_shard(device, messages)
+            except OSError as e:
+                self.log(f"写入设备收件箱分片失败: {str(e)}")
+
+    def import_sms_batch(self, messages, source):
+        """批量导入短信到收件箱（按号码、时间和内容去重），不触发订阅者，返回新增条数"""
+        added = self.inbox_store.add_many(messages, source)
+        # 每批只更新一次收件箱UI
+        self.update_inbox_view(added, auto_copy=False)
+        return len(added)
+
+    def import_capture_files(self):
+        """选择抓取的系统日志文件，在后台离线回放并重建收件箱"""
+        if self.replay_thread and self.replay_thread.is_alive():
+            messagebox.showinfo("提示", "离线日志正在导入中")
+            return
+        paths = filedialog.askopenfilenames(
+            title="导入系统日志抓取文件",
+            filetypes=[("日志文件", "*.log *.txt *.bin *.cap"), ("所有文件", "*.*")],
+            parent=self.root
+        )
+        if not paths:
+            return
+        self.replay_thread = threading.Thread(target=self._replay_capture_thread, args=(list(paths),), daemon=True)
+        self.replay_thread.start()
+
+    def metrics_tick(self):
+        """定期标记程序运行时段，并定期保存运行指标"""
+        self.metrics.touch()
+        self.metrics_ticks += 1
+        if self.metrics_ticks % METRICS_SAVE_TICKS == 0:
+            self.save_metrics()
+        self.root.after(METRICS_TICK_INTERVAL, self.metrics_tick)
+
+    def save_metrics(self):
         try:
-            self.inbox_text.config(state=tk.NORMAL)
-            self.inbox_text.insert(tk.END, sms_content)
-            self.inbox_text.see(tk.END)  # 滚动到最新内容
-            self.inbox_text.config(state=tk.DISABLED)
+            self.metrics.save()
+        except OSError as e:
+            self.log(f"保存运行指标失败: {str(e)}")
+
+    def open_metrics_window(self):
+        """运行状态图表：按所选时间范围显示各项指标的折线图，打开期间定期刷新"""
+        if self.metrics_window and self.metrics_window.winfo_exists():
+            self.metrics_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("运行状态")
+        window.geometry("720x560")
+        self.metrics_window = window
+
+        control_frame = ttk.Frame(window)
+        control_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        range_var = tk.StringVar(value=METRICS_RANGES[0][0])
+        ttk.Label(control_frame, text="时间范围:").pack(side=tk.LEFT)
+        range_combo = ttk.Combobox(control_frame, textvariable=range_var, state="readonly", width=12,
+                                   values=[label for label, span in METRICS_RANGES])
+        range_combo.pack(side=tk.LEFT, padx=5)
+
+        charts = []
+        for name, title, unit, scale in METRICS_CHARTS:
+            frame = ttk.Frame(window)
+            frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=2)
+            summary_var = tk.StringVar()
+            ttk.Label(frame, textvariable=summary_var).pack(anchor=tk.W)
+            canvas = tk.Canvas(frame, height=70, background="white", highlightthickness=1,
+                               highlightbackground="#d0d0d0")
+            canvas.pack(fill=tk.BOTH, expand=True)
+            charts.append((name, title, unit, scale, canvas, summary_var))
+
+        def draw_chart(canvas, points, scale):
+            canvas.delete("all")
+            width = max(canvas.winfo_width(), 100)
+            height = max(canvas.winfo_height(), 40)
+            values = [value * scale for _, value, _, _ in points if value is not None]
+            if not values:
+                canvas.create_text(width // 2, height // 2, text="无数据", fill="#999999")
+                return
+            low, high = min(values), max(values)
+            if high - low < 1e-9:
+                low, high = low - 1, high + 1
+            step = (width - 10) / max(len(points) - 1, 1)
+            segment = []
+            # 没有数据的桶断开折线
+            for index, (_, value, _, _) in enumerate(points + [(None, None, None, None)]):
+                if value is None:
+                    if len(segment) >= 4:
+                        canvas.create_line(*segment, fill=self.primary_color, width=1.5)
+                    elif len(segment) == 2:
+                        x, y = segment
+                        canvas.create_oval(x - 1.5, y - 1.5, x + 1.5, y + 1.5, fill=self.primary_color,
+                                           outline="")
+                    segment = []
+                    continue
+                x = 5 + index * step
+                y = 5 + (high - value * scale) / (high - low) * (height - 10)
+                segment.extend((x, y))
+            canvas.create_text(width - 5, 5, text=f"{high:.1f}", anchor=tk.NE, fill="#999999")
+            canvas.create_text(width - 5, height - 5, text=f"{low:.1f}", anchor=tk.SE, fill="#999999")
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            span = dict(METRICS_RANGES)[range_var.get()]
+            for name, title, unit, scale, canvas, summary_var in charts:
+                points = self.metrics.query(name, span)
+                values = [value * scale for _, value, _, _ in points if value is not None]
+                if values:
+                    summary_var.set(f"{title}: 当前 {values[-1]:.1f} {unit}  平均 {sum(values) / len(values):.1f}"
+                                    f"  最低 {min(values):.1f}  最高 {max(values):.1f}")
+                else:
+                    summary_var.set(f"{title}: 无数据")
+                draw_chart(canvas, points, scale)
+
+        def refresh_periodically():
+            if not window.winfo_exists():
+                return
+            refresh()
+            window.after(METRICS_TICK_INTERVAL, refresh_periodically)
+
+        range_combo.bind('<<ComboboxSelected>>', lambda event: refresh())
+        window.bind('<Configure>', lambda event: refresh() if event.widget is window else None)
+        window.after(100, refresh_periodically)
+
+    def toggle_profiling(self, enabled=None):
+        """开始或停止性能分析（enabled为None时切换），停止时写入报告"""
+        if enabled is None:
+            enabled = self.profiling is None
+        self.profiling_var.set(enabled)
+        if enabled and self.profiling is None:
+            session = ProfilingSession()
+            session.start()
+            self.profiling = session
+            self.log("性能分析已开始，再次选择“工具 → 性能分析”停止并生成报告")
+        elif not enabled and self.profiling is not None:
+            session, self.profiling = self.profiling, None
+            try:
+                path = session.stop()
+            except OSError as e:
+                self.log(f"写入性能分析报告失败: {str(e)}")
+                return
+            self.log(f"性能分析已停止，报告已保存到 {path}")
+
+    def toggle_raw_capture(self):
+        """开始或停止抓取系统日志端口原始数据，独立接收进程模式下通知子进程开始或停止写入"""
+        if self.monitor_capture_var.get():
+            path = os.path.join(CAPTURE_DIR, f"monitor_{time.strftime('%Y%m%d_%H%M%S')}.cap")
+            self.monitor_capture_bytes.value = 0
+            if self.monitor_ingest:
+                self.monitor_capture_path = path
+                self.monitor_capture_control.put(('start', path))
+            else:
+                try:
+                    self.monitor_capture = RawCaptureWriter(path)
+                except OSError as e:
+                    self.monitor_capture_var.set(False)
+                    messagebox.showerror("错误", f"创建抓取文件失败: {str(e)}")
+                    return
+                self.monitor_capture_path = path
+            self.log(f"开始抓取系统日志端口原始数据: {path}")
+        else:
+            path, self.monitor_capture_path = self.monitor_capture_path, None
+            self.close_monitor_capture()
+            if self.monitor_ingest:
+                # 子进程关闭抓取文件后回送字节数，在on_ingest_capture_result中记录
+                self.monitor_capture_control.put(('stop', None))
+            elif path:
+                self.log(f"已停止抓取原始数据，共 {self.monitor_capture_bytes.value} 字节: {path}")
+
+    def close_monitor_capture(self):
+        """关闭本进程的抓取文件，已写入的字节数计入monitor_capture_bytes"""
+        capture, self.monitor_capture = self.monitor_capture, None
+        if capture:
+            capture.close()
+            self.monitor_capture_bytes.value += capture.bytes_written
+
+    def prepare_monitor_capture(self, ingest):
+        """连接系统日志端口前按接收模式切换抓取文件的写入方（同一文件追加写入）"""
+        path = self.monitor_capture_path
+        if not path:
+            return
+        if ingest:
+            self.close_monitor_capture()
+        elif self.monitor_capture is None:
+            try:
+                self.monitor_capture = RawCaptureWriter(path)
+            except OSError as e:
+                self.monitor_capture_path = None
+                self.monitor_capture_var.set(False)
+                self.log(f"打开抓取文件失败，已停止抓取: {str(e)}")
+
+    def on_ingest_capture_result(self, result):
+        """接收进程停止抓取或打开抓取文件失败（在记录处理线程中调用）"""
+        if result['error']:
+            self.log(f"接收进程创建抓取文件失败: {result['error']}")
+            if result['path'] == self.monitor_capture_path:
+                self.monitor_capture_path = None
+                self.root.after(0, lambda: self.monitor_capture_var.set(False))
+        else:
+            self.log(f"已停止抓取原始数据，共 {result['bytes']} 字节: {result['path']}")
+
+    def open_capture_viewer(self):
+        """分页查看抓取文件的十六进制/ASCII内容"""
+        path = filedialog.askopenfilename(
+            title="查看抓取文件",
+            initialdir=CAPTURE_DIR if os.path.isdir(CAPTURE_DIR) else None,
+            filetypes=[("抓取文件", "*.cap"), ("所有文件", "*.*")],
+            parent=self.root
+        )
+        if not path:
+            return
+        try:
+            reader = RawCaptureReader(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"打开抓取文件失败: {str(e)}")
+            return
+
+        page_size = HEX_VIEW_WIDTH * 256
+        # 索引在后台线程中建立，完成前不能翻页
+        state = {'page': 0, 'page_count': 0}
+        cancel_event = threading.Event()
+
+        viewer = tk.Toplevel(self.root)
+        viewer.title(f"抓取文件 - {os.path.basename(path)}")
+        viewer.geometry("900x600")
+
+        control_frame = ttk.Frame(viewer)
+        control_frame.pack(fill=tk.X, padx=10, pady=5)
+        page_var = tk.StringVar()
+        offset_var = tk.StringVar()
+        hex_text = scrolledtext.ScrolledText(viewer, font=("Consolas", 10), wrap=tk.NONE)
+        hex_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        def show_page(page):
+            page_count = state['page_count']
+            if not page_count:
+                return
+            state['page'] = min(max(page, 0), page_count - 1)
+            offset = state['page'] * page_size
+            lines = format_hex_lines(reader.read(offset, page_size), offset, reader.timestamp_at)
+            hex_text.config(state=tk.NORMAL)
+            hex_text.delete(1.0, tk.END)
+            hex_text.insert(tk.END, '\n'.join(lines))
+            hex_text.config(state=tk.DISABLED)
+            page_var.set(f"第 {state['page'] + 1}/{page_count} 页")
+
+        def jump_to_offset():
+            try:
+                offset = int(offset_var.get().strip(), 16)
+            except ValueError:
+                messagebox.showerror("错误", "请输入十六进制偏移", parent=viewer)
+                return
+            show_page(offset // page_size)
+
+        ttk.Button(control_frame, text="首页", command=lambda: show_page(0)).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(control_frame, text="上一页", command=lambda: show_page(state['page'] - 1)).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(control_frame, text="下一页", command=lambda: show_page(state['page'] + 1)).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(control_frame, text="末页", command=lambda: show_page(state['page_count'] - 1)).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(control_frame, textvariable=page_var).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(control_frame, text="跳转偏移(十六进制):").pack(side=tk.LEFT)
+        ttk.Entry(control_frame, textvariable=offset_var, width=12).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="跳转", command=jump_to_offset).pack(side=tk.LEFT)
+
+        def close_viewer():
+            cancel_event.set()
+            reader.close()
+            viewer.destroy()
+
+        def on_progress(scanned, total):
+            percent = scanned * 100 // total if total else 100
+            self.root.after(0, lambda: viewer.winfo_exists() and page_var.set(f"正在建立索引 {percent}%"))
+
+        def on_indexed():
+            if not viewer.winfo_exists():
+                return
+            state['page_count'] = max(1, (reader.size + page_size - 1) // page_size)
+            viewer.title(f"抓取文件 - {os.path.basename(path)} ({reader.size} 字节)")
+            show_page(0)
+
+        def build_index():
+            try:
+                indexed = reader.build_index(on_progress, cancel_event)
+            except (OSError, struct.error) as e:
+                self.root.after(0, lambda: viewer.winfo_exists() and page_var.set(f"建立索引失败: {str(e)}"))
+                return
+            if indexed:
+                self.root.after(0, on_indexed)
+
+        viewer.protocol("WM_DELETE_WINDOW", close_viewer)
+        page_var.set("正在建立索引 0%")
+        threading.Thread(target=build_index, daemon=True).start()
+
+    def open_at_console(self):
+        """AT指令控制台：单条指令或多行脚本经AT事务调度器执行，显示每条指令的响应及往返耗时"""
+        if self.at_console and self.at_console.winfo_exists():
+            self.at_console.lift()
+            return
+        console = tk.Toplevel(self.root)
+        console.title("AT指令控制台")
+        console.geometry("760x620")
+        self.at_console = console
+        stop_event = threading.Event()
+
+        command_frame = ttk.Frame(console)
+        command_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        ttk.Label(command_frame, text="指令:").pack(side=tk.LEFT)
+        command_var = tk.StringVar(value="AT")
+        command_entry = ttk.Entry(command_frame, textvariable=command_var)
+        command_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        script_frame = ttk.LabelFrame(console, text="脚本（每行一条指令，#开头为注释）")
+        script_frame.pack(fill=tk.X, padx=10, pady=5)
+        script_text = scrolledtext.ScrolledText(script_frame, height=8, font=("Consolas", 10))
+        script_text.pack(fill=tk.X, padx=5, pady=5)
+        script_controls = ttk.Frame(script_frame)
+        script_controls.pack(fill=tk.X, padx=5, pady=(0, 5))
+        script_var = tk.StringVar()
+        script_combo = ttk.Combobox(script_controls, textvariable=script_var, values=list_at_scripts(), width=20)
+        script_combo.pack(side=tk.LEFT)
+        pipeline_var = tk.BooleanVar(value=self.settings.get('at_console_pipeline', False))
+
+        output_text = scrolledtext.ScrolledText(console, font=("Consolas", 10), state=tk.DISABLED)
+        output_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(5, 10))
+
+        def append_output(text):
+            if not output_text.winfo_exists():
+                return
+            output_text.config(state=tk.NORMAL)
+            output_text.insert(tk.END, text)
+            output_text.see(tk.END)
+            output_text.config(state=tk.DISABLED)
+
+        def show_result(result):
+            batch = f"，合并 {result['batch']} 条" if result['batch'] > 1 else ""
+            append_output(f"> {result['command']}  ({result['rtt_ms']:.0f} ms{batch})\n{result['response']}\n\n")
+
+        def run(commands, pipeline):
+            if self.at_console_thread and self.at_console_thread.is_alive():
+                messagebox.showinfo("提示", "脚本正在运行中", parent=console)
+                return
+            if not commands:
+                return
+            stop_event.clear()
+            self.at_console_thread = threading.Thread(
+                target=self._at_console_thread,
+                args=(commands, pipeline, stop_event,
+                      lambda result: self.root.after(0, show_result, result),
+                      lambda text: self.root.after(0, append_output, text)),
+                daemon=True
+            )
+            self.at_console_thread.start()
+
+        def send_command(event=None):
+            run(parse_at_script(command_var.get()), False)
+
+        def run_script():
+            self.settings['at_console_pipeline'] = pipeline_var.get()
+            try:
+                save_settings(self.settings)
+            except OSError as e:
+                self.log(f"保存配置失败: {str(e)}")
+            run(parse_at_script(script_text.get(1.0, tk.END)), pipeline_var.get())
+
+        def load_script(event=None):
+            try:
+                text = load_at_script(script_var.get())
+            except OSError as e:
+                messagebox.showerror("错误", f"读取脚本失败: {str(e)}", parent=console)
+                return
+            script_text.delete(1.0, tk.END)
+            script_text.insert(tk.END, text)
+
+        def save_script():
+            name = simpledialog.askstring("保存脚本", "脚本名称:", initialvalue=script_var.get(), parent=console)
+            if not name or not name.strip():
+                return
+            try:
+                name = save_at_script(name, script_text.get(1.0, tk.END).rstrip() + '\n')
+            except OSError as e:
+                messagebox.showerror("错误", f"保存脚本失败: {str(e)}", parent=console)
+                return
+            script_combo.config(values=list_at_scripts())
+            script_var.set(name)
+
+        def clear_output():
+            output_text.config(state=tk.NORMAL)
+            output_text.delete(1.0, tk.END)
+            output_text.config(state=tk.DISABLED)
+
+        def close_console():
+            stop_event.set()
+            self.at_console = None
+            console.destroy()
+
+        ttk.Button(command_frame, text="发送", command=send_command).pack(side=tk.LEFT)
+        command_entry.bind('<Return>', send_command)
+        script_combo.bind('<<ComboboxSelected>>', load_script)
+        ttk.Button(script_controls, text="保存脚本...", command=save_script).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(script_controls, text="合并独立查询", variable=pipeline_var).pack(side=tk.LEFT, padx=5)
+        ttk.Button(script_controls, text="清空输出", command=clear_output).pack(side=tk.RIGHT)
+        ttk.Button(script_controls, text="停止", command=stop_event.set).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(script_controls, text="运行脚本", command=run_script).pack(side=tk.RIGHT)
+        console.protocol("WM_DELETE_WINDOW", close_console)
+        command_entry.focus_set()
+
+    def _at_console_thread(self, commands, pipeline, stop_event, on_result, on_text):
+        """AT控制台执行线程：每组指令作为一个紧急事务排队，与短信发送共用调度器，不会交错"""
+        channel = self.at_channel
+        if not channel or not channel.running:
+            on_text("短信端口未连接\n\n")
+            return
+        groups = plan_at_script(commands, pipeline)
+        started = time.perf_counter()
+        count = 0
+        for group in groups:
+            if stop_event.is_set():
+                on_text("已停止\n\n")
+                return
+            try:
+                results = self.run_at_transaction(lambda: execute_at_group(channel.transact, group),
+                                                  AtPortScheduler.URGENT)
+            except Exception as e:
+                on_text(f"执行 {join_at_commands(group)} 失败: {str(e)}\n\n")
+                return
+            for result in results:
+                on_result(result)
+            count += len(results)
+        if len(commands) > 1:
+            elapsed = (time.perf_counter() - started) * 1000
+            on_text(f"脚本完成: {count} 条指令，{len(groups)} 次往返，共 {elapsed:.0f} ms\n\n")
+
+    def _replay_capture_thread(self, paths):
+        """离线回放线程：进程池并行提取短信，分批导入收件箱"""
+        try:
+            total_bytes = sum(os.path.getsize(path) for path in paths)
+            self.sms_log(f"开始离线导入 {len(paths)} 个日志文件，共 {total_bytes / 1024 / 1024:.1f} MB")
+            started = time.perf_counter()
+            found = 0
+            added = 0
+            for messages, bytes_read in replay_capture_files(paths):
+                found += len(messages)
+                added += self.import_sms_batch(messages, 'replay')
+                progress = bytes_read * 100 // total_bytes if total_bytes else 100
+                self.root.after(0, lambda p=progress: self.status_var.set(f"离线导入中... {p}%"))
+            elapsed = time.perf_counter() - started
+            self.sms_log(f"离线导入完成: 提取 {found} 条短信，新增 {added} 条，耗时 {elapsed:.1f} 秒")
+            self.root.after(0, lambda: self.status_var.set("离线导入完成"))
+        except Exception as e:
+            self.sms_log(f"离线导入日志时发生错误: {str(e)}")
+
+    def subscribe_sms(self, callback):
+        """订阅新短信，回调参数为短信信息字典"""
+        with self.sms_publish_lock:
+            self.sms_subscribers.append(callback)
+
+    def unsubscribe_sms(self, callback):
+        """取消订阅新短信"""
+        with self.sms_publish_lock:
+            if callback in self.sms_subscribers:
+                self.sms_subscribers.remove(callback)
+
+    def wait_for_verification_code(self, sender=None, keyword=None, pattern=None, timeout=60.0):
+        """等待符合条件的验证码短信，返回Future（结果为{'code', 'sms'}，超时抛出TimeoutError）"""
+        return self.sms_waiters.register(sender=sender, keyword=keyword, pattern=pattern, timeout=timeout)
+
+    def subscribe_urc(self, prefix, callback):
+        """订阅指定前缀的AT主动上报（如'+CDS'），回调参数为(头部, 数据行)"""
+        self.urc_subscribers.setdefault(prefix, []).append(callback)
+
+    def on_at_urc(self, header, payload):
+        """AT通道收到主动上报时回调（在读取线程中执行，仅入队）"""
+        self.urc_queue.put((header, payload))
+
+    def on_at_channel_error(self, error):
+        """AT通道读取异常时回调"""
+        self.log(f"AT端口读取错误: {str(error)}", log_type="sms")
+
+    def start_urc_worker(self):
+        """配置新短信主动上报并启动URC处理线程"""
+        if self.urc_running:
+            return
+        self.urc_running = True
+        self.urc_thread = threading.Thread(target=self._urc_worker_thread, daemon=True)
+        self.urc_thread.start()
+
+    def stop_at_channel(self):
+        """停止URC处理线程、网络状态监测、AT事务调度器和AT读写通道，在时限内等待线程结束"""
+        threads = [self.urc_thread]
+        self.urc_running = False
+        self.urc_queue.put((None, None))
+        if self.network_monitor:
+            self.network_monitor.stop()
+            threads.append(self.network_monitor.thread)
+            self.network_monitor = None
+        if self.at_scheduler:
+            self.at_scheduler.stop()
+            threads.append(self.at_scheduler.thread)
+            self.at_scheduler = None
+        if self.at_channel:
+            # 取消阻塞的读写，在途命令立即返回
+            self.at_channel.stop()
+            threads.append(self.at_channel.thread)
+            self.at_channel = None
+        alive = join_threads(threads)
+        self.urc_thread = None
+        if alive:
+            self.log(f"AT端口线程未能及时结束: {', '.join(thread.name for thread in alive)}", log_type="sms")
+
+    def start_network_monitor(self):
+        """启动网络状态后台监测"""
+        if self.network_monitor:
+            return
+        self.network_monitor = NetworkStatusMonitor(self._query_network_status, self.on_network_status)
+        self.network_monitor.start()
+
+    def _query_network_status(self, commands, deadline):
+        """以后台事务执行网络状态查询指令"""
+        return self.run_at_transaction(
+            lambda: {command: self.sms_send_at_command(command) for command in commands},
+            AtPortScheduler.BACKGROUND,
+            deadline
+        )
+
+    def on_network_status(self, status):
+        """网络状态更新时回调（在监测线程中执行）"""
+        if status['signal_dbm'] is not None:
+            self.metrics.record('signal_dbm', status['signal_dbm'])
+        if status['registration'] is not None:
+            self.metrics.record('registered', 1 if status['registration'] in (1, 5) else 0)
+        parts = []
+        if status['signal_dbm'] is not None:
+            parts.append(f"信号 {status['rssi']} ({status['signal_dbm']} dBm)")
+        else:
+            parts.append("信号未知")
+        parts.append(REGISTRATION_STATES.get(status['registration'], "注册状态未知"))
+        if status['operator']:
+            parts.append(status['operator'])
+        text = "，".join(parts)
+        self.root.after(0, lambda: self.network_status_var.set(text))
+
+    def _urc_worker_thread(self):
+        """URC处理线程：读取并删除新存储的短信，解析后发布给订阅者"""
+        # PDU模式，新短信存储后上报+CMTI，状态报告直接以+CDS上报
+        self.sms_send_at_command('AT+CMGF=0', wait_time=0.3)
+        response = self.sms_send_at_command('AT+CNMI=2,1,0,1,0', wait_time=0.3)
+        if response and 'OK' in response:
+            self.log("已启用新短信主动上报", log_type="sms")
+        else:
+            self.log(f"设置新短信主动上报失败: {response}", log_type="sms")
+
+        while self.urc_running:
+            try:
+                header, payload = self.urc_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if header is None:
+                break
+            try:
+                self._handle_urc(header, payload)
+            except Exception as e:
+                self.log(f"处理主动上报时发生错误: {str(e)}", log_type="sms")
+
+    def _handle_urc(self, header, payload):
+        """处理单条主动上报"""
+        if header.startswith('+CMTI:'):
+            # 格式：+CMTI: "SM",3
+            match = re.search(r'\+CMTI:\s*"?(\w*)"?,\s*(\d+)', header)
+            if match:
+                self._fetch_stored_sms(int(match.group(2)))
+        elif header.startswith('+CMT:') and payload:
+            self._accept_sms_pdu(payload)
+        elif header.startswith('+CDS:') and payload:
+            self._accept_status_report_pdu(payload)
+        elif header.startswith('+CDSI:'):
+            # 格式：+CDSI: "SM",5
+            match = re.search(r'\+CDSI:\s*"?(\w*)"?,\s*(\d+)', header)
+            if match:
+                pdu = self._read_stored_pdu(int(match.group(2)))
+                if pdu:
+                    self._accept_status_report_pdu(pdu)
+
+        for prefix, callbacks in list(self.urc_subscribers.items()):
+            if header.startswith(prefix):
+                for callback in callbacks:
+                    callback(header, payload)
+
+    def _fetch_stored_sms(self, index):
+        """读取并删除存储在模块中的短信"""
+        pdu = self._read_stored_pdu(index)
+        if pdu:
+            self._accept_sms_pdu(pdu)
+
+    def _read_stored_pdu(self, index):
+        """读取并删除模块存储中的一条记录，返回其PDU（作为紧急事务执行）"""
+        return self.run_at_transaction(lambda: self._read_stored_pdu_transaction(index), AtPortScheduler.URGENT)
+
+    def _read_stored_pdu_transaction(self, index):
+        """在AT事务中读取并删除存储记录"""
+        response = self.sms_send_at_command(f'AT+CMGR={index}', wait_time=1)
+        if not response:
+            return None
+        pdu = None
+        lines = [line.strip() for line in response.splitlines()]
+        for i, line in enumerate(lines):
+            if line.startswith('+CMGR:') and i + 1 < len(lines):
+                pdu = lines[i + 1]
+                break
+        self.sms_send_at_command(f'AT+CMGD={index}', wait_time=0.5)
+        return pdu
+
+    def _accept_status_report_pdu(self, pdu_hex):
+        """解析状态报告并与已发送短信关联"""
+        report = decode_sms_status_report_pdu(pdu_hex)
+        record = self.delivery_tracker.on_status_report(report)
+        if record is None:
+            return
+        if record['status'] == 'delivered':
+            self.sms_log(f"短信已送达 {record['phone_number']}，送达耗时 {record['latency']:.1f} 秒")
+        else:
+            self.sms_log(f"短信未能送达 {record['phone_number']}，状态码: 0x{record['failure_status']:02X}")
+        self.root.after(0, self.update_delivery_stats)
+
+    def update_delivery_stats(self):
+        """更新送达统计标签"""
+        stats = self.delivery_tracker.stats()['all']
+        if not stats['delivered'] and not stats['failed']:
+            self.delivery_stats_var.set("送达统计: 暂无送达报告")
+            return
+        text = f"送达统计: 送达 {stats['delivered']} 条，失败 {stats['failed']} 条"
+        if stats['untracked']:
+            text += f"，无法跟踪 {stats['untracked']} 条"
+        if stats['p50'] is not None:
+            text += f"，P50 {stats['p50']:.1f}s，P90 {stats['p90']:.1f}s"
+        self.delivery_stats_var.set(text)
+
+    def _accept_sms_pdu(self, pdu_hex):
+        """解析短信PDU，拼接长短信后发布"""
+        sms_info = decode_sms_deliver_pdu(pdu_hex)
+        concat = sms_info.pop('concat')
+        if concat:
+            reference, total, sequence = concat
+            key = (sms_info['phone_number'], reference, total)
+            now = time.time()
+            # 清理超过10分钟仍未收齐的分段
+            for stale_key in [k for k, v in self.sms_concat_parts.items() if now - v['time'] > 600]:
+                del self.sms_concat_parts[stale_key]
+            entry = self.sms_concat_parts.setdefault(key, {'parts': {}, 'time': now})
+            entry['parts'][sequence] = sms_info
+            if len(entry['parts']) < total:
+                return
+            del self.sms_concat_parts[key]
+            parts = [entry['parts'][seq] for seq in sorted(entry['parts'])]
+            sms_info = dict(parts[0])
+            sms_info['content'] = ''.join(part['content'] for part in parts)
+
+        sms_info['source'] = 'at'
+        self.sms_log(f"收到新短信，发件号码: {sms_info['phone_number']}")
+        self.publish_incoming_sms(sms_info)
+
+    def update_inbox_view(self, messages, auto_copy=True):
+        """通知收件箱有新消息（可在任意线程调用），同一帧内的更新合并为一次渲染
+
+        auto_copy为False的消息（如离线导入）不参与自动复制验证码。
+        """
+        if not messages:
+            return
+        with self.inbox_pending_lock:
+            if auto_copy:
+                self.inbox_pending.extend(messages)
+            if self.inbox_render_scheduled:
+                return
+            self.inbox_render_scheduled = True
+        self.root.after(self.inbox_render_interval, self._render_inbox_updates)
+
+    def _render_inbox_updates(self):
+        """渲染一帧内积累的收件箱更新：重绘当前页一次，只对最新的含验证码短信自动复制"""
+        with self.inbox_pending_lock:
+            pending, self.inbox_pending = self.inbox_pending, []
+            self.inbox_render_scheduled = False
+        try:
+            self.show_inbox_page()
             
-            # 检查是否启用了自动复制验证码功能
+            # 检查是否启用了自动复制验证码功能，从最新的短信往前找第一条含验证码的
             if self.auto_copy_verification_var.get():
-                # 调用自动复制验证码方法
-                self._auto_copy_verification_code(sms_content)
+                for message in reversed(pending):
+                    if message['code']:
+                        # 调用自动复制验证码方法
+                        self._auto_copy_verification_code(message)
+                        break
         except Exception as e:
             self.log(f"更新收件箱时发生错误: {str(e)}")
+
+    def shift_inbox_page(self, pages):
+        """向更早(pages>0)或更新(pages<0)的短信翻页"""
+        self.inbox_anchor = self.inbox_store.shift_anchor(self.inbox_anchor, pages, self.inbox_page_size)
+        self.show_inbox_page()
+
+    def show_inbox_page(self):
+        """显示收件箱当前页（最新的短信在第1页，翻到的早期页面按锚点固定，不随新短信移动）"""
+        rows, page, page_count = self.inbox_store.page(self.inbox_anchor, self.inbox_page_size)
+        self.inbox_tree.delete(*self.inbox_tree.get_children())
+        for message in rows:
+            preview = ' '.join((message.get('content') or '').split())[:60]
+            self.inbox_tree.insert('', tk.END, iid=str(message['id']),
+                                   values=(message.get('phone_number', ''), message.get('send_time', ''), preview))
+        text = f"第 {page + 1}/{page_count} 页，共 {len(self.inbox_store)} 条"
+        if len(self.inbox_store) >= self.inbox_store.limit:
+            text += f"（仅保留最近 {self.inbox_store.limit} 条，更早的短信见多设备合并收件箱）"
+        self.inbox_page_var.set(text)
+
+    def show_inbox_message(self, event=None):
+        """双击收件箱中的短信时显示完整内容"""
+        selection = self.inbox_tree.selection()
+        if not selection:
+            return
+        message = self.inbox_store.get(int(selection[0]))
+        if not message:
+            return
+        detail = f"{message.get('content', '')}\n\n发件号码: {message.get('phone_number', '')}\n发件时间: {message.get('send_time', '')}"
+        if message['code']:
+            detail += f"\n验证码: {message['code']}"
+        messagebox.showinfo("短信详情", detail, parent=self.root)
             
+    def open_merged_inbox(self):
+        """多设备合并收件箱：读取各设备（包括其他窗口中连接的SIM卡）的收件箱分片，按发送时间归并显示"""
+        if self.merged_inbox_window and self.merged_inbox_window.winfo_exists():
+            self.merged_inbox_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("多设备合并收件箱")
+        window.geometry("900x560")
+        self.merged_inbox_window = window
+        state = {'shards': {}, 'devices': {}, 'loading': False}
+
+        control_frame = ttk.Frame(window)
+        control_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+        ttk.Label(control_frame, text="设备:").pack(side=tk.LEFT)
+        device_var = tk.StringVar(value="全部设备")
+        device_combo = ttk.Combobox(control_frame, textvariable=device_var, state="readonly", width=28)
+        device_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Label(control_frame, text="发件号码:").pack(side=tk.LEFT, padx=(10, 0))
+        sender_var = tk.StringVar()
+        sender_entry = ttk.Entry(control_frame, textvariable=sender_var, width=18)
+        sender_entry.pack(side=tk.LEFT, padx=5)
+        count_var = tk.StringVar()
+
+        list_frame = ttk.Frame(window)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(5, 10))
+        tree = ttk.Treeview(list_frame, columns=('device', 'sender', 'time', 'preview'), show='headings',
+                            selectmode='browse')
+        tree.heading('device', text="设备")
+        tree.heading('sender', text="发件号码")
+        tree.heading('time', text="发送时间（本地）")
+        tree.heading('preview', text="内容")
+        tree.column('device', width=130, stretch=False)
+        tree.column('sender', width=120, stretch=False)
+        tree.column('time', width=140, stretch=False)
+        tree.column('preview', width=400, stretch=True)
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        rows = {}
+
+        def show_rows():
+            label = device_var.get()
+            devices = [device for device, name in state['devices'].items() if name == label] or None
+            merged = merge_inbox_shards(state['shards'], devices, sender_var.get().strip() or None)
+            tree.delete(*tree.get_children())
+            rows.clear()
+            for index, message in enumerate(itertools.islice(merged, MERGED_INBOX_VIEW_LIMIT)):
+                epoch = message.get('epoch')
+                sent = (datetime.datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S")
+                        if epoch else message.get('send_time', ''))
+                preview = (message.get('content') or '').replace('\n', ' ')
+                tree.insert('', tk.END, iid=str(index), values=(
+                    state['devices'].get(message['device'], message['device']),
+                    message.get('phone_number', ''), sent, preview[:80]))
+                rows[str(index)] = message
+            total = sum(len(messages) for messages in state['shards'].values())
+            count_var.set(f"{len(state['shards'])} 台设备，共 {total} 条，显示 {len(rows)} 条")
+
+        def apply_shards(shards, error=None):
+            state['loading'] = False
+            if not window.winfo_exists():
+                return
+            if error:
+                count_var.set(f"读取收件箱分片失败: {error}")
+                return
+            state['shards'] = shards
+            # 设备显示名称：SIM卡号码（分片中最新一条消息记录的名称）
+            state['devices'] = {device: f"{messages[0].get('device_name') or device}"
+                                for device, messages in shards.items()}
+            device_combo.config(values=["全部设备"] + sorted(set(state['devices'].values())))
+            show_rows()
+
+        def load_shards():
+            # 在后台线程中增量读取分片，只解析上次读取后新追加的行
+            try:
+                shards = self.inbox_shard_reader.refresh()
+            except OSError as e:
+                self.root.after(0, lambda: apply_shards(None, str(e)))
+                return
+            self.root.after(0, lambda: apply_shards(shards))
+
+        def reload_shards():
+            if not window.winfo_exists() or state['loading']:
+                return
+            state['loading'] = True
+            threading.Thread(target=load_shards, daemon=True).start()
+
+        def reload_periodically():
+            if not window.winfo_exists():
+                return
+            reload_shards()
+            window.after(MERGED_INBOX_REFRESH_INTERVAL, reload_periodically)
+
+        def show_detail(event=None):
+            selection = tree.selection()
+            if not selection:
+                return
+            message = rows[selection[0]]
+            detail = (f"{message.get('content', '')}\n\n设备: {state['devices'].get(message['device'], '')}"
+                      f"\n发件号码: {message.get('phone_number', '')}\n发件时间: {message.get('send_time', '')}")
+            if message.get('code'):
+                detail += f"\n验证码: {message['code']}"
+            messagebox.showinfo("短信详情", detail, parent=window)
+
+        ttk.Button(control_frame, text="筛选", command=show_rows).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="刷新", command=reload_shards).pack(side=tk.LEFT)
+        ttk.Label(control_frame, textvariable=count_var).pack(side=tk.RIGHT)
+        device_combo.bind('<<ComboboxSelected>>', lambda event: show_rows())
+        sender_entry.bind('<Return>', lambda event: show_rows())
+        tree.bind('<Double-1>', show_detail)
+        reload_periodically()
+
     def on_auto_copy_toggle(self):
         """处理自动复制验证码复选框的状态变化"""
         if self.auto_copy_verification_var.get():
@@ -1135,24 +5538,11 @@ class CombinedAir724UGTool:
         else:
             self.sms_log("已禁用自动复制验证码功能")
     
-    def _auto_copy_verification_code(self, sms_content):
-        """自动从短信内容中提取验证码并复制到剪贴板"""
+    def _auto_copy_verification_code(self, message):
+        """自动把短信入库时提取的验证码复制到剪贴板"""
         try:
-            
-            # 优先查找常见的验证码格式：
-            # 1. 连续的4-8位数字（最常见的验证码格式）
-            code_match = re.search(r'([0-9]{4,8})', sms_content)
-            
-            # 2. 如果没有找到纯数字验证码，查找包含字母和数字的验证码
-            if not code_match:
-                code_match = re.search(r'([A-Za-z0-9]{4,8})', sms_content)
-            
-            # 3. 特定格式的验证码（例如：XX-XX-XX）
-            if not code_match:
-                code_match = re.search(r'([A-Za-z0-9]{2}-[A-Za-z0-9]{2}-[A-Za-z0-9]{2})', sms_content)
-            
-            if code_match:
-                verification_code = code_match.group(1)
+            verification_code = message['code']
+            if verification_code:
                 # 复制到剪贴板
                 self.root.clipboard_clear()
                 self.root.clipboard_append(verification_code)
@@ -1204,9 +5594,9 @@ class CombinedAir724UGTool:
     
     def start_port_monitoring(self):
         """启动定期检查端口存在性的监控"""
-        # 定期执行端口检查（每2秒检查一次）
+        # 定期执行端口检查（每2秒检查一次），首次检查推迟一个周期，避免启动时重复枚举串口
         self.port_monitoring_interval = 2000  # 毫秒
-        self.check_ports_existence()
+        self.root.after(self.port_monitoring_interval, self.check_ports_existence)
         
     def check_ports_existence(self):
         """检查当前连接的端口是否仍然存在于系统中"""
@@ -1224,12 +5614,7 @@ class CombinedAir724UGTool:
                     need_disconnect = True
                     self.log(f"检测到短信端口 {current_sms_port} 已不存在")
             
-            # 检查监控端口是否仍然存在
-            if self.monitor_connected and hasattr(self, 'monitor_port_var'):
-                current_monitor_port = self.monitor_port_var.get()
-                if current_monitor_port and current_monitor_port not in available_ports:
-                    need_disconnect = True
-                    self.log(f"检测到系统日志端口 {current_monitor_port} 已不存在")
+            # 系统日志端口不存在时由接收线程（或接收进程）按指数退避重连，这里不再断开
             
             # 如果任一已连接端口不存在，断开所有连接
             if need_disconnect:
@@ -1261,8 +5646,8 @@ class CombinedAir724UGTool:
         else:
             self.log("短信助手端口已连接")
 
-        # 减少连接监控端口的延迟，提高连接速度
-        self.root.after(100, self.auto_connect_monitor_port)
+        # 界面空闲时立即连接监控端口，不再固定等待
+        self.root.after_idle(self.auto_connect_monitor_port)
 
     def animate_connection(self, led):
         """连接成功后的动画效果 - 简化版"""
@@ -1286,8 +5671,11 @@ class CombinedAir724UGTool:
         if self.sms_connected:
             self.log("正在断开短信端口...")
             if self.sms_ser and self.sms_ser.is_open:
+                self.stop_at_channel()
                 self.sms_ser.close()
                 self.sms_connected = False
+                # 未读取到ICCID就断开时，暂存的短信按短信端口写入分片
+                self.resolve_inbox_device()
                 self.log("短信端口已断开串口连接", log_type="sms")
                 # 更新状态指示灯为红色
                 self.sms_status_led.config(text="●", foreground=self.error_color)
@@ -1300,20 +5688,8 @@ class CombinedAir724UGTool:
         if self.monitor_connected:
             self.log("正在断开系统日志端口...")
             try:
-                # 先停止接收线程
-                self.monitor_running = False
-                
-                # 记录开始等待的时间
-                start_time = time.time()
-                # 设置最长等待时间为0.5秒
-                max_wait_time = 0.5
-                
-                # 等待线程结束，但不超过最长等待时间
-                # 使用括号处理多行条件
-                while (hasattr(self, 'monitor_thread') and 
-                       self.monitor_thread.is_alive() and 
-                       (time.time() - start_time < max_wait_time)):
-                    time.sleep(0.05)  # 短暂休眠，减少CPU使用率
+                # 先停止接收线程（取消阻塞的读取，限时等待线程结束）
+                self.stop_monitor_threads()
                 
                 # 强制关闭串口，确保断开连接
                 if self.monitor_ser is not None:
@@ -1358,8 +5734,15 @@ class CombinedAir724UGTool:
         
         self.log("所有端口已断开连接")
 
-    def sms_send_at_command(self, command, wait_time=0.3):
-        """发送AT指令并返回响应"""
+    def run_at_transaction(self, transaction, priority=AtPortScheduler.BACKGROUND, deadline=None):
+        """通过调度器执行AT事务并等待结果（未启用调度器时直接执行）"""
+        scheduler = self.at_scheduler
+        if scheduler is None:
+            return transaction()
+        return scheduler.run(transaction, priority, deadline)
+
+    def sms_send_at_command(self, command, wait_time=0.3, priority=AtPortScheduler.BACKGROUND):
+        """发送AT指令并返回响应（事务外调用时作为单条指令事务排队）"""
         if not self.sms_ser or not self.sms_ser.is_open:
             self.log("错误: 短信端口未连接。", log_type="sms")
             return None
@@ -1372,11 +5755,16 @@ class CombinedAir724UGTool:
                 else:
                     command += '\r\n'
 
-            # 发送命令
-            self.sms_ser.write(command.encode('utf-8'))
-            
             # 优化等待机制
             max_wait = wait_time * 2  # 最大等待时间为设置值的2倍
+
+            # 后台读取通道运行时，由通道完成收发，避免与主动上报混在一起
+            channel = self.at_channel
+            if channel and channel.running:
+                return self.run_at_transaction(lambda: channel.transact(command, max_wait), priority)
+
+            # 发送命令
+            self.sms_ser.write(command.encode('utf-8'))
             start_time = time.time()
             response = b''
             
@@ -1409,14 +5797,65 @@ class CombinedAir724UGTool:
         # 添加到全部日志
         self.all_logs.append(formatted_message)
         
-        # 只有当当前选择的日志类型匹配时才显示
+        # 只有当当前选择的日志类型匹配时才显示（日志面板构建前只记录，构建后统一显示）
+        if self.log_text is None:
+            return
+        if self.log_type.get() == "all" or self.log_type.get() == log_type:
+            self._append_log_text(formatted_message)
+
+    def log_batch(self, messages, log_type="all"):
+        """批量添加日志，只更新一次日志文本框"""
+        timestamp = time.strftime("%H:%M:%S")
+        tag = {"sms": "[短信助手] ", "monitor": "[系统端口] "}.get(log_type, "")
+        # 结构化记录原样缓存，显示时再格式化
+        formatted_messages = [message if isinstance(message, LuatLogRecord) else f"[{timestamp}] {tag}{message}\n"
+                              for message in messages]
+        if log_type == "sms":
+            self.sms_logs.extend(formatted_messages)
+        elif log_type == "monitor":
+            self.monitor_logs.extend(formatted_messages)
+        self.all_logs.extend(formatted_messages)
+
+        if self.log_text is None:
+            return
         if self.log_type.get() == "all" or self.log_type.get() == log_type:
-            self.log_text.insert(tk.END, formatted_message)
-            self.log_text.see(tk.END)
+            self._append_log_text(''.join(map(format_log_entry, formatted_messages)))
+
+    def _append_log_text(self, text):
+        """追加到日志文本框，超过最大行数时删除最早的行"""
+        self.log_text.insert(tk.END, text)
+        line_count = int(self.log_text.index("end-1c").split('.')[0])
+        if line_count > LOG_TEXT_MAX_LINES:
+            self.log_text.delete("1.0", f"{line_count - LOG_TEXT_MAX_LINES + 1}.0")
+        self.log_text.see(tk.END)
+
+    @profiled('drain_monitor_display')
+    def drain_monitor_display(self):
+        """按帧批量显示系统日志，并更新积压及丢弃统计"""
+        records, skipped = self.monitor_display.drain()
+        if skipped:
+            records.insert(0, f"……显示跟不上接收速度，已省略 {skipped} 条日志")
+        if records:
+            self.log_batch(records, log_type="monitor")
+        stats = self.monitor_display.stats()
+        now = time.monotonic()
+        sample_time, sample_bytes = self.monitor_rate_sample
+        if now - sample_time >= 1.0:
+            total_bytes = self.monitor_byte_counter.value
+            self.monitor_byte_rate = (total_bytes - sample_bytes) / (now - sample_time)
+            self.monitor_rate_sample = (now, total_bytes)
+            if self.monitor_connected:
+                self.metrics.add('monitor_bytes', total_bytes - sample_bytes)
+        backlog = f"接收: {self.monitor_byte_rate / 1024:.1f} KB/s 日志积压: {stats['depth']} 丢弃: {stats['shed']}"
+        link = format_link_stats(self.monitor_link_snapshot())
+        self.monitor_backlog_var.set(f"{backlog} {link}" if link else backlog)
+        self.root.after(MONITOR_DISPLAY_INTERVAL, self.drain_monitor_display)
 
     def sms_log(self, message):
         """添加短信日志信息"""
         self.log(message, log_type="sms")
+        if self.log_text is None:
+            return
         # 高亮显示短信日志
         last_line = self.log_text.index("end-2l")
         self.log_text.tag_add("sms_log", last_line, "end-1l")
@@ -1427,17 +5866,10 @@ class CombinedAir724UGTool:
         # 清空当前显示
         self.log_text.delete(1.0, tk.END)
         
-        # 根据选择的日志类型显示对应的日志
+        # 根据选择的日志类型显示对应的日志（只显示最近的日志，一次性插入）
         selected_type = self.log_type.get()
-        if selected_type == "all":
-            for log in self.all_logs:
-                self.log_text.insert(tk.END, log)
-        elif selected_type == "sms":
-            for log in self.sms_logs:
-                self.log_text.insert(tk.END, log)
-        elif selected_type == "monitor":
-            for log in self.monitor_logs:
-                self.log_text.insert(tk.END, log)
+        logs = {"all": self.all_logs, "sms": self.sms_logs, "monitor": self.monitor_logs}.get(selected_type, [])
+        self.log_text.insert(tk.END, ''.join(map(format_log_entry, list(logs)[-LOG_TEXT_MAX_LINES:])))
         
         # 滚动到底部
         self.log_text.see(tk.END)
@@ -1445,9 +5877,9 @@ class CombinedAir724UGTool:
     def clear_logs(self):
         """清除所有日志"""
         self.log_text.delete(1.0, tk.END)
-        self.all_logs = []
-        self.sms_logs = []
-        self.monitor_logs = []
+        self.all_logs.clear()
+        self.sms_logs.clear()
+        self.monitor_logs.clear()
         self.log("日志已清除")
 
     def read_sim_info(self):
@@ -1463,6 +5895,15 @@ class CombinedAir724UGTool:
         """读取SIM卡信息的线程函数"""
         self.log("开始读取SIM卡信息...", log_type="sms")
 
+        # 通过ICCID查找SIM卡档案缓存，命中时立即恢复显示，随后在后台校验
+        iccid = self.get_sim_iccid()
+        self.resolve_inbox_device()
+        profile = self.sim_profiles.get(iccid) if iccid else None
+        if profile:
+            self.log(f"已从缓存恢复SIM卡信息 (ICCID: {iccid})", log_type="sms")
+            self.sim_sms_center = profile.get('sms_center')
+            self._apply_sim_info(profile.get('phone_number'), profile.get('carrier'))
+
         # 检查SIM卡是否就绪
         response = self.sms_send_at_command('AT+CPIN?')
         if response and '+CPIN: READY' not in response:
@@ -1473,41 +5914,94 @@ class CombinedAir724UGTool:
         # 关闭回显
         self.sms_send_at_command('ATE0')
 
-        # 获取手机号码
-        self.log("正在获取手机号码...", log_type="sms")
-        phone_number = self.get_sim_phone_number()
+        # 获取手机号码（跳过档案中记录为不支持的指令）
+        self.log("正在获取手机号码..." if not profile else "正在后台校验SIM卡信息...", log_type="sms")
+        # 指令支持情况过期后重新探测
+        probed_at = profile.get('probed_at', 0) if profile else 0
+        if time.time() - probed_at < SIM_CAPABILITY_REPROBE_AGE:
+            capabilities = {cmd: supported for cmd, supported in profile.get('capabilities', {}).items()
+                            if cmd in SIM_NUMBER_COMMANDS}
+        else:
+            capabilities = {}
+            probed_at = time.time()
+        self.sim_sms_center = None
+        phone_number = self.get_sim_phone_number(capabilities)
 
         # 获取运营商信息
         self.log("正在获取运营商信息...", log_type="sms")
         carrier = self.get_carrier(phone_number)
 
+        # 获取短信中心号码
+        if self.sim_sms_center is None:
+            self.get_sms_center()
+
+        # 更新SIM卡档案
+        if iccid:
+            try:
+                self.sim_profiles.put(iccid, {
+                    'phone_number': phone_number,
+                    'carrier': carrier,
+                    'sms_center': self.sim_sms_center,
+                    'capabilities': capabilities,
+                    'probed_at': probed_at
+                })
+            except OSError as e:
+                self.log(f"保存SIM卡档案失败: {str(e)}", log_type="sms")
+
+        if profile and (profile.get('phone_number'), profile.get('carrier')) != (phone_number, carrier):
+            self.log("SIM卡信息与缓存不一致，已更新", log_type="sms")
+        self._apply_sim_info(phone_number, carrier)
+
+        self.log("SIM卡信息读取完成", log_type="sms")
+
+    def _apply_sim_info(self, phone_number, carrier):
+        """更新SIM卡信息显示"""
         # 更新UI，在手机号码后显示运营商信息
         display_text = phone_number if phone_number else "无法获取"
         if display_text != "无法获取" and display_text != "未连接" and carrier and carrier != "未知运营商":
             display_text = f"{display_text} ({carrier})"
+        self.sim_phone_number = phone_number
+        self.sim_carrier = carrier
         self.root.after(0, lambda: self.phone_number_var.set(display_text))
         self.root.after(0, lambda: self.carrier_var.set(carrier))
 
         # 检查设备连接状态
         self.root.after(0, self.check_device_connection)
 
-        self.log("SIM卡信息读取完成", log_type="sms")
-
-    def get_sim_phone_number(self):
-        """获取SIM卡手机号码"""
-        # 常用的获取手机号码的AT指令
-        commands = [
-            'AT+CNUM',      # 多数模块支持
-            'AT+CCID',      # 获取ICCID，可以用来查询号码
-            'AT+CSQ',       # 查询信号强度，先确认网络状态
-            'AT^HFSN',      # 某些模块的指令
-            'AT+CPIN?'      # 检查SIM卡是否就绪
-        ]
-
-        # 查询手机号码
+    def get_sim_iccid(self):
+        """读取SIM卡ICCID"""
+        response = self.sms_send_at_command('AT+CCID')
+        match = re.search(r'(\d{18,20}[0-9A-Fa-f]?)', response or '')
+        self.sim_iccid = match.group(1).upper() if match else None
+        return self.sim_iccid
+
+    def get_sms_center(self):
+        """读取短信中心号码"""
+        response = self.sms_send_at_command('AT+CSCA?')
+        if response:
+            self.log(f"短信中心号码: {response}", log_type="sms")
+        match = re.search(r'\+CSCA:\s*"([^"]*)"', response or '')
+        self.sim_sms_center = match.group(1) if match else None
+        return self.sim_sms_center
+
+    def get_sim_phone_number(self, capabilities=None):
+        """获取SIM卡手机号码（capabilities记录各指令是否支持，不支持的指令会被跳过）
+
+        只有明确返回ERROR/+CME ERROR的指令才记为不支持，无响应或超时不改变记录。
+        """
+        if capabilities is None:
+            capabilities = {}
+
+        # 查询手机号码（AT+CNUM多数模块支持，AT^HFSN为某些模块的指令）
         phone_number = None
-        for cmd in commands:
+        for cmd in SIM_NUMBER_COMMANDS:
+            if capabilities.get(cmd) is False:
+                continue
             response = self.sms_send_at_command(cmd)
+            if response and AT_ERROR_PATTERN.search(response):
+                capabilities[cmd] = False
+            elif response and 'OK' in response:
+                capabilities[cmd] = True
             if response:
                 self.log(f"{cmd} 响应: {response}", log_type="sms")
                 # 尝试从响应中提取手机号码
@@ -1517,17 +6011,12 @@ class CombinedAir724UGTool:
                     if match:
                         phone_number = match.group(1).lstrip('+86')
                         break
-                elif cmd == 'AT+CCID':
-                    # 保存ICCID，后面可以用来查询运营商
-                    pass
 
         if not phone_number:
             # 如果直接获取失败，尝试其他方法
             self.log("无法直接获取手机号码，可能需要通过其他方式查询", log_type="sms")
             # 有些模块需要通过AT+CSCA命令获取短信中心号码来推断
-            response = self.sms_send_at_command('AT+CSCA?')
-            if response:
-                self.log(f"短信中心号码: {response}", log_type="sms")
+            self.get_sms_center()
 
         return phone_number
 
@@ -1551,14 +6040,10 @@ class CombinedAir724UGTool:
                     else:
                         return carrier
         else:
-            # 去掉可能的+86前缀
-            if phone_number.startswith('+86'):
-                phone_number = phone_number[3:]
-            # 检查号码前缀
-            for carrier, prefixes in self.carrier_prefixes.items():
-                for prefix in prefixes:
-                    if phone_number.startswith(prefix):
-                        return carrier
+            # 按7位号段查询运营商
+            carrier = self.number_segments.lookup(phone_number)
+            if carrier:
+                return carrier
 
         return "未知运营商"
     
@@ -1591,6 +6076,31 @@ class CombinedAir724UGTool:
 
     def _send_sms_thread(self, phone_number, message):
         """发送短信的线程函数"""
+        success, detail = self.send_sms_message(phone_number, message)
+        if success:
+            self.root.after(0, lambda: messagebox.showinfo("成功", detail))
+        else:
+            self.root.after(0, lambda: messagebox.showerror("错误", detail))
+
+    def send_sms_message(self, phone_number, message, priority=AtPortScheduler.URGENT):
+        """发送短信并等待结果（不弹出对话框，供界面和本地API共用），返回(是否成功, 结果说明)"""
+        try:
+            return self.send_sms_async(phone_number, message, priority).result()
+        except Exception as e:
+            return False, f"发送短信时发生错误: {str(e)}"
+
+    def send_sms_async(self, phone_number, message, priority=AtPortScheduler.URGENT):
+        """将短信作为一个AT事务提交到调度器，返回Future（结果为(是否成功, 结果说明)）"""
+        scheduler = self.at_scheduler
+        if scheduler is None:
+            future = concurrent.futures.Future()
+            future.set_result((False, "短信端口未连接"))
+            return future
+        # 一条短信的多条AT指令在同一事务内连续执行，不会与其他指令交错
+        return scheduler.submit(lambda: self._send_sms_transaction(phone_number, message), priority, name="发送短信")
+
+    def _send_sms_transaction(self, phone_number, message):
+        """在AT事务中执行短信发送流程"""
         self.sms_log(f"开始发送短信到: {phone_number}")
         self.sms_log(f"短信内容: {message}")
 
@@ -1601,117 +6111,531 @@ class CombinedAir724UGTool:
             # 准备短信设置
             self.sms_log("准备短信设置...")
 
-            # 设置短信中心号码 (根据实际情况修改)
-            sms_center = "8613800200500"  # 默认短信中心号码，可能需要根据地区修改
-            ucs2_sms_center = self.convert_to_ucs2(sms_center)
-            response = self.sms_send_at_command(f'AT+CSCA="{ucs2_sms_center}"', wait_time=0.5)
-            self.sms_log(f"设置短信中心响应: {response}")
+            # 短信中心：默认使用SIM卡中已设置的号码（PDU的SCA为00），
+            # 设置了自定义号码时只写入PDU，不修改SIM卡设置
+            sms_center = self.settings.get('sms_center', '').strip()
+            if sms_center:
+                self.sms_log(f"使用自定义短信中心: {sms_center}")
+            elif self.sim_sms_center:
+                self.sms_log(f"使用SIM卡短信中心: {self.sim_sms_center}")
+            else:
+                self.sms_log("未读取到SIM卡短信中心号码，如发送失败请在“设置 → 短信中心号码”中设置")
 
             # 检查SIM卡就绪状态 (快速检查，降低等待时间)
             response = self.sms_send_at_command('AT+CPIN?', wait_time=0.3)
             if response and '+CPIN: READY' not in response:
                 self.sms_log("SIM卡未就绪")
-                self.root.after(0, lambda: messagebox.showerror("错误", "SIM卡未就绪"))
-                return
+                return False, "SIM卡未就绪"
 
-            # 设置短信模式为文本模式
-            response = self.sms_send_at_command('AT+CMGF=1', wait_time=0.3)
+            # 设置短信模式为PDU模式，编码和有效期由PDU自身携带
+            response = self.sms_send_at_command('AT+CMGF=0', wait_time=0.3)
             self.sms_log(f"设置短信模式响应: {response}")
 
-            # 设置短信参数，适用于UCS2编码
-            response = self.sms_send_at_command('AT+CSMP=17,167,0,8', wait_time=0.3)
-            self.sms_log(f"设置短信参数响应: {response}")
-
-            # 设置字符编码为UCS2
-            response = self.sms_send_at_command('AT+CSCS="UCS2"', wait_time=0.3)
-            self.sms_log(f"设置字符编码响应: {response}")
-            if response and 'OK' not in response:
-                self.sms_log("设置字符编码失败")
-                # 不强制返回，尝试继续发送
-
-            # 确认当前字符编码设置
-            response = self.sms_send_at_command('AT+CSCS?', wait_time=0.3)
-            self.sms_log(f"当前字符编码: {response}")
-
-            # 检查网络注册状态
-            response = self.sms_send_at_command('AT+CREG?')
-            self.sms_log(f"网络注册响应: {response}")  # 记录原始响应以便调试
-            
-            # 改进的网络注册检查逻辑，接受更多注册状态
+            # 检查网络注册状态，优先使用后台监测缓存，避免每次发送都查询
             registration_state = None
-            if response:
-                match = re.search(r'\+CREG: \d+,(\d)', response)
-                if match:
-                    registration_state = int(match.group(1))
+            network_status = self.network_monitor.snapshot(max_age=60) if self.network_monitor else None
+            if network_status and network_status['registration'] is not None:
+                registration_state = network_status['registration']
+                self.sms_log(f"网络注册状态(缓存): {registration_state}")
+            else:
+                response = self.sms_send_at_command('AT+CREG?')
+                self.sms_log(f"网络注册响应: {response}")  # 记录原始响应以便调试
+                
+                # 改进的网络注册检查逻辑，接受更多注册状态
+                if response:
+                    match = re.search(r'\+CREG: \d+,(\d)', response)
+                    if match:
+                        registration_state = int(match.group(1))
                     
             if registration_state in [0, 3, 4]:
                 self.sms_log(f"网络未注册或注册状态异常: {registration_state}")
-                self.root.after(0, lambda: messagebox.showerror("错误", f"网络未注册或注册状态异常: {registration_state}，请检查信号"))
-                return
+                return False, f"网络未注册或注册状态异常: {registration_state}，请检查信号"
             elif registration_state is None:
                 self.sms_log("无法确定网络注册状态")
                 # 不强制返回，尝试继续发送
             else:
                 self.sms_log(f"网络注册状态正常: {registration_state}")
 
-            # 转换手机号码和消息为UCS2编码
+            # 自动选择编码（GSM 7-bit优先，必要时使用UCS2）并构造PDU
             try:
                 self.sms_log(f"原始短信内容: {message}")
-                ucs2_phone = self.convert_to_ucs2(phone_number)
-                ucs2_message = self.convert_to_ucs2(message)
-                self.sms_log(f"UCS2编码后手机号: {ucs2_phone}")
-                self.sms_log(f"UCS2编码后消息: {ucs2_message}")
+                self.sms_concat_reference = (self.sms_concat_reference + 1) % 256
+                pdus, encoding = self._encode_sms(phone_number, message, sms_center)
+                encoding_name = "GSM 7-bit" if encoding == 'GSM7' else "UCS2"
+                self.sms_log(f"短信编码: {encoding_name}，共 {len(pdus)} 段")
             except Exception as e:
                 self.sms_log(f"编码转换失败: {str(e)}")
-                self.root.after(0, lambda: messagebox.showerror("错误", f"编码转换失败: {str(e)}"))
-                return
+                return False, f"编码转换失败: {str(e)}"
 
-            # 发送短信
+            # 逐段发送短信，记录每段的消息参考号用于关联送达报告
             self.sms_log("发送短信...")
-            response = self.sms_send_at_command(f'AT+CMGS="{ucs2_phone}"')
-            if response and '>' in response:
-                # 发送消息内容并结束
-                response = self.sms_send_at_command(ucs2_message + '\x1a', wait_time=3)
-                if response and 'OK' in response:
-                    self.sms_log("短信发送成功")
-                    self.sms_success_count += 1
-                    self.root.after(0, lambda: messagebox.showinfo("成功", "短信发送成功"))
-                else:
-                    self.sms_log(f"短信发送失败: {response}")
-                    self.root.after(0, lambda: messagebox.showerror("错误", f"短信发送失败: {response}"))
-            else:
-                self.sms_log(f"无法发送短信: {response}")
-                self.root.after(0, lambda: messagebox.showerror("错误", f"无法发送短信: {response}"))
+            sim = f"{self.sim_phone_number} ({self.sim_carrier})" if self.sim_phone_number else None
+            record_id = self.delivery_tracker.track(phone_number, sim=sim)
+            sealed = False
+            try:
+                for index, (pdu, tpdu_length) in enumerate(pdus, start=1):
+                    if len(pdus) > 1:
+                        self.sms_log(f"正在发送第 {index}/{len(pdus)} 段")
+                    response = self.sms_send_at_command(f'AT+CMGS={tpdu_length}')
+                    if not response or '>' not in response:
+                        self.sms_log(f"无法发送短信: {response}")
+                        return False, f"无法发送短信: {response}"
+                    # 发送PDU内容并结束
+                    response = self.sms_send_at_command(pdu + '\x1a', wait_time=3)
+                    if not response or 'OK' not in response:
+                        self.sms_log(f"短信发送失败: {response}")
+                        return False, f"短信发送失败: {response}"
+                    reference_match = re.search(r'\+CMGS:\s*(\d+)', response)
+                    if reference_match:
+                        self.delivery_tracker.add_reference(record_id, int(reference_match.group(1)))
+                    else:
+                        self.sms_log("未返回消息参考号，无法跟踪该短信的送达状态")
+                        self.delivery_tracker.mark_untracked(record_id)
+                self.delivery_tracker.seal(record_id)
+                sealed = True
+            finally:
+                # 提交失败或发生异常时移除记录，不会一直停留在提交中状态
+                if not sealed:
+                    self.delivery_tracker.discard(record_id)
+
+            self.sms_log("短信发送成功")
+            self.sms_success_count += 1
+            self.metrics.add('sms_out')
+            return True, "短信发送成功"
 
         except Exception as e:
             self.sms_log(f"发送短信时发生错误: {str(e)}")
-            self.root.after(0, lambda: messagebox.showerror("错误", f"发送短信时发生错误: {str(e)}"))
+            return False, f"发送短信时发生错误: {str(e)}"
         finally:
             # 更新发送统计
             self.root.after(0, lambda: self.sms_count_var.set(f"发送统计: 共发送 {self.sms_sent_count} 条，成功 {self.sms_success_count} 条"))
 
-    def convert_to_ucs2(self, text):
-        """将文本转换为UCS2编码"""
-        # 先转换为UTF-16 Big Endian
-        utf16_bytes = text.encode('utf-16be')
-        # 转换为十六进制字符串
-        ucs2_hex = utf16_bytes.hex().upper()
-        return ucs2_hex
+    @profiled('send_sms_encode')
+    def _encode_sms(self, phone_number, message, sms_center):
+        """选择编码并构造要发送的PDU（不含AT端口等待，可单独进行性能分析）"""
+        return build_sms_submit_pdus(phone_number, message, reference=self.sms_concat_reference,
+                                     status_report=True, sms_center=sms_center)
+
+    def update_sms_encoding_hint(self, event=None):
+        """根据当前输入内容更新编码及分段预估提示"""
+        message = self.sms_text.get(1.0, tk.END).rstrip('\n')
+        encoding, segment_count, used, capacity = estimate_sms_segments(message)
+        encoding_name = "GSM 7-bit" if encoding == 'GSM7' else "UCS2"
+        self.sms_encoding_var.set(f"编码: {encoding_name}，共 {segment_count if message else 0} 段 ({used}/{capacity})")
 
     def show_no_ports_error(self):
         """显示无可用端口错误提示"""
         messagebox.showwarning("设备未连接", "未检测到任何可用串口，请连接设备后点击刷新按钮重试。")
         
+    def edit_push_target(self):
+        """设置新短信推送目标"""
+        target = simpledialog.askstring(
+            "短信推送",
+            "推送目标（留空关闭）:\nhttp://127.0.0.1:8080/sms\ntcp://127.0.0.1:9000\nunix:///tmp/sms.sock",
+            initialvalue=self.settings.get('push_target', ''),
+            parent=self.root
+        )
+        if target is None:
+            return
+        target = target.strip()
+        self.settings['push_target'] = target
+        try:
+            save_settings(self.settings)
+        except OSError as e:
+            self.log(f"保存配置失败: {str(e)}")
+        self.configure_push_delivery(target)
+
+    def import_number_segments(self):
+        """导入号段数据CSV（每行“号段,运营商”）"""
+        path = filedialog.askopenfilename(
+            title="导入号段数据",
+            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")],
+            parent=self.root
+        )
+        if not path:
+            return
+        try:
+            count = self.number_segments.load_csv(path)
+            self.number_segments.save(self.number_segments_path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"导入号段数据失败: {str(e)}")
+            return
+        self.log(f"已导入 {count} 条号段数据")
+
+    def configure_push_delivery(self, target):
+        """按推送目标启动或关闭新短信推送"""
+        if self.push_delivery:
+            self.unsubscribe_sms(self._push_sms_event)
+            self.push_delivery.stop()
+            self.push_delivery = None
+        if not target:
+            return
+
+        os.makedirs(APP_DATA_DIR, exist_ok=True)
+        self.push_delivery = SmsPushDelivery(
+            target,
+            os.path.join(APP_DATA_DIR, 'push_backlog.jsonl'),
+            log_callback=lambda message: self.log(message, log_type="sms")
+        )
+        self.push_delivery.start()
+        self.subscribe_sms(self._push_sms_event)
+        self.log(f"已启用短信推送: {target}", log_type="sms")
+
+    def _push_sms_event(self, sms_info):
+        """将新短信转换为推送事件"""
+        push_delivery = self.push_delivery
+        if not push_delivery:
+            return
+        push_delivery.submit({
+            'type': 'sms.received',
+            'phone_number': sms_info.get('phone_number'),
+            'send_time': sms_info.get('send_time'),
+            'content': sms_info.get('content'),
+            'source': sms_info.get('source'),
+            'received_at': datetime.datetime.now().isoformat(timespec='milliseconds')
+        })
+
+    def edit_monitor_filter(self):
+        """编辑系统日志接收时过滤条件"""
+        current = self.settings.get('monitor_filter', {})
+        dialog = tk.Toplevel(self.root)
+        dialog.title("系统日志过滤")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+
+        fields = [
+            ('levels', "保留级别（如 IWE，留空为全部）:"),
+            ('include_modules', "只保留模块（逗号分隔）:"),
+            ('exclude_modules', "排除模块（逗号分隔）:"),
+            ('include_pattern', "只保留内容匹配的正则:"),
+            ('exclude_pattern', "排除内容匹配的正则:")
+        ]
+        variables = {}
+        for row, (key, label) in enumerate(fields):
+            ttk.Label(dialog, text=label).grid(row=row, column=0, sticky=tk.W, padx=10, pady=4)
+            variables[key] = tk.StringVar(value=current.get(key, ''))
+            ttk.Entry(dialog, textvariable=variables[key], width=36).grid(row=row, column=1, padx=10, pady=4)
+
+        def apply_filter():
+            filter_settings = {key: variable.get().strip() for key, variable in variables.items()}
+            try:
+                # 预编译过滤条件，接收线程直接替换引用
+                self.monitor_filter = LuatLogFilter.from_settings(filter_settings)
+            except re.error as e:
+                messagebox.showerror("错误", f"正则表达式无效: {str(e)}", parent=dialog)
+                return
+            self.settings['monitor_filter'] = filter_settings
+            try:
+                save_settings(self.settings)
+            except OSError as e:
+                self.log(f"保存配置失败: {str(e)}")
+            if self.monitor_ingest:
+                self.log("系统日志过滤条件已更新，独立接收进程在重新连接后生效")
+            else:
+                self.log("系统日志过滤条件已更新")
+            dialog.destroy()
+
+        button_frame = ttk.Frame(dialog)
+        button_frame.grid(row=len(fields), column=0, columnspan=2, pady=8)
+        ttk.Button(button_frame, text="确定", command=apply_filter).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+        dialog.grab_set()
+
+    def toggle_monitor_ingest_process(self):
+        """切换系统日志独立接收进程模式，重新连接系统日志端口后生效"""
+        self.settings['monitor_ingest_process'] = self.monitor_ingest_var.get()
+        try:
+            save_settings(self.settings)
+        except OSError as e:
+            self.log(f"保存配置失败: {str(e)}")
+        self.log("系统日志接收模式已更改，重新连接系统日志端口后生效")
+
+    def edit_sms_center(self):
+        """设置自定义短信中心号码（留空使用SIM卡中的短信中心）"""
+        sms_center = simpledialog.askstring(
+            "短信中心号码",
+            "自定义短信中心号码（如 +8613800200500，留空使用SIM卡中的短信中心）:",
+            initialvalue=self.settings.get('sms_center', ''),
+            parent=self.root
+        )
+        if sms_center is None:
+            return
+        sms_center = sms_center.strip()
+        if sms_center and not re.fullmatch(r'\+?\d{3,20}', sms_center):
+            messagebox.showerror("错误", "短信中心号码格式无效")
+            return
+        self.settings['sms_center'] = sms_center
+        try:
+            save_settings(self.settings)
+        except OSError as e:
+            self.log(f"保存配置失败: {str(e)}")
+        self.log(f"短信中心号码已设置为: {sms_center}" if sms_center else "短信中心号码已恢复为使用SIM卡设置")
+
+    def edit_api_port(self):
+        """设置本地API监听端口"""
+        port = simpledialog.askinteger(
+            "本地API",
+            "本地API端口（仅监听127.0.0.1，0表示关闭）:",
+            initialvalue=self.settings.get('api_port', 0),
+            minvalue=0,
+            maxvalue=65535,
+            parent=self.root
+        )
+        if port is None:
+            return
+        self.settings['api_port'] = port
+        try:
+            save_settings(self.settings)
+        except OSError as e:
+            self.log(f"保存配置失败: {str(e)}")
+        self.configure_api_server(port)
+
+    def configure_api_server(self, port):
+        """按端口启动或关闭本地API"""
+        if self.api_server:
+            self.api_server.stop()
+            self.api_server = None
+        if not port:
+            return
+
+        server = LocalApiServer('127.0.0.1', port, log_callback=self.log)
+        server.add_route('POST', '/send', self._api_send, rpc_name='send')
+        server.add_route('POST', '/bulk-send', self._api_bulk_send, rpc_name='bulk_send')
+        server.add_route('GET', '/jobs', self._api_job_status, rpc_name='job_status')
+        server.add_route('GET', '/status', self._api_status, rpc_name='status')
+        server.add_route('GET', '/inbox', self._api_inbox, rpc_name='inbox')
+        server.add_route('GET', '/inbox/merged', self._api_merged_inbox, rpc_name='merged_inbox')
+        server.add_route('POST', '/wait-code', self._api_wait_code, rpc_name='wait_code')
+        server.add_route('GET', '/deliveries', self._api_deliveries, rpc_name='deliveries')
+        server.add_route('POST', '/classify', self._api_classify, rpc_name='classify')
+        server.add_route('GET', '/metrics', self._api_metrics, rpc_name='metrics')
+        try:
+            server.start()
+        except OSError as e:
+            self.log(f"本地API启动失败: {str(e)}")
+            return
+        self.api_server = server
+        self.log(f"本地API已启动: http://127.0.0.1:{port}")
+
+    async def _api_send(self, query, body):
+        """POST /send {"phone_number": "...", "message": "..."}"""
+        phone_number = str(body.get('phone_number', '')).strip()
+        message = str(body.get('message', '')).strip()
+        if not phone_number or not message:
+            return 400, {'error': '缺少phone_number或message'}
+        if not self.sms_connected:
+            return 503, {'error': '短信端口未连接'}
+        success, detail = await self._queue_api_send(phone_number, message, AtPortScheduler.URGENT)
+        return 200, {'success': success, 'detail': detail}
+
+    async def _api_bulk_send(self, query, body):
+        """POST /bulk-send {"messages": [{"phone_number", "message"}]} 或 {"phone_numbers": [...], "message": "..."}"""
+        if 'messages' in body:
+            items = [(str(item.get('phone_number', '')).strip(), str(item.get('message', '')).strip()) for item in body['messages']]
+        else:
+            message = str(body.get('message', '')).strip()
+            items = [(str(number).strip(), message) for number in body.get('phone_numbers', [])]
+        if not items or any(not number or not message for number, message in items):
+            return 400, {'error': '缺少号码或短信内容'}
+        if not self.sms_connected:
+            return 503, {'error': '短信端口未连接'}
+
+        # 先按号段归类号码（仅作标注）：非手机号码（短号码、固话、国际号码）照常发送，
+        # 请求中strict为true时才把非手机号码直接记为失败，不占用AT端口
+        strict = bool(body.get('strict'))
+        classification = self.number_segments.classify([number for number, _ in items])
+
+        self.prune_bulk_jobs()
+        self.bulk_job_id += 1
+        job_id = self.bulk_job_id
+        job = {'id': job_id, 'total': len(items), 'done': 0, 'success': 0, 'failed': 0, 'results': [],
+               'carriers': classification['counts'], 'finished_at': None}
+        self.bulk_jobs[job_id] = job
+
+        for (phone_number, message), result in zip(items, classification['results']):
+            number = result['number'] if result['valid'] else re.sub(r'[\s\-]', '', phone_number)
+            if (strict and not result['valid']) or not DIALABLE_NUMBER_PATTERN.match(number):
+                job['done'] += 1
+                job['failed'] += 1
+                job['results'].append({'phone_number': phone_number, 'success': False, 'detail': '号码格式无效',
+                                       'carrier': None})
+                continue
+            task = asyncio.ensure_future(self._queue_api_send(number, message, AtPortScheduler.BULK))
+            self.bulk_tasks.add(task)
+            task.add_done_callback(self.bulk_tasks.discard)
+            task.add_done_callback(
+                lambda f, number=number, carrier=result['carrier']: self._record_bulk_result(job, number, f, carrier))
+        if job['done'] == job['total']:
+            job['finished_at'] = time.time()
+        return 202, {'job_id': job_id, 'total': job['total'], 'unclassified': classification['invalid']}
+
+    async def _queue_api_send(self, phone_number, message, priority):
+        """将短信提交到AT端口调度器排队发送"""
+        self.pending_send_count += 1
+        try:
+            return await asyncio.wrap_future(self.send_sms_async(phone_number, message, priority))
+        except Exception as e:
+            return False, str(e)
+        finally:
+            self.pending_send_count -= 1
+
+    def _record_bulk_result(self, job, phone_number, future, carrier=None):
+        """记录批量发送中单条短信的结果（在事件循环线程中执行），carrier为号段归类结果"""
+        if future.cancelled():
+            success, detail = False, '已取消'
+        elif future.exception() is not None:
+            success, detail = False, str(future.exception())
+            self.log(f"批量发送任务异常: {detail}")
+        else:
+            success, detail = future.result()
+        job['done'] += 1
+        job['success' if success else 'failed'] += 1
+        job['results'].append({'phone_number': phone_number, 'success': success, 'detail': detail,
+                               'carrier': carrier})
+        if job['done'] == job['total']:
+            job['finished_at'] = time.time()
+
+    def prune_bulk_jobs(self):
+        """淘汰完成超过BULK_JOB_TTL的批量发送任务，任务数超过BULK_JOB_MAX时再淘汰最早完成的任务"""
+        now = time.time()
+        finished = sorted((job['finished_at'], job_id) for job_id, job in self.bulk_jobs.items()
+                          if job['finished_at'] is not None)
+        excess = len(self.bulk_jobs) - BULK_JOB_MAX + 1
+        for index, (finished_at, job_id) in enumerate(finished):
+            if now - finished_at <= BULK_JOB_TTL and index >= excess:
+                break
+            del self.bulk_jobs[job_id]
+
+    async def _api_job_status(self, query, body):
+        """GET /jobs?id=1"""
+        try:
+            job = self.bulk_jobs.get(int(query.get('id', 0)))
+        except ValueError:
+            job = None
+        if job is None:
+            return 404, {'error': '任务不存在'}
+        return 200, job
+
+    async def _api_status(self, query, body):
+        """GET /status"""
+        return 200, {
+            'sms_connected': self.sms_connected,
+            'monitor_connected': self.monitor_connected,
+            'monitor_link': self.monitor_link_snapshot(),
+            'phone_number': self.sim_phone_number,
+            'carrier': self.sim_carrier,
+            'sent_count': self.sms_sent_count,
+            'success_count': self.sms_success_count,
+            'pending_sends': self.pending_send_count,
+            'at_queue': self.at_scheduler.queue_sizes() if self.at_scheduler else None,
+            'network': self.network_monitor.snapshot() if self.network_monitor else None,
+            'inbox_count': len(self.inbox_store),
+            'code_waiters': self.sms_waiters.pending_count()
+        }
+
+    async def _api_inbox(self, query, body):
+        """GET /inbox?since_id=0&limit=100&sender=106..."""
+        try:
+            since_id = int(query.get('since_id', 0))
+            limit = max(1, min(int(query.get('limit', 100)), 1000))
+        except ValueError:
+            return 400, {'error': 'since_id或limit不是整数'}
+        return 200, {'messages': self.inbox_store.since(since_id, limit, query.get('sender'))}
+
+    async def _api_metrics(self, query, body):
+        """GET /metrics?name=signal_dbm&span=3600 返回运行指标时间序列"""
+        name = query.get('name')
+        if name not in self.metrics.series:
+            return 400, {'error': f"name应为: {', '.join(self.metrics.series)}"}
+        try:
+            span = max(1, min(int(query.get('span', 3600)), METRICS_RANGES[-1][1]))
+        except ValueError:
+            return 400, {'error': 'span不是整数'}
+        points = self.metrics.query(name, span)
+        return 200, {'name': name, 'kind': self.metrics.series[name],
+                     'points': [{'time': t, 'value': value, 'min': low, 'max': high}
+                                for t, value, low, high in points]}
+
+    async def _api_merged_inbox(self, query, body):
+        """GET /inbox/merged?device=ICCID&sender=106...&limit=100 多设备合并收件箱（按发送时间从新到旧）"""
+        try:
+            limit = max(1, min(int(query.get('limit', 100)), MERGED_INBOX_VIEW_LIMIT))
+        except ValueError:
+            return 400, {'error': 'limit不是整数'}
+        shards = await asyncio.get_event_loop().run_in_executor(None, self.inbox_shard_reader.refresh)
+        devices = [query['device']] if query.get('device') else None
+        merged = merge_inbox_shards(shards, devices, query.get('sender'))
+        return 200, {'devices': sorted(shards), 'messages': list(itertools.islice(merged, limit))}
+
+    async def _api_classify(self, query, body):
+        """POST /classify {"numbers": [...]} 批量校验号码并按号段归类运营商"""
+        numbers = body.get('numbers')
+        if not isinstance(numbers, list):
+            return 400, {'error': 'numbers必须是数组'}
+        return 200, self.number_segments.classify(numbers)
+
+    async def _api_deliveries(self, query, body):
+        """GET /deliveries?limit=100 送达记录及按SIM卡分组的时延统计"""
+        try:
+            limit = max(1, min(int(query.get('limit', 100)), 5000))
+        except ValueError:
+            return 400, {'error': 'limit不是整数'}
+        return 200, {'stats': self.delivery_tracker.stats(), 'records': self.delivery_tracker.recent(limit)}
+
+    async def _api_wait_code(self, query, body):
+        """POST /wait-code {"sender": "...", "keyword": "...", "pattern": "...", "timeout": 60}"""
+        try:
+            timeout = float(body.get('timeout', 60))
+            future = self.wait_for_verification_code(
+                sender=body.get('sender'),
+                keyword=body.get('keyword'),
+                pattern=body.get('pattern'),
+                timeout=timeout
+            )
+        except (ValueError, re.error) as e:
+            return 400, {'error': f"等待条件无效: {str(e)}"}
+        try:
+            result = await asyncio.wrap_future(future)
+        except TimeoutError:
+            return 504, {'error': '等待验证码超时'}
+        return 200, result
+
     def on_closing(self):
-        # 关闭所有串口和窗口
+        # 关闭所有串口和窗口，性能分析未停止时先写入报告
+        self.toggle_profiling(False)
         self.sms_disconnect()
         self.monitor_close_serial()
+        self.close_monitor_capture()
+        if self.push_delivery:
+            self.push_delivery.stop()
+        if self.api_server:
+            self.api_server.stop()
+        self.save_metrics()
         self.root.destroy()
 
 # 主程序入口
 if __name__ == "__main__":
+    # 打包为exe后离线回放使用进程池，子进程需要此调用
+    multiprocessing.freeze_support()
+    startup_profiler = StartupProfiler()
     root = tk.Tk()
-    app = CombinedAir724UGTool(root)
+    startup_profiler.mark('tk_root')
+    app = CombinedAir724UGTool(root, startup_profiler)
     # 设置窗口关闭事件处理
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
+    # --profile: 启动后立即开始性能分析；运行中可用信号切换（POSIX为SIGUSR1，Windows为Ctrl+Break）
+    if '--profile' in sys.argv[1:]:
+        app.toggle_profiling(True)
+    profile_signal = getattr(signal, 'SIGUSR1', None) or getattr(signal, 'SIGBREAK', None)
+    if profile_signal is not None:
+        signal.signal(profile_signal, lambda signum, frame: root.after(0, app.toggle_profiling))
+    # --startup-report: 就绪后将启动耗时报告输出到标准输出并退出，便于脚本测量
+    if '--startup-report' in sys.argv[1:]:
+        def print_startup_report():
+            if startup_profiler.elapsed('ready') is None:
+                root.after(50, print_startup_report)
+                return
+            print(json.dumps(startup_profiler.report(), ensure_ascii=False, indent=2))
+            app.on_closing()
+        root.after(50, print_startup_report)
     root.mainloop()